@@ -0,0 +1,272 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from latency_sketch import LogHistogram
+
+# 여러 run / 여러 스케줄러 결과 집계
+# - run별 결과 파일({M}/{M}_result_{i}.csv)을 병렬로 읽어서 run 단위로 바로 축약
+#   (run별 평균/분위수 + LogHistogram 카운트) -> run 수가 늘어도 전체 배열을 합치지 않음
+# - pooled 분위수는 run별 sketch를 merge해서 계산 (상대 오차 rel_err 이내), run이 하나면 정확한 값
+#   sketch는 지표별 설정 (_SKETCH): 0은 따로 세고, 횟수 지표는 정수로 반올림
+# - 신뢰구간은 run 단위 bootstrap (run을 복원 추출)
+# - cache_dir를 주면 run별 축약 결과를 파일 내용 해시로 캐시 -> 바뀐 파일만 다시 읽음
+
+METRICS = {
+    "Turnaround": "trun_around_ms",
+    "Execution": "exec_ms",
+    "Response": "res_ms",
+    "CtxΔ": "ctxsw_delta_total",
+    "RunQ": "runq_wait_ms",      # handler 스레드의 run-queue 대기 (없는 CSV는 빈 값)
+}
+# 지표별 sketch 설정: ms 지표는 0.001ms까지, 횟수(CtxΔ)는 1부터 / 0은 zero_bucket
+_SKETCH = {name: {"min_ms": 0.001, "zero_bucket": True} for name in METRICS}
+_SKETCH["CtxΔ"] = {"min_ms": 1.0, "zero_bucket": True}
+COUNT_METRICS = {"CtxΔ"}     # pooled 분위수를 정수로
+STATS = ("avg", "p50", "p95", "p99")
+_Q = {"p50": 50, "p95": 95, "p99": 99}
+KNOWN_MODES = ["CFS", "FIFO", "CUSTOM"]
+_RUN_RE = re.compile(r"_result_(\d+)\.csv$")
+_CACHE_VERSION = 3     # _reduce_run 결과 형식이 바뀌면 올림
+
+def discover(root: str = ".", modes: Optional[List[str]] = None) -> Dict[str, List[Tuple[int, str]]]:
+    """
+    {mode: [(run, path), ...]}
+    run별 파일이 없으면 {M}_result.csv 하나를 run 0으로 사용
+    modes가 None이면 {M}/{M}_result*.csv가 있는 디렉터리 전부
+    """
+    if modes is None:
+        modes = [d for d in sorted(os.listdir(root))
+                 if glob.glob(os.path.join(root, d, f"{d}_result*.csv"))]
+        modes.sort(key=lambda m: (KNOWN_MODES.index(m) if m in KNOWN_MODES else len(KNOWN_MODES), m))
+    out = {}
+    for m in modes:
+        runs = []
+        for p in glob.glob(os.path.join(root, m, f"{m}_result_*.csv")):
+            g = _RUN_RE.search(p)
+            if g:
+                runs.append((int(g.group(1)), p))
+        if not runs:
+            p = os.path.join(root, m, f"{m}_result.csv")
+            if os.path.exists(p):
+                runs = [(0, p)]
+        if not runs:
+            print(f"[WARN] no result files for {m}")
+        out[m] = sorted(runs)
+    return out
+
+def _new_sketch(name: str) -> LogHistogram:
+    return LogHistogram(**_SKETCH[name])
+
+def _read(path: str) -> pd.DataFrame:
+    return pd.read_csv(path, usecols=lambda c: c in set(METRICS.values()) | {"timestamp", "function", "arg"})
+
+def _reduce_run(job):
+    """(mode, run, path) -> run 통계 행 + metric별 sketch 카운트 (프로세스 풀에서 실행)"""
+    mode, run, path = job
+    df = _read(path)
+    row = {"mode": mode, "run": run, "n": len(df)}
+    sketches = {}
+    for name, col in METRICS.items():
+        xs = pd.to_numeric(df[col], errors="coerce").dropna().to_numpy(dtype=float) if col in df else np.empty(0)
+        row[f"{name}_n"] = len(xs)
+        row[f"{name}_sum"] = float(xs.sum())
+        row[f"{name}_avg"] = float(xs.mean()) if len(xs) else np.nan
+        qs = np.percentile(xs, list(_Q.values())) if len(xs) else [np.nan] * len(_Q)
+        for k, v in zip(_Q, qs):
+            row[f"{name}_{k}"] = float(v)
+        h = _new_sketch(name)
+        h.add_array(xs)
+        sketches[name] = h.counts
+    return row, sketches
+
+def bootstrap_ci(values: np.ndarray, n_boot: int = 2000, ci: float = 0.95,
+                 rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+    """run별 값의 평균에 대한 bootstrap 백분위 신뢰구간 (한 번에 n_boot x n 인덱스 행렬로)"""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan, np.nan
+    if len(values) == 1:
+        return float(values[0]), float(values[0])
+    rng = rng or np.random.default_rng(0)
+    means = values[rng.integers(0, len(values), (n_boot, len(values)))].mean(axis=1)
+    a = (1.0 - ci) / 2.0
+    lo, hi = np.quantile(means, [a, 1.0 - a])
+    return float(lo), float(hi)
+
+class ReduceCache:
+    """
+    run 축약 결과 캐시: {cache_dir}/{sha1}.pkl
+    파일 해시는 (경로, 크기, mtime)이 같으면 digests.json에 기억해 둔 값을 재사용
+    """
+    def __init__(self, cache_dir: str):
+        self.dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._memo_path = os.path.join(cache_dir, "digests.json")
+        try:
+            with open(self._memo_path) as f:
+                self._memo = json.load(f)
+        except (OSError, ValueError):
+            self._memo = {}
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        m = self._memo.get(os.path.abspath(path))
+        if m and m[0] == stamp:
+            return m[1]
+        h = hashlib.sha1(f"v{_CACHE_VERSION}".encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        d = h.hexdigest()
+        self._memo[os.path.abspath(path)] = [stamp, d]
+        return d
+
+    def get(self, key: str):
+        try:
+            with open(os.path.join(self.dir, f"{key}.pkl"), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, key: str, obj):
+        tmp = os.path.join(self.dir, f"{key}.pkl.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(self.dir, f"{key}.pkl"))
+
+    def save(self):
+        with open(self._memo_path, "w") as f:
+            json.dump(self._memo, f)
+
+def reduce_runs(runs: Dict[str, List[Tuple[int, str]]], workers: Optional[int] = None,
+                cache_dir: Optional[str] = None) -> Dict[str, list]:
+    """{mode: [(row, sketches), ...]} (runs 순서 그대로), 캐시에 없는 run만 프로세스 풀에서 축약"""
+    jobs = [(m, r, p) for m, lst in runs.items() for r, p in lst]
+    cache = ReduceCache(cache_dir) if cache_dir else None
+    keys = [cache.digest(p) for _, _, p in jobs] if cache else [None] * len(jobs)
+    reduced = [cache.get(k) if cache else None for k in keys]
+    miss = [i for i, x in enumerate(reduced) if x is None]
+    if miss:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for i, x in zip(miss, ex.map(_reduce_run, [jobs[i] for i in miss], chunksize=4)):
+                reduced[i] = x
+                if cache:
+                    cache.put(keys[i], x)
+    if cache:
+        cache.save()
+    out = {m: [] for m in runs}
+    for (m, r, _), (row, sk) in zip(jobs, reduced):
+        out[m].append(({**row, "mode": m, "run": r}, sk))
+    return out
+
+def merged_sketches(reduced: Dict[str, list]) -> Dict[str, Dict[str, LogHistogram]]:
+    """mode별, metric별로 run sketch를 합친 LogHistogram"""
+    out = {}
+    for mode, lst in reduced.items():
+        out[mode] = {}
+        for name in METRICS:
+            h = _new_sketch(name)
+            for _, sk in lst:
+                h.add_counts(sk[name])
+            out[mode][name] = h
+    return out
+
+def summarize_reduced(reduced: Dict[str, list], n_boot: int = 2000, ci: float = 0.95, seed: int = 0):
+    """
+    반환: (per_run, summary)
+    per_run: mode, run, n, {metric}_{stat}
+    summary: mode, metric, stat, pooled, run_mean, ci_lo, ci_hi, runs
+      pooled  = 모든 run을 합친 값 (avg는 정확, 분위수는 sketch merge, run이 하나면 정확한 분위수)
+      run_mean = run별 값의 평균, ci = 그 평균의 bootstrap 신뢰구간
+    """
+    rng = np.random.default_rng(seed)
+    sketches = merged_sketches(reduced)
+    rows, per_run = [], []
+    for mode, lst in reduced.items():
+        if not lst:
+            continue
+        pr = pd.DataFrame([r for r, _ in lst])
+        per_run.append(pr)
+        for name in METRICS:
+            n = int(pr[f"{name}_n"].sum())
+            pooled = {"avg": pr[f"{name}_sum"].sum() / n if n else np.nan}
+            if len(lst) == 1:
+                # run 하나: _reduce_run의 np.percentile 값 그대로
+                qs = [pr[f"{name}_{k}"].iloc[0] for k in _Q]
+            else:
+                qs = sketches[mode][name].quantiles([q / 100.0 for q in _Q.values()])
+                if qs is not None and name in COUNT_METRICS:
+                    qs = np.rint(qs)
+            for i, k in enumerate(_Q):
+                pooled[k] = np.nan if qs is None else float(qs[i])
+            for stat in STATS:
+                vals = pr[f"{name}_{stat}"].to_numpy(dtype=float)
+                lo, hi = bootstrap_ci(vals, n_boot, ci, rng)
+                rows.append({"mode": mode, "metric": name, "stat": stat,
+                             "pooled": pooled[stat], "run_mean": float(np.nanmean(vals)) if len(vals) else np.nan,
+                             "ci_lo": lo, "ci_hi": hi, "runs": len(lst)})
+    if not per_run:
+        return pd.DataFrame(), pd.DataFrame()
+    keep = ["mode", "run", "n"] + [f"{name}_{s}" for name in METRICS for s in STATS]
+    return pd.concat(per_run, ignore_index=True)[keep], pd.DataFrame(rows)
+
+def summarize(runs: Dict[str, List[Tuple[int, str]]], workers: Optional[int] = None,
+              n_boot: int = 2000, ci: float = 0.95, seed: int = 0,
+              cache_dir: Optional[str] = None):
+    """discover() 결과 -> (per_run, summary), summarize_reduced 참고"""
+    return summarize_reduced(reduce_runs(runs, workers, cache_dir), n_boot, ci, seed)
+
+def load_runs(runs: Dict[str, List[Tuple[int, str]]], workers: Optional[int] = None) -> pd.DataFrame:
+    """모든 run을 mode, run 컬럼을 붙인 긴 테이블로 (그림 그리기용)"""
+    jobs = [(m, r, p) for m, lst in runs.items() for r, p in lst]
+    if not jobs:
+        return pd.DataFrame(columns=["mode", "run"] + list(METRICS.values()))
+
+    def one(job):
+        m, r, p = job
+        df = _read(p)
+        df.insert(0, "run", r)
+        df.insert(0, "mode", m)
+        return df
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        dfs = list(ex.map(one, jobs))
+    df = pd.concat(dfs, ignore_index=True)
+    df["mode"] = pd.Categorical(df["mode"], categories=list(runs))
+    return df
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="aggregate per-run results across schedulers")
+    ap.add_argument("--root", default=".")
+    ap.add_argument("--modes", default=None, help="예: CFS,FIFO,CUSTOM (기본: 결과 디렉터리 자동 탐색)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--boot", type=int, default=2000)
+    ap.add_argument("--ci", type=float, default=0.95)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out-dir", default="./compare_results/aggregate")
+    ap.add_argument("--cache-dir", default="./compare_results/.cache",
+                    help="run 축약 결과 캐시 (빈 문자열이면 사용 안 함)")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    runs = discover(a.root, a.modes.split(",") if a.modes else None)
+    per_run, summary = summarize(runs, a.workers, a.boot, a.ci, a.seed, a.cache_dir or None)
+    os.makedirs(a.out_dir, exist_ok=True)
+    per_run.to_csv(os.path.join(a.out_dir, "per_run.csv"), index=False)
+    summary.to_csv(os.path.join(a.out_dir, "summary.csv"), index=False)
+    if len(summary):
+        with pd.option_context("display.width", 160, "display.max_rows", 200):
+            print(summary.round(2).to_string(index=False))
+    print(f"[Aggregate] {sum(len(v) for v in runs.values())} runs, {len(runs)} modes -> {a.out_dir}")
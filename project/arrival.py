@@ -0,0 +1,110 @@
+import asyncio
+import time
+from array import array
+from typing import Iterable, Optional
+
+import numpy as np
+
+class OpenLoopScheduler:
+    """
+    절대 마감 시각 기반 open-loop 도착 스케줄러
+    - i번째 도착 마감 = 시작 시각 + inter-arrival 누적합 (sleep 오차가 쌓이지 않음)
+    - 마감 spin_s 전까지 sleep, 남은 구간은 spin
+    - 이미 지난 도착은 묶어서(batch) 한 번에 내보내 뒤처짐을 따라잡음
+    - 도착별 지연(lag = 실제 방출 - 마감)을 기록해서 report()로 요약
+    """
+    def __init__(self, spin_s: float = 0.0005, max_batch: int = 256,
+                 start_at: Optional[float] = None):
+        self.spin_s = spin_s
+        self.max_batch = max_batch
+        self.start_at = start_at        # 공통 시작 시각(epoch s), None이면 즉시
+        self.lags = array("d")          # s
+        self.t0 = None                  # perf_counter 기준 시작
+        self.t_last_deadline = None
+        self.t_last_release = None
+
+    def _start(self) -> float:
+        now = time.perf_counter()
+        if self.start_at is None:
+            self.t0 = now
+        else:
+            self.t0 = now + (self.start_at - time.time())
+        return self.t0
+
+    def _wait_until(self, t: float):
+        remaining = t - time.perf_counter()
+        if remaining > self.spin_s:
+            time.sleep(remaining - self.spin_s)
+        while time.perf_counter() < t:
+            pass
+
+    async def _await_until(self, t: float):
+        remaining = t - time.perf_counter()
+        if remaining > self.spin_s:
+            await asyncio.sleep(remaining - self.spin_s)
+        while time.perf_counter() < t:
+            await asyncio.sleep(0)
+
+    def _step(self, deadline: float, now: float, batch: list, item):
+        self.lags.append(now - deadline)
+        self.t_last_deadline = deadline
+        self.t_last_release = now
+        batch.append(item)
+
+    def batches(self, records: Iterable):
+        """records: (ia, arg, func) -> [(arg, func), ...] 묶음을 마감 시각에 맞춰 생성"""
+        deadline = self._start()
+        batch = []
+        for ia, arg, fid in records:
+            deadline += ia
+            now = time.perf_counter()
+            if deadline > now:
+                if batch:
+                    yield batch
+                    batch = []
+                self._wait_until(deadline)
+                now = time.perf_counter()
+            self._step(deadline, now, batch, (arg, fid))
+            if len(batch) >= self.max_batch:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def abatches(self, records: Iterable):
+        """batches()의 asyncio 버전"""
+        deadline = self._start()
+        batch = []
+        for ia, arg, fid in records:
+            deadline += ia
+            now = time.perf_counter()
+            if deadline > now:
+                if batch:
+                    yield batch
+                    batch = []
+                await self._await_until(deadline)
+                now = time.perf_counter()
+            self._step(deadline, now, batch, (arg, fid))
+            if len(batch) >= self.max_batch:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def report(self) -> dict:
+        n = len(self.lags)
+        if n == 0 or self.t0 is None:
+            return {"arrivals": 0}
+        lags_ms = np.frombuffer(self.lags, dtype=np.float64) * 1000.0
+        intended_span = max(self.t_last_deadline - self.t0, 1e-9)
+        achieved_span = max(self.t_last_release - self.t0, 1e-9)
+        return {
+            "arrivals": n,
+            "intended_rps": round(n / intended_span, 3),
+            "achieved_rps": round(n / achieved_span, 3),
+            "lag_ms_p50": round(float(np.percentile(lags_ms, 50)), 3),
+            "lag_ms_p95": round(float(np.percentile(lags_ms, 95)), 3),
+            "lag_ms_p99": round(float(np.percentile(lags_ms, 99)), 3),
+            "lag_ms_max": round(float(lags_ms.max()), 3),
+            "late_1ms_frac": round(float((lags_ms > 1.0).mean()), 4),
+        }
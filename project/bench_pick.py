@@ -0,0 +1,50 @@
+import argparse, random, time
+import numpy as np
+from custom_scheduler import _DispatcherCore
+
+# 후보 선택 비용 마이크로벤치마크: 기존 정렬 방식 vs LatencyIndex
+
+def _legacy_pick(core: _DispatcherCore, k: int):
+    # 인덱스 도입 전 _pick_fast_candidates (매번 전체 정렬)
+    healthy = [f for f in core.funcs if not core._is_slow(f)]
+    if not healthy:
+        healthy = core.funcs[:]
+    healthy.sort(key=lambda f: core.lat[f].value())
+    return healthy[:k]
+
+def _bench(n_funcs: int, iters: int, k: int, seed: int):
+    rng = random.Random(seed)
+    core = _DispatcherCore("http://127.0.0.1:8080", [f"func-{i:04d}" for i in range(n_funcs)])
+    # 일부는 격리 상태가 되도록 느린 지연을 섞어서 예열
+    for f in core.funcs:
+        core._record(f, rng.choice([20.0, 60.0, 400.0]))
+
+    samples = [(rng.choice(core.funcs), rng.expovariate(1 / 80.0)) for _ in range(iters)]
+    out = {}
+    for name, pick in (("legacy", lambda: _legacy_pick(core, k)),
+                       ("index", lambda: core._pick_fast_candidates(k))):
+        ts = np.empty(iters)
+        for i, (f, lat) in enumerate(samples):
+            core._record(f, lat)               # 실제 흐름처럼 지연 보고와 선택을 번갈아
+            t0 = time.perf_counter()
+            pick()
+            ts[i] = time.perf_counter() - t0
+        out[name] = ts * 1e6
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="15,500,5000")
+    ap.add_argument("--iters", type=int, default=5000)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+
+    print(f"{'funcs':>6} {'impl':>7} {'mean_us':>9} {'p50_us':>8} {'p99_us':>8}")
+    for n in [int(x) for x in a.sizes.split(",")]:
+        res = _bench(n, a.iters, a.k, a.seed)
+        for name, us in res.items():
+            print(f"{n:>6} {name:>7} {us.mean():9.2f} {np.percentile(us, 50):8.2f} {np.percentile(us, 99):8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import argparse, csv, itertools, json, os, threading, time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from arrival import OpenLoopScheduler
+from workload_io import open_workload, iter_records, ARG_STR
+from workload_replayer import build_parser, from_args
+
+# 용량(포화점) 측정: 부하를 올려 가며 모드별 처리량-지연 곡선과 최대 지속 가능 RPS
+# - ramp(open-loop): trace inter-arrival을 배율로 줄여 목표 RPS로 재생 (trace는 반복)
+#     step   : --start-rps부터 --step-rps(또는 --step-mult)씩, 단계마다 --step-s초
+#     linear : --start-rps -> --max-rps로 --duration-s 동안 선형 증가, --step-s 구간별로 집계
+# - closed: 가상 사용자 N명이 응답을 받으면 (--think-ms 후) 다음 요청, 단계마다 사용자 수 증가
+# - 지연은 요청 방출 시각부터 완료까지 (클라이언트 대기열 / 토큰 대기 포함, coordinated omission 없음)
+# - 단계가 SLO(P99, 오류율)를 넘거나 처리량이 목표에 못 미치면(포화) 중단
+# - 결과: {MODE}/{MODE}_capacity.csv (단계별), {MODE}_capacity.json (max_sustainable_rps)
+#   비교: python capacity.py plot --modes CFS,FIFO,CUSTOM
+
+def _cycle(wl: np.ndarray):
+    """trace를 끝없이 반복 (ia, arg, func)"""
+    return itertools.chain.from_iterable(iter_records(wl) for _ in itertools.count())
+
+class Step:
+    """단계(또는 linear 구간) 하나: 이 단계에 방출된 요청의 결과"""
+    def __init__(self, idx: int, level: float, intended_rps: Optional[float], t0: float, span_s: float):
+        self.idx = idx
+        self.level = level                  # 목표 RPS 또는 사용자 수
+        self.intended_rps = intended_rps    # closed는 None
+        self.t0 = t0                        # perf_counter
+        self.span_s = span_s
+        self.issued = self.ok = self.errors = 0
+        self.done_in_span = 0               # 이 구간 안에 끝난 성공 요청 (구간과 무관하게 방출된 것 포함)
+        self.lat = array("d")
+        self.closed = False
+        self.summary = None
+
+    def complete(self) -> bool:
+        return self.closed and self.ok + self.errors >= self.issued
+
+    def summarize(self) -> dict:
+        lat = np.frombuffer(self.lat, dtype=np.float64) if len(self.lat) else np.empty(0)
+        n = self.ok + self.errors
+        q = np.percentile(lat, [50, 99]) if len(lat) else [float("nan")] * 2
+        return {"step": self.idx, "level": self.level,
+                "intended_rps": round(self.intended_rps, 3) if self.intended_rps else None,
+                "throughput_rps": round(self.done_in_span / self.span_s, 3) if self.span_s else None,
+                "issued": self.issued, "ok": self.ok, "errors": self.errors,
+                "err_rate": round(self.errors / n, 5) if n else 0.0,
+                "p50_ms": round(float(q[0]), 3), "p99_ms": round(float(q[1]), 3)}
+
+class CapacityRun:
+    def __init__(self, replayer, slo_p99_ms: float = 500.0, slo_err: float = 0.01,
+                 min_goodput: float = 0.9, min_samples: int = 20):
+        self.rp = replayer
+        self.slo_p99_ms = slo_p99_ms
+        self.slo_err = slo_err
+        self.min_goodput = min_goodput      # open-loop: 처리량 / 목표 RPS 하한
+        self.min_samples = min_samples
+        self.steps: List[Step] = []
+        self.stop = threading.Event()
+        self.stop_reason = None
+        self.stop_step = None
+        self._lock = threading.Lock()
+        self.t_start = None
+
+    # ---------------- 단계 관리 / 평가 ----------------
+
+    def _open(self, level, intended_rps, span_s) -> Step:
+        t0 = self.t_start + sum(s.span_s for s in self.steps) if self.steps else self.t_start
+        with self._lock:
+            st = Step(len(self.steps), level, intended_rps, t0, span_s)
+            self.steps.append(st)
+        return st
+
+    def _close(self, st: Step):
+        with self._lock:
+            st.closed = True
+            ready = st.complete()
+        if ready:
+            self._evaluate(st)
+
+    def _done(self, st: Step, ok: bool, ms: float):
+        now = time.perf_counter()
+        with self._lock:
+            if ok:
+                st.ok += 1
+                st.lat.append(ms)
+                # 처리량: 완료 시각이 속한 구간에 집계
+                for s in self.steps:
+                    if s.t0 <= now < s.t0 + s.span_s:
+                        s.done_in_span += 1
+                        break
+            else:
+                st.errors += 1
+            ready = st.complete()
+        if ready:
+            self._evaluate(st)
+
+    def _evaluate(self, st: Step):
+        if st.summary is not None:
+            return
+        s = st.summary = st.summarize()
+        reason = None
+        if s["ok"] + s["errors"] < self.min_samples:
+            s["slo_ok"] = None      # 표본 부족 (중단 직후 몇 건만 나간 단계 등): 판정 안 함
+        else:
+            if s["err_rate"] > self.slo_err:
+                reason = f"err_rate {s['err_rate']:.4f} > {self.slo_err}"
+            elif s["p99_ms"] > self.slo_p99_ms:
+                reason = f"p99 {s['p99_ms']:.1f} ms > {self.slo_p99_ms} ms"
+            elif st.intended_rps and s["throughput_rps"] < self.min_goodput * st.intended_rps:
+                reason = f"throughput {s['throughput_rps']:.1f} < {self.min_goodput} x {st.intended_rps:.1f} rps"
+            s["slo_ok"] = reason is None
+        print(f"[Capacity] step {s['step']} level={s['level']:g} thr={s['throughput_rps']} rps "
+              f"p50={s['p50_ms']} p99={s['p99_ms']} ms err={s['err_rate']}" + (f"  SLO miss: {reason}" if reason else ""))
+        if reason and not self.stop.is_set():
+            self.stop_reason, self.stop_step = reason, st.idx
+            self.stop.set()
+
+    def _call(self, st: Step, arg: str, fid: int, t_rel: float, t_sub: float) -> bool:
+        rp = self.rp
+        if rp.mode == "CUSTOM":
+            ok = rp._call_one_custom(arg, t_sub)
+        else:
+            ok = rp._call_one(rp._func_for(fid), arg, t_sub)
+        self._done(st, ok, (time.perf_counter() - t_rel) * 1000.0)
+        return ok
+
+    # ---------------- open-loop ramp ----------------
+
+    def run_ramp(self, wl: np.ndarray, rps_at: Callable[[float], float], total_s: float,
+                 span_s: float, workers: int, spin_s: float):
+        """rps_at(t): 예정 시각 t(s)의 목표 RPS, span_s 구간마다 단계 하나"""
+        base = len(wl) / float(wl["ia"].sum())     # trace 원래 RPS
+
+        def records():
+            t = 0.0
+            for ia, arg, fid in _cycle(wl):
+                if self.stop.is_set():
+                    return
+                ia = ia * base / rps_at(t)
+                t += ia
+                if t >= total_s:
+                    return
+                yield ia, arg, (fid, int(t // span_s))
+
+        sched = OpenLoopScheduler(spin_s=spin_s)
+        cur = None
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            self.t_start = time.perf_counter()
+            for batch in sched.batches(records()):
+                t_rel, t_sub = time.perf_counter(), time.time() * 1000.0
+                for arg, (fid, k) in batch:
+                    while cur is None or cur.idx < k:
+                        if cur is not None:
+                            self._close(cur)
+                        i = len(self.steps)
+                        rps = rps_at((i + 0.5) * span_s)
+                        cur = self._open(round(rps, 3), rps, span_s)
+                    with self._lock:
+                        cur.issued += 1
+                    ex.submit(self._call, cur, ARG_STR[arg], fid, t_rel, t_sub)
+            if cur is not None:
+                self._close(cur)
+        return sched.report()
+
+    # ---------------- closed-loop ----------------
+
+    def run_closed(self, wl: np.ndarray, users: List[int], step_s: float, think_ms: float):
+        it = _cycle(wl)
+        it_lock = threading.Lock()
+        self.t_start = time.perf_counter()
+
+        def user(st: Step, t_end: float):
+            while not self.stop.is_set() and time.perf_counter() < t_end:
+                with it_lock:
+                    _, arg, fid = next(it)
+                with self._lock:
+                    st.issued += 1
+                self._call(st, ARG_STR[arg], fid, time.perf_counter(), time.time() * 1000.0)
+                if think_ms > 0:
+                    time.sleep(think_ms / 1000.0)
+
+        for n in users:
+            if self.stop.is_set():
+                break
+            st = self._open(n, None, step_s)
+            st.t0 = time.perf_counter()      # 이전 단계의 남은 요청을 기다린 만큼 밀림
+            t_end = st.t0 + step_s
+            ts = [threading.Thread(target=user, args=(st, t_end), daemon=True) for _ in range(n)]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+            # 마지막 요청은 t_end를 넘겨 끝날 수 있음 -> 처리량은 실제 경과 시간으로
+            st.span_s = max(step_s, time.perf_counter() - st.t0)
+            with self._lock:
+                st.done_in_span = st.ok
+            self._close(st)
+
+    # ---------------- 결과 ----------------
+
+    def report(self, load: dict) -> dict:
+        rows = [s.summary or s.summarize() for s in self.steps]
+        # 중단을 일으킨 단계 이전에서 SLO를 지킨 단계만
+        last = self.stop_step if self.stop_step is not None else len(rows)
+        good = [r for r in rows if r.get("slo_ok") and r["step"] < last]
+        return {"mode": self.rp.mode, "load": load,
+                "slo": {"p99_ms": self.slo_p99_ms, "err_rate": self.slo_err,
+                        "min_goodput": self.min_goodput},
+                "max_sustainable_rps": max((r["throughput_rps"] for r in good), default=0.0),
+                "stop_reason": self.stop_reason, "stop_step": self.stop_step, "steps": rows}
+
+COLUMNS = ["step", "level", "intended_rps", "throughput_rps", "issued", "ok", "errors",
+           "err_rate", "p50_ms", "p99_ms", "slo_ok"]
+
+def ramp_levels(a) -> tuple:
+    """(rps_at, total_s)"""
+    if a.ramp == "linear":
+        total = a.duration_s
+        return (lambda t: a.start_rps + (a.max_rps - a.start_rps) * min(t / total, 1.0)), total
+    levels, r = [], a.start_rps
+    while r <= a.max_rps + 1e-9:
+        levels.append(r)
+        r = r * a.step_mult if a.step_mult else r + a.step_rps
+    return (lambda t: levels[min(int(t // a.step_s), len(levels) - 1)]), len(levels) * a.step_s
+
+def run(a):
+    if a.engine != "thread":
+        raise SystemExit("capacity: only --engine thread is supported")
+    rp = from_args(a)
+    wl = open_workload(a.workload, a.max_items)
+    if not len(wl):
+        raise SystemExit(f"capacity: empty workload {a.workload}")
+    print(f"[Capacity] Mode={rp.mode} load={a.load} trace={len(wl)} records "
+          f"({len(wl) / float(wl['ia'].sum()):.1f} rps as recorded)")
+    rp._prewarm()
+    rp._open_sink()
+    rp._start_metrics()
+    cap = CapacityRun(rp, a.slo_p99_ms, a.slo_err, a.min_goodput, a.min_samples)
+    if a.load == "closed":
+        users = [int(x) for x in a.users.split(",")]
+        cap.run_closed(wl, users, a.step_s, a.think_ms)
+        load = {"kind": "closed", "users": users, "step_s": a.step_s, "think_ms": a.think_ms}
+    else:
+        rps_at, total = ramp_levels(a)
+        rp.load_report = cap.run_ramp(wl, rps_at, total, a.step_s, a.workers, a.spin_ms / 1000.0)
+        load = {"kind": "ramp", "ramp": a.ramp, "start_rps": a.start_rps, "max_rps": a.max_rps,
+                "step_rps": a.step_rps, "step_mult": a.step_mult, "step_s": a.step_s}
+    rp.sink.close()
+    rp._stop_metrics()
+    rp._stop_keep_warm()
+    rp._save()
+
+    out = cap.report(load)
+    base = f"./{rp.mode}/{rp.mode}_capacity"
+    with open(base + ".json", "w") as f:
+        json.dump(out, f, indent=2)
+    with open(base + ".csv", "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(out["steps"])
+    print(f"[Capacity] {rp.mode}: max sustainable {out['max_sustainable_rps']} rps "
+          f"(stop: {out['stop_reason'] or 'end of ramp'}) -> {base}.json")
+
+def plot(modes: List[str], out_dir: str):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    os.makedirs(out_dir, exist_ok=True)
+    fig, ax = plt.subplots(figsize=(7, 4.5))
+    slo = None
+    for m in modes:
+        p = f"./{m}/{m}_capacity.json"
+        if not os.path.exists(p):
+            print(f"[Capacity] skip {m}: {p} not found")
+            continue
+        with open(p) as f:
+            r = json.load(f)
+        slo = r["slo"]["p99_ms"]
+        x = [s["throughput_rps"] for s in r["steps"]]
+        line, = ax.plot(x, [s["p99_ms"] for s in r["steps"]], marker="o", label=f"{m} P99")
+        ax.plot(x, [s["p50_ms"] for s in r["steps"]], ls="--", color=line.get_color(), alpha=0.6,
+                label=f"{m} P50")
+        if r["max_sustainable_rps"]:
+            ax.axvline(r["max_sustainable_rps"], color=line.get_color(), ls=":", alpha=0.8)
+        print(f"{m:>8}: max sustainable {r['max_sustainable_rps']:>9.1f} rps  "
+              f"stop: {r['stop_reason'] or 'end of ramp'}")
+    if slo:
+        ax.axhline(slo, color="gray", ls="-.", lw=1, label="P99 SLO")
+    ax.set_yscale("log")
+    ax.set_xlabel("throughput (rps)")
+    ax.set_ylabel("latency (ms)")
+    ax.set_title("Throughput vs latency")
+    ax.grid(alpha=0.3)
+    ax.legend(fontsize=8)
+    out = os.path.join(out_dir, "capacity.png")
+    fig.savefig(out, bbox_inches="tight")
+    print(f"[Saved] {out}")
+
+def parse_args():
+    rp = build_parser(add_help=False)
+    ap = argparse.ArgumentParser(description="closed-loop / RPS-ramp capacity test per scheduler mode")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ru = sub.add_parser("run", parents=[rp], help="현재 모드(SCHEDULER_MODE.txt)로 용량 측정")
+    ru.set_defaults(max_items=0)        # trace 전체를 반복 재생 (--max-items로 제한 가능)
+    ru.add_argument("--load", choices=["ramp", "closed"], default="ramp")
+    ru.add_argument("--ramp", choices=["step", "linear"], default="step")
+    ru.add_argument("--start-rps", type=float, default=50.0)
+    ru.add_argument("--step-rps", type=float, default=50.0, help="step: 단계마다 더할 RPS")
+    ru.add_argument("--step-mult", type=float, default=None, help="step: 단계마다 곱할 배율 (주면 --step-rps 무시)")
+    ru.add_argument("--max-rps", type=float, default=2000.0)
+    ru.add_argument("--step-s", type=float, default=20.0, help="단계(linear는 집계 구간) 길이(s)")
+    ru.add_argument("--duration-s", type=float, default=300.0, help="linear: 전체 ramp 시간(s)")
+    ru.add_argument("--users", default="1,2,4,8,16,32,64,128", help="closed: 단계별 가상 사용자 수")
+    ru.add_argument("--think-ms", type=float, default=0.0)
+    ru.add_argument("--slo-p99-ms", type=float, default=500.0)
+    ru.add_argument("--slo-err", type=float, default=0.01)
+    ru.add_argument("--min-goodput", type=float, default=0.9,
+                    help="ramp: 처리량이 목표 RPS의 이 비율 아래면 포화로 보고 중단")
+    ru.add_argument("--min-samples", type=int, default=20, help="이보다 적은 단계는 SLO 판정 안 함")
+    pl = sub.add_parser("plot", help="모드별 처리량-지연 곡선 (capacity.png)")
+    pl.add_argument("--modes", default="CFS,FIFO,CUSTOM")
+    pl.add_argument("--out-dir", default="./compare_results")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    if a.cmd == "run":
+        run(a)
+    else:
+        plot([m.strip() for m in a.modes.split(",") if m.strip()], a.out_dir)
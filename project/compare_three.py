@@ -1,39 +1,32 @@
-import os
+import os, argparse, hashlib, json, pickle
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+from aggregate import METRICS, discover, reduce_runs, merged_sketches, summarize_reduced
 
-IN_FILES = {
-    "CFS": "./CFS/CFS_result.csv",
-    "FIFO": "./FIFO/FIFO_result.csv",
-    "CUSTOM": "./CUSTOM/CUSTOM_result.csv",
-}
+# 스케줄러 결과는 ./{M}/{M}_result_{i}.csv (run별) 또는 ./{M}/{M}_result.csv
 OUT_DIR = "./compare_results/three"
+CACHE_DIR = "./compare_results/.cache"
+ECDF_POINTS = 512
 os.makedirs(OUT_DIR, exist_ok=True)
 
-def read_df(path):
-    if not os.path.exists(path):
-        print(f"[WARN] not found: {path}")
-        return pd.DataFrame()
-    return pd.read_csv(path)
+def ecdf_grid(n=ECDF_POINTS):
+    # 본체는 균등 간격, p99 이후 꼬리는 로그 간격으로 촘촘히
+    k=n//4
+    return np.concatenate([np.linspace(0.0,0.99,n-k,endpoint=False),1.0-np.logspace(-2,-5,k)])
 
-def to_num(col):
-    return pd.to_numeric(col, errors="coerce").dropna().to_numpy(dtype=float)
-
-def avg(a):  return float(np.mean(a)) if len(a) else 0.0
-def pct(a,p): return float(np.percentile(a,p)) if len(a) else 0.0
-
-def ecdf(a):
-    if len(a)==0: return np.array([]),np.array([])
-    x=np.sort(a)
-    y=np.arange(1,len(x)+1)/len(x)
-    x=np.insert(x,0,0.0); y=np.insert(y,0,0.0)
-    return x,y
+def ecdf(h, grid):
+    # 전체 배열 정렬 대신 merge된 sketch에서 고정 개수 분위수 점만 뽑음
+    x=h.quantiles(grid,interpolate=True)
+    if x is None: return np.array([]),np.array([])
+    return np.insert(x,0,0.0),np.insert(grid,0,0.0)
 
 def plot_ecdf(name, xlabel, series_dict, xlim=None):
     plt.figure(figsize=(6,4),dpi=150)
-    for label,arr in series_dict.items():
-        x,y=ecdf(arr)
+    for label,(x,y) in series_dict.items():
         if len(x): plt.plot(x,y,label=label,linewidth=2)
     plt.xlabel(xlabel)
     plt.ylabel("Cumulative probability")
@@ -47,20 +40,19 @@ def plot_ecdf(name, xlabel, series_dict, xlim=None):
     plt.close()
     return out
 
-def make_stats(series):
-    return {
-        "Turnaround":{"avg":avg(series["Turnaround"]),"p95":pct(series["Turnaround"],95),"p99":pct(series["Turnaround"],99)},
-        "Execution":{"avg":avg(series["Execution"]),"p95":pct(series["Execution"],95),"p99":pct(series["Execution"],99)},
-        "Response":{"avg":avg(series["Response"]),"p95":pct(series["Response"],95),"p99":pct(series["Response"],99)},
-        "CtxΔ":{"avg":avg(series["CtxΔ"]),"p95":pct(series["CtxΔ"],95),"p99":pct(series["CtxΔ"],99)},
-    }
+def make_stats(summary, mode):
+    # pooled 값 (avg는 정확, 분위수는 run별 sketch merge / run이 하나면 정확한 분위수)
+    sub=summary[summary["mode"]==mode]
+    return {m:{k:float(sub[(sub["metric"]==m)&(sub["stat"]==k)]["pooled"].fillna(0.0).sum())
+               for k in ["avg","p95","p99"]} for m in METRICS}
 
 def save_summary_table(stats):
-    rows=[]; scheds=["CFS","FIFO","CUSTOM"]
+    rows=[]; scheds=list(stats)
     order=[("Turnaround",["avg","p95","p99"]),
            ("Execution",["avg","p95","p99"]),
            ("Response",["avg","p95","p99"]),
-           ("CtxΔ",["avg","p95","p99"])]
+           ("CtxΔ",["avg","p95","p99"]),
+           ("RunQ",["avg","p95","p99"])]
     data={s:[] for s in scheds}
     for m,keys in order:
         for k in keys:
@@ -71,7 +63,8 @@ def save_summary_table(stats):
 
     fig,ax=plt.subplots(figsize=(6.8,0.4*len(df.index)+1.5),dpi=150)
     ax.axis("off")
-    df_fmt=df.applymap(lambda v:f"{v:.2f}")
+    fmt=df.map if hasattr(df,"map") else df.applymap  # pandas 2.1+에서 applymap 제거됨
+    df_fmt=fmt(lambda v:f"{v:.2f}")
     tb=ax.table(cellText=df_fmt.values,rowLabels=df_fmt.index,
                 colLabels=df_fmt.columns,loc='center',cellLoc='center')
     tb.auto_set_font_size(False)
@@ -83,36 +76,68 @@ def save_summary_table(stats):
     plt.close()
     return out
 
+def _render(job):
+    fn,args=job
+    return fn(*args)
+
+def _fig_key(job):
+    fn,args=job
+    return hashlib.sha1(pickle.dumps((fn.__name__,args),protocol=4)).hexdigest()
+
+def render_all(jobs, workers=None):
+    """그림별 입력 해시가 지난번과 같고 PNG가 있으면 건너뛰고, 나머지는 프로세스 풀에서 그림"""
+    idx_path=os.path.join(OUT_DIR,".figures.json")
+    try: done=json.load(open(idx_path))
+    except (OSError,ValueError): done={}
+    keys={name:_fig_key(job) for name,job in jobs.items()}
+    todo=[n for n in jobs
+          if done.get(n)!=keys[n] or not os.path.exists(os.path.join(OUT_DIR,f"{n}.png"))]
+    paths={n:os.path.join(OUT_DIR,f"{n}.png") for n in jobs}
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for n,p in zip(todo,ex.map(_render,[jobs[n] for n in todo])):
+                paths[n]=p; done[n]=keys[n]
+        with open(idx_path,"w") as f: json.dump(done,f)
+    print(f"[Render] {len(todo)} drawn, {len(jobs)-len(todo)} unchanged")
+    return list(paths.values())
+
 def main():
-    dfs={k:read_df(p) for k,p in IN_FILES.items()}
-    series={}
-    for k,df in dfs.items():
-        series[k]={
-            "Turnaround":to_num(df.get("trun_around_ms",[])),
-            "Execution":to_num(df.get("exec_ms",[])),
-            "Response":to_num(df.get("res_ms",[])),
-            "CtxΔ":to_num(df.get("ctxsw_delta_total",[]))
-        }
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--modes",default=None,help="예: CFS,FIFO,CUSTOM (기본: 결과 디렉터리 자동 탐색)")
+    ap.add_argument("--workers",type=int,default=None)
+    ap.add_argument("--no-cache",action="store_true")
+    a=ap.parse_args()
 
-    paths=[]
-    paths.append(plot_ecdf("execution","Execution (ms)",
-                {"CFS":series["CFS"]["Execution"],"FIFO":series["FIFO"]["Execution"],"CUSTOM":series["CUSTOM"]["Execution"]}))
-    paths.append(plot_ecdf("response","Response (ms)",
-                {"CFS":series["CFS"]["Response"],"FIFO":series["FIFO"]["Response"],"CUSTOM":series["CUSTOM"]["Response"]},
-                xlim=(0,500)))
-    paths.append(plot_ecdf("turnaround","Turnaround (ms)",
-                {"CFS":series["CFS"]["Turnaround"],"FIFO":series["FIFO"]["Turnaround"],"CUSTOM":series["CUSTOM"]["Turnaround"]},
-                xlim=(0,600)))
-    paths.append(plot_ecdf("ctxswitch","Context Switch Δ (count)",
-                {"CFS":series["CFS"]["CtxΔ"],"FIFO":series["FIFO"]["CtxΔ"],"CUSTOM":series["CUSTOM"]["CtxΔ"]},
-                xlim=(0,150)))
+    runs=discover(".",a.modes.split(",") if a.modes else None)
+    modes=list(runs)
+    reduced=reduce_runs(runs,a.workers,None if a.no_cache else CACHE_DIR)
+    sk=merged_sketches(reduced)
+    grid=ecdf_grid()
+    curves={k:{name:ecdf(sk[k][name],grid) for name in METRICS} for k in modes}
 
-    stats={k:make_stats(series[k]) for k in ["CFS","FIFO","CUSTOM"]}
-    paths.append(save_summary_table(stats))
+    per_run,summary=summarize_reduced(reduced)
+    stats={k:make_stats(summary,k) for k in modes}
+    jobs={
+        "execution":(plot_ecdf,("execution","Execution (ms)",
+                     {k:curves[k]["Execution"] for k in modes})),
+        "response":(plot_ecdf,("response","Response (ms)",
+                    {k:curves[k]["Response"] for k in modes},(0,500))),
+        "turnaround":(plot_ecdf,("turnaround","Turnaround (ms)",
+                      {k:curves[k]["Turnaround"] for k in modes},(0,600))),
+        "ctxswitch":(plot_ecdf,("ctxswitch","Context Switch Δ (count)",
+                     {k:curves[k]["CtxΔ"] for k in modes},(0,150))),
+        "runq":(plot_ecdf,("runq","Run-queue wait (ms)",
+                {k:curves[k]["RunQ"] for k in modes})),
+        "summary_table":(save_summary_table,(stats,)),
+    }
+    paths=render_all(jobs,a.workers)
+    for name,tab in (("per_run",per_run),("summary",summary)):
+        out=os.path.join(OUT_DIR,f"{name}.csv")
+        tab.to_csv(out,index=False)
+        paths.append(out)
 
     print("\n[Saved Outputs]")
     for p in paths: print(" -",p)
 
 if __name__=="__main__":
     main()
-
@@ -1,9 +1,23 @@
 import time
+import json
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
+import asyncio
+import uuid
+import random
+import heapq
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import math
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable, Union
+from latency_sketch import LogHistogram
+from metrics import Metrics
+from gateway_client import Abort, GatewayClient, LEAN_HEADERS, lean_data
+
+try:
+    import aiohttp
+except ImportError:  # async 엔진을 쓸 때만 필요
+    aiohttp = None
 
 def now_ms() -> float:
     return time.time() * 1000.0
@@ -25,7 +39,8 @@ class TokenBucket:
         self.capacity = capacity
         self.cur = capacity
         self.cv = threading.Condition()
-    def acquire(self):
+    def acquire(self, prio=None):
+        # prio는 무시 (깨어나는 순서는 Condition에 맡김)
         with self.cv:
             while self.cur <= 0:
                 self.cv.wait()
@@ -37,55 +52,544 @@ class TokenBucket:
                 self.cur = self.capacity
             self.cv.notify()
 
-class CustomDispatcher:
+class AsyncTokenBucket:
+    """TokenBucket의 asyncio 버전 (슬롯은 대기 순서대로 직접 넘겨줌)"""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.cur = capacity
+        self._waiters = deque()
+    async def acquire(self, prio=None):
+        if self.cur > 0 and not self._waiters:
+            self.cur -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # 슬롯을 넘겨받은 직후 취소됐다면 되돌려줌
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+    def release(self):
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.cur += 1
+        if self.cur > self.capacity:
+            self.cur = self.capacity
+
+# 대기열 정책: (예상 서비스 시간, 남은 예상 시간, 도착 시각, aging) -> 키 (작을수록 먼저)
+def _policy_fifo(pred_ms, remaining_ms, arrival_ms, aging):
+    return arrival_ms
+
+def _policy_sjf(pred_ms, remaining_ms, arrival_ms, aging):
+    return pred_ms
+
+def _policy_srpt(pred_ms, remaining_ms, arrival_ms, aging):
+    return remaining_ms
+
+def _policy_aged_srpt(pred_ms, remaining_ms, arrival_ms, aging):
+    # remaining - aging*(now - arrival) 과 순서가 같음 (now는 모두에게 공통)
+    return remaining_ms + aging * arrival_ms
+
+# 후보 선택 정책: ewma(기본, EWMA 순) | p2c | jsq | lect
+LB_POLICIES = ("ewma", "p2c", "jsq", "lect")
+
+QUEUE_POLICIES: Dict[str, Callable] = {
+    "fifo": _policy_fifo,
+    "sjf": _policy_sjf,
+    "srpt": _policy_srpt,
+    "aged_srpt": _policy_aged_srpt,
+}
+
+# 요청 단위 스케줄링 정책 (handler의 sched_policy.py가 payload의 "sched"를 작업 스레드에 적용)
+# 문자열 형식: POLICY[:PRIO][/nice=N][/cpus=0-3]  예: "fifo:60", "batch/nice=5", "other/cpus=0,1"
+def parse_sched_spec(spec: str) -> dict:
+    parts = [p.strip() for p in spec.split("/") if p.strip()]
+    out = {}
+    for p in parts:
+        if "=" in p:
+            k, v = p.split("=", 1)
+            if k == "cpus":
+                cpus = []
+                for r in v.split(","):
+                    lo, _, hi = r.partition("-")
+                    cpus.extend(range(int(lo), int(hi or lo) + 1))
+                out["cpus"] = cpus
+            elif k == "nice":
+                out["nice"] = int(v)
+            else:
+                out[k] = float(v)    # runtime_ms / deadline_ms / period_ms
+        else:
+            name, _, prio = p.partition(":")
+            out["policy"] = name.lower()
+            if prio:
+                out["prio"] = int(prio)
+    return out
+
+def parse_sched_hint(hint: Union[str, Callable, None]) -> Optional[Callable[[float], Optional[dict]]]:
     """
-    - EWMA로 함수별 지연 추정
-    - 느려진 함수는 격리(사용 중단) 후 회복 감시
-    - P95 지연(대략치)을 hedge 타임아웃으로 사용, 다른 빠른 후보에 1회 복제
-    - 함수별 동시성 상한으로 큐 폭주 억제
+    예상 서비스 시간(ms) -> 요청 정책
+    "fifo:80<20,fifo:50<100,batch": 20ms 미만 fifo 80, 100ms 미만 fifo 50, 나머지 batch
+    (마지막 규칙에 임계값이 없으면 기본값, 없으면 정책을 붙이지 않음)
+    """
+    if hint is None or callable(hint):
+        return hint
+    rules, default = [], None
+    for part in hint.split(","):
+        spec, _, ms = part.partition("<")
+        if ms:
+            rules.append((float(ms), parse_sched_spec(spec)))
+        else:
+            default = parse_sched_spec(spec)
+    rules.sort(key=lambda r: r[0])
+
+    def pick(pred_ms: float) -> Optional[dict]:
+        for limit, spec in rules:
+            if pred_ms < limit:
+                return spec
+        return default
+    return pick
+
+class _ThreadWaiter:
+    def __init__(self):
+        self.ev = threading.Event()
+    def alive(self) -> bool:
+        return True
+    def wake(self):
+        self.ev.set()
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.fut = asyncio.get_running_loop().create_future()
+    def alive(self) -> bool:
+        return not self.fut.done()
+    def wake(self):
+        self.fut.set_result(None)
+
+class _GateView:
+    """PriorityGate의 함수 하나짜리 창 (TokenBucket과 같은 acquire/release)"""
+    def __init__(self, gate, f: str):
+        self.gate = gate
+        self.f = f
+    def acquire(self, prio=None):
+        return self.gate.acquire(self.f, prio)
+    def release(self):
+        self.gate.release(self.f)
+
+class PriorityGate:
+    """
+    함수별 토큰버킷 앞단의 중앙 우선순위 대기열 (스레드용)
+    - 함수별 동시 실행 상한은 TokenBucket과 동일
+    - 슬롯이 비면 정책 키가 가장 작은 대기 요청에 직접 넘겨줌
+    - policy: fifo | sjf | srpt | aged_srpt | callable(pred_ms, remaining_ms, arrival_ms, aging)
+    - aging: 1ms 기다릴 때마다 깎아주는 예상 시간(ms), 긴 작업 기아 방지
+    """
+    def __init__(self, functions: List[str], capacity: int,
+                 policy: Union[str, Callable] = "aged_srpt", aging: float = 0.5):
+        self.capacity = capacity
+        self.free: Dict[str, int] = {f: capacity for f in functions}
+        self.waiting: Dict[str, list] = {f: [] for f in functions}
+        self.key_fn = QUEUE_POLICIES[policy] if isinstance(policy, str) else policy
+        self.aging = aging
+        self.lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def view(self, f: str) -> _GateView:
+        return _GateView(self, f)
+
+    def depth(self, f: str) -> int:
+        return len(self.waiting[f])
+
+    def inflight(self, f: str) -> int:
+        return self.capacity - self.free[f]
+
+    def _enter(self, f: str, prio, waiter) -> bool:
+        # lock을 잡은 상태에서 호출, 바로 슬롯을 얻으면 True
+        if self.free[f] > 0 and not self.waiting[f]:
+            self.free[f] -= 1
+            return True
+        if prio is None:
+            prio = (0.0, 0.0, now_ms())
+        key = self.key_fn(prio[0], prio[1], prio[2], self.aging)
+        heapq.heappush(self.waiting[f], (key, next(self._seq), waiter))
+        return False
+
+    def _handoff(self, f: str):
+        # lock을 잡은 상태에서 호출, 슬롯을 넘겨받을 대기자(없으면 None)
+        q = self.waiting[f]
+        while q:
+            _, _, w = heapq.heappop(q)
+            if w.alive():
+                return w
+        self.free[f] += 1
+        if self.free[f] > self.capacity:
+            self.free[f] = self.capacity
+        return None
+
+    def acquire(self, f: str, prio=None):
+        w = _ThreadWaiter()
+        with self.lock:
+            if self._enter(f, prio, w):
+                return
+        w.ev.wait()
+
+    def release(self, f: str):
+        with self.lock:
+            w = self._handoff(f)
+        if w is not None:
+            w.wake()
+
+class AsyncPriorityGate(PriorityGate):
+    """PriorityGate의 asyncio 버전 (이벤트 루프 안에서만 사용)"""
+    async def acquire(self, f: str, prio=None):
+        w = _AsyncWaiter()
+        with self.lock:
+            if self._enter(f, prio, w):
+                return
+        try:
+            await w.fut
+        except asyncio.CancelledError:
+            # 슬롯을 넘겨받은 직후 취소됐다면 되돌려줌
+            if w.fut.done() and not w.fut.cancelled():
+                self.release(f)
+            raise
+
+class LatencyIndex:
+    """
+    EWMA 기준 후보 인덱스 (함수 수가 많아도 후보 선택이 빠르도록)
+    - healthy: (ewma, ver, f) 최소 힙, 갱신 전 항목은 ver로 걸러냄(lazy delete)
+    - quarantine: (until, ver, f) 힙, 만료 시각이 지나면 healthy로 복귀
+    - update는 O(log n), pick(k)는 O(k log n), 둘 다 lock 1회
+    - pick(k, where=조건): EWMA 순으로 훑다가 조건에 맞는 k개를 찾으면 멈춤
+    """
+    def __init__(self, functions: List[str], init: float):
+        self.funcs = list(functions)
+        self.lock = threading.Lock()
+        self._val: Dict[str, float] = {f: init for f in self.funcs}
+        self._ver: Dict[str, int] = {f: 0 for f in self.funcs}
+        self._healthy = [(init, 0, f) for f in self.funcs]
+        heapq.heapify(self._healthy)
+        self._quar = []
+
+    def update(self, f: str, value: float, until: float, now: float):
+        with self.lock:
+            self._val[f] = value
+            ver = self._ver[f] + 1
+            self._ver[f] = ver
+            if until > now:
+                heapq.heappush(self._quar, (until, ver, f))
+            else:
+                heapq.heappush(self._healthy, (value, ver, f))
+            if len(self._healthy) > 2 * len(self.funcs) + 64:
+                self._compact()
+
+    def _compact(self):
+        # 오래된 항목 정리 (lock을 잡은 상태에서 호출)
+        self._healthy = [e for e in self._healthy if e[1] == self._ver[e[2]]]
+        heapq.heapify(self._healthy)
+
+    def pick(self, k: int, now: float, where: Optional[Callable[[str], bool]] = None) -> List[str]:
+        with self.lock:
+            quar, healthy, ver = self._quar, self._healthy, self._ver
+            while quar and quar[0][0] <= now:
+                _, v, f = heapq.heappop(quar)
+                if v == ver[f]:
+                    heapq.heappush(healthy, (self._val[f], v, f))
+            out, keep = [], []
+            while healthy and len(out) < k:
+                e = heapq.heappop(healthy)
+                if e[1] != ver[e[2]]:
+                    continue
+                keep.append(e)
+                if where is None or where(e[2]):
+                    out.append(e[2])
+            for e in keep:
+                heapq.heappush(healthy, e)
+            if not healthy:
+                # 전부 격리 중이면 원래처럼 전체에서 EWMA 순
+                funcs = self.funcs if where is None else filter(where, self.funcs)
+                out = heapq.nsmallest(k, funcs, key=self._val.__getitem__)
+            return out
+
+class LoadTracker:
+    """함수별 대기(토큰 대기) / 실행 중(in-flight) 요청 수"""
+    def __init__(self, functions: List[str]):
+        self.lock = threading.Lock()
+        self.waiting: Dict[str, int] = {f: 0 for f in functions}
+        self.inflight: Dict[str, int] = {f: 0 for f in functions}
+    def add(self, f: str, waiting: int = 0, inflight: int = 0):
+        with self.lock:
+            self.waiting[f] += waiting
+            self.inflight[f] += inflight
+    def depth(self, f: str) -> int:
+        return self.waiting[f] + self.inflight[f]
+
+class HedgeStats:
+    """실행(run) 단위 hedge 카운터"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fired = 0            # 복제 요청 발사 수
+        self.won = 0              # 복제 요청이 먼저 성공한 수
+        self.cancelled = 0        # 진 쪽을 취소한 수
+        self.wasted_cpu_ms = 0.0  # 진 쪽이 함수 Pod에서 쓴 CPU 시간
+    def add(self, fired=0, won=0, cancelled=0, wasted_cpu_ms=0.0):
+        with self.lock:
+            self.fired += fired
+            self.won += won
+            self.cancelled += cancelled
+            self.wasted_cpu_ms += wasted_cpu_ms
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"hedges_fired": self.fired, "hedges_won": self.won,
+                    "hedges_cancelled": self.cancelled,
+                    "wasted_cpu_ms": round(self.wasted_cpu_ms, 3)}
+
+class WarmTracker:
+    """
+    함수별 warm 인스턴스(replica) 추적과 cold start 판정
+    - handler가 보고한 instance {"id", "start_ns", "seq"}:
+      seq == 1(그 프로세스의 첫 호출)이거나 요청을 보낸 뒤에 시작된 프로세스면 cold
+    - 보고가 없으면 지연 모양으로 추정: warm_ttl_ms 넘게 응답이 없던 함수에서
+      EWMA의 cold_factor배, EWMA + cold_min_ms 둘 다 넘는 응답
+    - warm_ttl_ms 동안 응답(ping 포함)이 없던 인스턴스는 scale-down 되었다고 보고 뺌
+    - warm 용량 = warm 인스턴스 수 x replica_concurrency (0이면 인스턴스가 하나라도 있으면 warm)
+    """
+    def __init__(self, functions: List[str], warm_ttl_ms: float = 60000.0,
+                 replica_concurrency: int = 0, cold_factor: float = 4.0, cold_min_ms: float = 200.0):
+        self.lock = threading.Lock()
+        self.warm_ttl_ms = warm_ttl_ms
+        self.replica_concurrency = replica_concurrency
+        self.cold_factor = cold_factor
+        self.cold_min_ms = cold_min_ms
+        self.seen: Dict[str, Dict[str, float]] = {f: {} for f in functions}  # 인스턴스 id -> 마지막 응답 시각
+        self.cold: Dict[str, int] = {f: 0 for f in functions}
+        self.pinged_cold = 0      # keep-warm ping이 깨운 인스턴스 수
+
+    def _see(self, f: str, iid: str, now: float):
+        seen = self.seen[f]
+        if seen.get(iid, -math.inf) < now:
+            seen[iid] = now
+
+    def observe(self, f: str, data: Optional[dict], elapsed: float, ewma: float,
+                t_send: float, now: float) -> bool:
+        """성공 응답 1건 -> cold start 여부 (t_send: 전송 시각 epoch ms)"""
+        inst = data.get("instance") if data else None
+        with self.lock:
+            if isinstance(inst, dict) and inst.get("id"):
+                start = inst.get("start_ns")
+                cold = inst.get("seq") == 1 or (start is not None and start / 1e6 >= t_send)
+                iid = str(inst["id"])
+            else:
+                last = max(self.seen[f].values(), default=-math.inf)
+                cold = (now - last >= self.warm_ttl_ms and
+                        elapsed >= max(ewma * self.cold_factor, ewma + self.cold_min_ms))
+                iid = ""
+            self._see(f, iid, now)
+            if cold:
+                self.cold[f] += 1
+        return cold
+
+    def ping(self, f: str, data: dict, now: float):
+        inst = data.get("instance") or {}
+        with self.lock:
+            self._see(f, str(inst.get("id", "")), now)
+            if inst.get("seq") == 1:
+                self.pinged_cold += 1
+
+    def warm(self, f: str, now: float) -> int:
+        with self.lock:
+            seen = self.seen[f]
+            for iid in [i for i, t in seen.items() if now - t >= self.warm_ttl_ms]:
+                del seen[iid]
+            return len(seen)
+
+    def cold_risk(self, f: str, inflight: int, now: float, cap: Optional[int] = None) -> bool:
+        """
+        다음 요청이 cold replica에 갈 가능성: warm 인스턴스가 없거나 warm 용량이 다 참
+        cap: 디스패처의 함수별 동시성 상한 -> warm 용량 이하면 넘치는 요청은 토큰을 기다리지 scale out 되지 않음
+        """
+        n = self.warm(f, now)
+        if n == 0:
+            return True
+        rc = self.replica_concurrency
+        if not rc or (cap is not None and cap <= n * rc):
+            return False
+        return inflight >= n * rc
+
+    def snapshot(self, now: float) -> dict:
+        return {"cold_starts": sum(self.cold.values()), "pinged_cold": self.pinged_cold,
+                "per_func": {f: {"cold": self.cold[f], "warm": self.warm(f, now)} for f in self.seen}}
+
+class _Attempt:
+    """
+    hedge 시도 1건
+    - 토큰버킷 슬롯은 정확히 한 번만 반환 (취소 시 즉시 반환)
+    - hedge_id가 있으면 handler가 취소 신호를 확인할 수 있음
+    - 취소하면 진행 중인 요청의 연결도 끊음 (GatewayClient pool backend)
+    """
+    def __init__(self, f: str, payload: dict, hedge_id: Optional[str] = None,
+                 arrival_ms: Optional[float] = None, rid: Optional[str] = None, idx: int = 0):
+        self.f = f
+        self.hedge_id = hedge_id
+        self.rid = rid          # 추적 요청 ID (X-Request-Id), idx: 0 = primary, 1 = hedge
+        self.idx = idx
+        self.arrival_ms = arrival_ms if arrival_ms is not None else now_ms()
+        self.payload = dict(payload, hedge_id=hedge_id) if hedge_id else payload
+        self.cancelled = False
+        self.abort = Abort()
+        self._bucket = None
+        self._lock = threading.Lock()
+    def hold(self, bucket) -> bool:
+        with self._lock:
+            if not self.cancelled:
+                self._bucket = bucket
+                return True
+        bucket.release()   # 슬롯을 받기 전에 이미 취소됨
+        return False
+    def release(self):
+        with self._lock:
+            b, self._bucket = self._bucket, None
+        if b is not None:
+            b.release()
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+        self.release()
+        self.abort.abort()
+
+class _DispatcherCore:
+    """
+    동기/비동기 디스패처가 공유하는 정책 상태
+    - 함수별 EWMA, 격리(slow_until), 후보 인덱스(LatencyIndex), 라운드로빈
+    - warm 인스턴스 / cold start 추적 (WarmTracker)
+    - hedge 취소 설정과 카운터
     """
     def __init__(
         self,
         gateway_url: str,
         functions: List[str],
-        session: Optional[requests.Session] = None,
         alpha: float = 0.25,
-        hedge_ms: float = 40.0,      # 이 시간 기다리면 1회 복제 발사
+        hedge_ms: float = 40.0,
         ewma_init: float = 120.0,
-        ewma_slow_threshold: float = 180.0,   # EWMA가 이걸 넘으면 느리다고 판단
-        quarantine_ms: float = 1000.0,        # 격리 유지 시간
-        per_func_concurrency: int = 2,        # 함수별 동시 실행 상한
-        request_timeout: int = 30
+        ewma_slow_threshold: float = 180.0,
+        quarantine_ms: float = 1000.0,
+        request_timeout: int = 30,
+        hedge_cancel: bool = True,
+        cancel_signal: bool = True,
+        hedge_quantile: Optional[float] = None,
+        hedge_key: str = "func",
+        hedge_min_samples: int = 20,
+        hedge_window: int = 2000,
+        queue_policy: Union[str, Callable, None] = None,
+        queue_aging: float = 0.5,
+        service_ms_per_arg: float = 3.0,
+        lb_policy: str = "ewma",
+        clock: Callable[[], float] = now_ms,
+        metrics: Optional[Metrics] = None,
+        tracer=None,
+        sched_hint: Union[str, Callable, None] = None,
+        response_mode: str = "json",
+        warm_ttl_ms: float = 60000.0,
+        replica_concurrency: int = 0,
+        cold_critical_ms: Optional[float] = None
     ):
         self.base = gateway_url.rstrip("/")
+        self.clock = clock      # ms, 시뮬레이터는 가상 시계를 넣음
         self.funcs = list(functions)
-        self.session = session or requests.Session()
         self.timeout = request_timeout
 
         self.lat: Dict[str, EWMA] = {f: EWMA(alpha=alpha, init=ewma_init) for f in self.funcs}
-        self.tb: Dict[str, TokenBucket] = {f: TokenBucket(per_func_concurrency) for f in self.funcs}
+        self.index = LatencyIndex(self.funcs, ewma_init)
+        self.load = LoadTracker(self.funcs)
+        # cold start는 EWMA/분위수에서 빼고 (격리 오판 방지), 짧은 요청은 warm 용량이 남은 함수로
+        self.warm = WarmTracker(self.funcs, warm_ttl_ms, replica_concurrency)
+        self.cold_critical_ms = cold_critical_ms    # 예상 서비스 시간이 이 이하면 cold 회피 (None: 끔)
+        self.func_cap = None    # 함수별 동시성 상한 (디스패처가 설정)
+        if lb_policy not in LB_POLICIES:
+            raise ValueError(f"unknown lb_policy: {lb_policy} (choose from {', '.join(LB_POLICIES)})")
+        self.lb_policy = lb_policy
+        self._rng = random.Random()
 
         self.slow_until: Dict[str, float] = {f: 0.0 for f in self.funcs}
         self.ewma_slow_threshold = ewma_slow_threshold
         self.quarantine_ms = quarantine_ms
         self.hedge_ms = hedge_ms
 
+        self.hedge_cancel = hedge_cancel
+        self.cancel_signal = cancel_signal
+        self.stats = HedgeStats()
+
+        # 적응형 hedge 타임아웃: 키(func / arg / func_arg)별 지연 분위수
+        self.hedge_quantile = hedge_quantile
+        self.hedge_key = hedge_key
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_window = hedge_window
+        self._sketch: Dict[Tuple, LogHistogram] = {}
+        self._hedge_cache: Dict[Tuple, Tuple[int, float]] = {}   # key -> (계산 시점 count, 지연)
+
+        # 크기 기반 대기열: None이면 함수별 TokenBucket (도착 순)
+        self.queue_policy = queue_policy
+        self.queue_aging = queue_aging
+        self.service_ms_per_arg = service_ms_per_arg    # handler의 SCALE_MS와 같은 값
+        self.gate = None
+
         self._rr = 0
         self._rr_lock = threading.Lock()
+        self.metrics = metrics or Metrics()
+        self._init_metrics()
+        self.tracer = tracer    # tracing.Tracer: 요청 ID가 있는 시도의 시각 기록
+        # 예상 서비스 시간으로 handler 쪽 스케줄링 정책 지정 (payload["sched"])
+        self.sched_hint = parse_sched_hint(sched_hint)
+        # lean: handler가 지표를 헤더로 보내고 본문(padding)은 읽어 버림 (JSON 인코딩/파싱 없음)
+        if response_mode not in ("json", "lean"):
+            raise ValueError(f"unknown response_mode: {response_mode} (json | lean)")
+        self.lean = response_mode == "lean"
+
+    # 단계: pick(후보 선택) / token_wait(토큰·대기열) / hedge_wait(복제 발사까지)
+    #       http(전송~응답 본문) / decode(JSON) / invoke(전체)
+    STAGES = ("pick", "token_wait", "hedge_wait", "http", "decode", "invoke")
+
+    def _init_metrics(self):
+        m = self.metrics
+        self.m_stage = {s: m.histogram("stage_seconds", "client-side time per dispatch stage", stage=s)
+                        for s in self.STAGES}
+        self.m_func = {f: m.histogram("function_seconds", "request latency per function", function=f)
+                       for f in self.funcs}
+        self.m_req = {f: m.counter("requests_total", "attempts sent", function=f) for f in self.funcs}
+        self.m_err = {f: m.counter("errors_total", "failed attempts", function=f) for f in self.funcs}
+        self.m_quar = {f: m.counter("quarantined_total", "times put into quarantine", function=f)
+                       for f in self.funcs}
+        for f in self.funcs:
+            m.gauge("ewma_ms", lambda f=f: self.lat[f].value(), "latency EWMA", function=f)
+            m.gauge("waiting", lambda f=f: self.load.waiting[f], "attempts waiting for a token", function=f)
+            m.gauge("inflight", lambda f=f: self.load.inflight[f], "attempts in flight", function=f)
+            m.gauge("quarantined", lambda f=f: float(self._is_slow(f)), "1 while quarantined", function=f)
+            m.gauge("warm_instances", lambda f=f: self.warm.warm(f, self.clock()),
+                    "instances seen within warm_ttl_ms", function=f)
+        self.m_cold = {f: m.counter("cold_starts_total", "responses from a cold instance", function=f)
+                       for f in self.funcs}
+        self.m_cold_ms = m.histogram("cold_start_seconds", "latency of cold-start responses")
+        self.m_cold_avoided = m.counter("cold_avoided_total",
+                                        "latency-critical requests moved off a cold-risk function")
+        for k in ("hedges_fired", "hedges_won", "hedges_cancelled", "wasted_cpu_ms"):
+            m.gauge(k, lambda k=k: self.stats.snapshot()[k], "hedge counters")
 
     def _mark_slow_if_needed(self, f: str):
         if self.lat[f].value() >= self.ewma_slow_threshold:
-            self.slow_until[f] = now_ms() + self.quarantine_ms
+            now = self.clock()
+            if now >= self.slow_until[f]:
+                self.m_quar[f].inc()
+            self.slow_until[f] = now + self.quarantine_ms
 
     def _is_slow(self, f: str) -> bool:
-        return now_ms() < self.slow_until[f]
+        return self.clock() < self.slow_until[f]
 
-    def _pick_fast_candidates(self, k: int = 2) -> List[str]:
-        healthy = [f for f in self.funcs if not self._is_slow(f)]
-        if not healthy:
-            healthy = self.funcs[:] 
-        healthy.sort(key=lambda f: self.lat[f].value())
-        return healthy[:k]
+    def _pick_fast_candidates(self, k: int = 2, where: Optional[Callable[[str], bool]] = None) -> List[str]:
+        return self.index.pick(k, self.clock(), where)
 
     def _rr_next(self) -> str:
         with self._rr_lock:
@@ -93,56 +597,591 @@ class CustomDispatcher:
             self._rr += 1
             return f
 
-    def _post(self, f: str, payload: dict):
+    def _pick_pair(self, payload: Optional[dict] = None) -> Tuple[str, str]:
+        if self.lb_policy == "p2c":
+            cands = self._pick_p2c()
+        elif self.lb_policy in ("jsq", "lect"):
+            cands = self._pick_by_load()
+        else:
+            cands = self._pick_fast_candidates(k=3)
+        if self.cold_critical_ms is not None and payload is not None:
+            cands = self._prefer_warm(cands, payload)
+        primary = cands[0] if cands else self._rr_next()
+        backup  = (cands[1] if len(cands) > 1 else self._rr_next())
+        return primary, backup
+
+    def _load_key(self, f: str):
+        depth = self.load.depth(f)
+        ewma = self.lat[f].value()
+        if self.lb_policy == "lect":
+            # 예상 완료 시간 = (앞에 있는 요청 + 자신) * 평균 지연
+            return ((depth + 1) * ewma, ewma)
+        return (depth, ewma)
+
+    def _pick_p2c(self) -> List[str]:
+        # 격리되지 않은 함수 2개를 무작위로 뽑아 덜 붐비는 쪽을 primary로
+        picked = []
+        for _ in range(8):
+            f = self._rng.choice(self.funcs)
+            if f not in picked and not self._is_slow(f):
+                picked.append(f)
+                if len(picked) == 2:
+                    break
+        if len(picked) < 2:
+            for f in self._pick_fast_candidates(k=2):
+                if f not in picked:
+                    picked.append(f)
+        return sorted(picked[:2], key=self._load_key)
+
+    def _pick_by_load(self) -> List[str]:
+        healthy = [f for f in self.funcs if not self._is_slow(f)] or self.funcs
+        return heapq.nsmallest(2, healthy, key=self._load_key)
+
+    def _cold_risk(self, f: str) -> bool:
+        return self.warm.cold_risk(f, self.load.inflight[f], self.clock(), self.func_cap)
+
+    def _prefer_warm(self, cands: List[str], payload: dict) -> List[str]:
+        """지연에 민감한(짧은) 요청은 warm 용량이 남은 함수를 앞으로, 후보에 없으면 빠른 순으로 찾음"""
+        if self._predict_ms(payload) > self.cold_critical_ms:
+            return cands
+        warm = [f for f in cands if not self._cold_risk(f)]
+        if len(warm) < 2:
+            # 빠른 순으로 훑다가 warm 2개를 찾으면 멈춤 (전체 정렬 없음)
+            warm += self._pick_fast_candidates(
+                k=2 - len(warm), where=lambda f: f not in warm and not self._cold_risk(f))
+        if not warm:
+            return cands    # 전부 cold (첫 요청들) -> 원래 순서
+        if cands and warm[0] != cands[0]:
+            self.m_cold_avoided.inc()
+        return warm + [f for f in cands if f not in warm]
+
+    def _is_cold(self, f: str, data: dict, elapsed: float, t_send: float) -> bool:
+        """성공 응답이 cold start였는지 (함수가 느린 게 아니라 replica가 새로 뜬 것 -> 지연 통계에서 제외)"""
+        cold = self.warm.observe(f, data, elapsed, self.lat[f].value(), t_send, self.clock())
+        if cold:
+            self.m_cold[f].inc()
+            self.m_cold_ms.observe(elapsed)
+        return cold
+
+    def note_ping(self, f: str, data: dict, elapsed: float = 0.0):
+        """keep-warm ping 응답 (keep_warm.KeepWarm의 on_reply): warm 인스턴스만 갱신, 지연 통계와 무관"""
+        if data and f in self.warm.seen:
+            self.warm.ping(f, data, self.clock())
+
+    def _account(self, f: str, attempt: "_Attempt", ok: bool, data: dict, elapsed: float,
+                 t_send: float):
+        """끝난 시도 1건을 지연 통계(EWMA / 분위수)에 반영"""
+        if attempt.cancelled or (ok and data.get("cancelled")):
+            # hedge에서 진 쪽: 취소로 잘린 시간은 실제 지연이 아님 (실제 지연 >= elapsed)
+            # -> EWMA를 올리는 경우에만 반영(censored), 분위수에는 넣지 않음
+            if elapsed > self.lat[f].value():
+                self._record(f, elapsed)
+            return
+        if ok and self._is_cold(f, data, elapsed, t_send):
+            return
+        self._record(f, elapsed)
+        if ok:
+            self._observe(f, attempt.payload, elapsed)
+
+    def _record(self, f: str, elapsed: float):
+        self.lat[f].update(elapsed)
+        self._mark_slow_if_needed(f)
+        self.index.update(f, self.lat[f].value(), self.slow_until[f], self.clock())
+
+    def _lat_key(self, f: str, payload: dict) -> Tuple:
+        arg = str(payload.get("arg")) if payload else None
+        if self.hedge_key == "arg":
+            return (None, arg)
+        if self.hedge_key == "func_arg":
+            return (f, arg)
+        return (f, None)
+
+    def _observe(self, f: str, payload: dict, elapsed: float):
+        keys = []
+        if self.hedge_quantile is not None:
+            keys.append(self._lat_key(f, payload))
+        if self.gate is not None or self.sched_hint is not None:
+            # 대기열 / 정책 힌트의 서비스 시간 예측은 arg별 분포를 사용
+            arg_key = (None, str(payload.get("arg")) if payload else None)
+            if arg_key not in keys:
+                keys.append(arg_key)
+        for key in keys:
+            sk = self._sketch.get(key)
+            if sk is None:
+                sk = self._sketch.setdefault(key, LogHistogram(window=self.hedge_window))
+            sk.add(elapsed)
+
+    def _hedge_delay_ms(self, f: str, payload: dict) -> float:
+        """표본이 충분하면 관측 지연의 hedge_quantile 분위수, 아니면 고정 hedge_ms"""
+        if self.hedge_quantile is None:
+            return self.hedge_ms
+        key = self._lat_key(f, payload)
+        sk = self._sketch.get(key)
+        if sk is None or sk.count < self.hedge_min_samples:
+            return self.hedge_ms
+        cached = self._hedge_cache.get(key)
+        if cached is not None and abs(sk.count - cached[0]) < 16:
+            return cached[1]   # 분위수는 16개 표본마다 다시 계산
+        d = sk.quantile(self.hedge_quantile)
+        self._hedge_cache[key] = (sk.count, d)
+        return d
+
+    def _predict_ms(self, payload: dict) -> float:
+        """예상 서비스 시간: arg별 관측 중앙값, 없으면 arg * service_ms_per_arg"""
+        arg = payload.get("arg") if payload else None
+        sk = self._sketch.get((None, str(arg)))
+        if sk is not None and sk.count >= self.hedge_min_samples:
+            return sk.quantile(0.5)
+        try:
+            return float(arg) * self.service_ms_per_arg
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _queue_prio(self, attempt: "_Attempt"):
+        if self.gate is None:
+            return None
+        pred = self._predict_ms(attempt.payload)
+        # hedge 복제본은 이미 기다린 만큼 남은 시간이 줄어든 것으로 봄
+        remaining = max(0.0, pred - (self.clock() - attempt.arrival_ms))
+        return (pred, remaining, attempt.arrival_ms)
+
+    def _new_attempt(self, f: str, payload: dict, arrival_ms: Optional[float] = None,
+                     rid: Optional[str] = None, idx: int = 0) -> _Attempt:
+        hid = uuid.uuid4().hex if (self.hedge_cancel and self.cancel_signal) else None
+        if self.sched_hint is not None and "sched" not in payload:
+            spec = self.sched_hint(self._predict_ms(payload))
+            if spec:
+                payload = dict(payload, sched=spec)
+        return _Attempt(f, payload, hid, arrival_ms, rid, idx)
+
+    def _headers(self, attempt: _Attempt) -> Optional[dict]:
+        h = dict(LEAN_HEADERS) if self.lean else None
+        if attempt.rid is not None:
+            h = h or {}
+            h["X-Request-Id"] = attempt.rid
+        return h
+
+    def _trace(self, attempt: _Attempt, t_wait, t_send, t_recv, t_done, ok, data):
+        if attempt.rid is not None and self.tracer is not None:
+            self.tracer.attempt(attempt.rid, attempt.idx, attempt.f, t_wait, t_send, t_recv,
+                                t_done, ok, data)
+
+    def _account_loser(self, res):
+        # 취소하지 않은 진 쪽은 끝까지 실행됨 -> handler가 보고한 실행 시간을 낭비로 집계
+        if res and res[1]:
+            try:
+                self.stats.add(wasted_cpu_ms=float(res[1].get("elapsed_ms") or 0.0))
+            except (TypeError, ValueError):
+                pass
+
+    def _account_cancel_ack(self, data: dict):
+        try:
+            self.stats.add(wasted_cpu_ms=float(data.get("ran_ms") or 0.0))
+        except (TypeError, ValueError):
+            pass
+
+    def _observe_post(self, f: str, ok: bool, elapsed: float, decode_s: Optional[float]):
+        if decode_s is not None:
+            self.m_stage["decode"].observe(decode_s * 1000.0)
+            self.m_stage["http"].observe(max(0.0, elapsed - decode_s * 1000.0))
+        if ok:
+            self.m_func[f].observe(elapsed)
+        else:
+            self.m_err[f].inc()
+
+class CustomDispatcher(_DispatcherCore):
+    """
+    - EWMA로 함수별 지연 추정
+    - 느려진 함수는 격리(사용 중단) 후 회복 감시
+    - P95 지연(대략치)을 hedge 타임아웃으로 사용, 다른 빠른 후보에 1회 복제
+      (hedge_quantile을 주면 함수/arg별 스트리밍 분위수, 없으면 고정 hedge_ms)
+    - 함수별 동시성 상한으로 큐 폭주 억제
+      (queue_policy를 주면 대기 요청을 예상 서비스 시간 순으로 통과시킴)
+    - sched_hint: 예상 서비스 시간에 따라 handler 쪽 스케줄링 정책을 payload에 붙임
+    - lb_policy: 후보 선택 기준 (EWMA / power-of-two / 최소 대기열 / 최소 예상 완료)
+    - cold start(새 replica의 첫 호출)는 EWMA에서 빼고, cold_critical_ms 이하 요청은 warm 함수로
+    - hedge_cancel: 진 쪽의 토큰을 즉시 반환하고 handler에 취소 신호 전송
+    """
+    def __init__(
+        self,
+        gateway_url: str,
+        functions: List[str],
+        session: Optional[GatewayClient] = None,   # requests.Session도 가능
+        alpha: float = 0.25,
+        hedge_ms: float = 40.0,      # 이 시간 기다리면 1회 복제 발사
+        ewma_init: float = 120.0,
+        ewma_slow_threshold: float = 180.0,   # EWMA가 이걸 넘으면 느리다고 판단
+        quarantine_ms: float = 1000.0,        # 격리 유지 시간
+        per_func_concurrency: int = 2,        # 함수별 동시 실행 상한
+        request_timeout: int = 30,
+        hedge_cancel: bool = True,            # 진 쪽 요청 취소
+        cancel_signal: bool = True,           # handler에 취소 신호 전송
+        hedge_quantile: Optional[float] = None,   # 예: 0.95 -> 관측 P95를 hedge 타임아웃으로
+        hedge_key: str = "func",              # 분위수 키: func | arg | func_arg
+        hedge_min_samples: int = 20,          # 이보다 적으면 hedge_ms 사용
+        queue_policy: Union[str, Callable, None] = None,   # fifo | sjf | srpt | aged_srpt
+        queue_aging: float = 0.5,             # aged_srpt: 1ms 대기당 깎는 예상 시간
+        lb_policy: str = "ewma",              # ewma | p2c | jsq | lect
+        max_threads: int = 1024,              # 공유 스레드 풀 상한 (필요할 때만 생성)
+        metrics: Optional[Metrics] = None,    # 단계별 계측 (없으면 자체 레지스트리)
+        tracer=None,                          # tracing.Tracer (요청 ID를 받은 invoke만 기록)
+        sched_hint: Union[str, Callable, None] = None,  # 예: "fifo:60<50,batch" (parse_sched_hint)
+        response_mode: str = "json",          # json | lean (지표는 응답 헤더, 본문은 버림)
+        warm_ttl_ms: float = 60000.0,         # 이 시간 응답이 없던 replica는 scale-down으로 봄
+        replica_concurrency: int = 0,         # replica당 동시 실행 수 (warm 용량, 0: 따지지 않음)
+        cold_critical_ms: Optional[float] = None   # 예상 서비스 시간이 이 이하인 요청은 cold 회피
+    ):
+        super().__init__(gateway_url, functions, alpha=alpha, hedge_ms=hedge_ms,
+                         ewma_init=ewma_init, ewma_slow_threshold=ewma_slow_threshold,
+                         quarantine_ms=quarantine_ms, request_timeout=request_timeout,
+                         hedge_cancel=hedge_cancel, cancel_signal=cancel_signal,
+                         hedge_quantile=hedge_quantile, hedge_key=hedge_key,
+                         hedge_min_samples=hedge_min_samples,
+                         queue_policy=queue_policy, queue_aging=queue_aging,
+                         lb_policy=lb_policy, metrics=metrics, tracer=tracer,
+                         sched_hint=sched_hint, response_mode=response_mode,
+                         warm_ttl_ms=warm_ttl_ms, replica_concurrency=replica_concurrency,
+                         cold_critical_ms=cold_critical_ms)
+        # 진 쪽 연결은 취소 시 끊지만 (pool backend) 다른 backend는 끝날 때까지 쥐고 있으므로 여유 있게
+        self.session = session or GatewayClient(
+            gateway_url, pool_size=max(64, 4 * per_func_concurrency * len(self.funcs)),
+            timeout=request_timeout, metrics=self.metrics)
+        self._abortable = isinstance(self.session, GatewayClient)  # 진 쪽 연결을 끊을 수 있음
+        # discard는 GatewayClient 전용 인자 (requests.Session은 본문을 r.content로 다 읽고 헤더만 씀)
+        self._post_kw = {"discard": True} if self.lean and self._abortable else {}
+        self.func_cap = per_func_concurrency
+        if queue_policy is not None:
+            self.gate = PriorityGate(self.funcs, per_func_concurrency, queue_policy, queue_aging)
+            self.tb = {f: self.gate.view(f) for f in self.funcs}
+        else:
+            self.tb: Dict[str, TokenBucket] = {f: TokenBucket(per_func_concurrency) for f in self.funcs}
+        # invoke마다 풀을 만들지 않음: 진 쪽 요청이 invoke 반환을 막지 않도록 공유
+        self._pool = ThreadPoolExecutor(max_workers=max_threads)
+
+    def _post(self, f: str, payload: dict, attempt: Optional[_Attempt] = None):
         url = f"{self.base}/function/{f}"
-        self.tb[f].acquire()
+        attempt = attempt or _Attempt(f, payload)
+        self.load.add(f, waiting=1)
+        t_wait = now_ms()
+        tw = time.perf_counter()
+        self.tb[f].acquire(self._queue_prio(attempt))
+        self.m_stage["token_wait"].observe((time.perf_counter() - tw) * 1000.0)
+        self.load.add(f, waiting=-1)
+        if not attempt.hold(self.tb[f]):
+            self._trace(attempt, t_wait, None, None, None, False, None)
+            return False, {}, 0.0, f
+        self.load.add(f, inflight=1)
+        self.m_req[f].inc()
         t0 = now_ms()
+        t_recv = decode_s = None
         try:
-            r = self.session.post(url, json=payload, timeout=self.timeout)
+            kw = dict(self._post_kw, abort=attempt.abort) if self._abortable else self._post_kw
+            r = self.session.post(url, json=attempt.payload, headers=self._headers(attempt),
+                                  timeout=self.timeout, **kw)
             ok = (r.status_code == 200)
-            data = r.json() if ok else {}
+            t_recv = now_ms()
+            td = time.perf_counter()
+            data = (lean_data(r.headers) if self.lean else r.json()) if ok else {}
+            decode_s = time.perf_counter() - td
         except Exception:
             ok = False
             data = {}
         finally:
-            self.tb[f].release()
+            attempt.release()
+            self.load.add(f, inflight=-1)
         t1 = now_ms()
         elapsed = max(0.0, t1 - t0)
+        self._observe_post(f, ok, elapsed, decode_s)
+        self._trace(attempt, t_wait, t0, t_recv, t1, ok, data)
 
-        self.lat[f].update(elapsed)
-        self._mark_slow_if_needed(f)
+        self._account(f, attempt, ok, data, elapsed, t0)
         return ok, data, elapsed, f
 
-    def invoke(self, payload: dict):
+    def _send_cancel(self, attempt: _Attempt):
+        try:
+            r = self.session.post(f"{self.base}/function/{attempt.f}",
+                                  json={"cancel": attempt.hedge_id}, timeout=5)
+            if r.status_code == 200:
+                self._account_cancel_ack(r.json())
+        except Exception:
+            pass
+
+    def _settle(self, backup_won: bool, losers: List):
+        if backup_won:
+            self.stats.add(won=1)
+        for fut, attempt in losers:
+            if fut.done():
+                continue
+            if self.hedge_cancel:
+                attempt.cancel()
+                self.stats.add(cancelled=1)
+                if attempt.hedge_id:
+                    # 낭비 CPU는 handler의 취소 응답(ran_ms)으로 집계
+                    self._pool.submit(self._send_cancel, attempt)
+                    continue
+            fut.add_done_callback(lambda fu: self._account_loser(fu.result()))
+
+    def invoke(self, payload: dict, request_id: Optional[str] = None):
         """
         1) 빠른 후보 1개에 즉시 전송
-        2) hedge_ms가 지나면 다른 빠른 후보에 1회 복제
-        3) 먼저 성공한 쪽을 채택(나머지는 버림)
+        2) hedge 지연(hedge_ms 또는 관측 분위수)이 지나면 다른 빠른 후보에 1회 복제
+        3) 먼저 성공한 쪽을 채택(나머지는 취소 또는 버림)
         """
-        cands = self._pick_fast_candidates(k=3)
-        primary = cands[0] if cands else self._rr_next()
-        backup  = (cands[1] if len(cands) > 1 else self._rr_next())
+        arrival = now_ms()
+        t_in = time.perf_counter()
+        try:
+            return self._invoke(payload, arrival, t_in, request_id)
+        finally:
+            self.m_stage["invoke"].observe((time.perf_counter() - t_in) * 1000.0)
 
-        with ThreadPoolExecutor(max_workers=2) as ex:
-            fut1 = ex.submit(self._post, primary, payload)
+    def _invoke(self, payload: dict, arrival: float, t_in: float, rid: Optional[str]):
+        primary, backup = self._pick_pair(payload)
+        self.m_stage["pick"].observe((time.perf_counter() - t_in) * 1000.0)
 
-            t0 = now_ms()
-            while True:
-                if fut1.done():
-                    break
-                if now_ms() - t0 >= self.hedge_ms:
-                    fut2 = ex.submit(self._post, backup, payload)
-                    done, = next(as_completed([fut1, fut2], timeout=self.timeout), None),
-                    
-                    res1 = fut1.result() if fut1.done() else None
-                    res2 = fut2.result() if fut2.done() else None
+        a1 = self._new_attempt(primary, payload, arrival, rid, 0)
+        fut1 = self._pool.submit(self._post, primary, a1.payload, a1)
+        done, _ = wait([fut1], timeout=self._hedge_delay_ms(primary, payload) / 1000.0)
+        if done:
+            return fut1.result()
 
-                    for res in [res1, res2]:
-                        if res and res[0]:
-                            return res
+        self.stats.add(fired=1)
+        self.m_stage["hedge_wait"].observe((time.perf_counter() - t_in) * 1000.0)
+        a2 = self._new_attempt(backup, payload, arrival, rid, 1)
+        fut2 = self._pool.submit(self._post, backup, a2.payload, a2)
 
-                    return res1 or res2
+        first = None
+        pending = {fut1, fut2}
+        while pending:
+            done, pending = wait(pending, timeout=self.timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                res = fut.result()
+                if res[0]:
+                    other = (fut2, a2) if fut is fut1 else (fut1, a1)
+                    self._settle(fut is fut2, [other])
+                    return res
+                first = first or res
+        if first is None:
+            # timeout 안에 둘 다 끝나지 않음 (토큰/대기열 대기 포함) -> 포기하고 실패로 반환
+            self._settle(False, [(fut1, a1), (fut2, a2)])
+            first = (False, {}, max(0.0, now_ms() - arrival), primary)
+        return first
 
-                time.sleep(0.001)
-            return fut1.result()
+class AsyncCustomDispatcher(_DispatcherCore):
+    """
+    CustomDispatcher의 asyncio 버전 (EWMA / 격리 / 토큰버킷 의미는 동일)
+    - 요청마다 스레드를 만들지 않고 공유 aiohttp 커넥션 풀 위에서 동작
+    - hedge는 asyncio.wait(timeout=hedge 지연) 타이머로 발사
+    - 먼저 성공한 쪽을 채택하고 진 쪽 요청은 취소(커넥션 닫고 토큰 반환)
+
+        async with AsyncCustomDispatcher(url, funcs) as d:
+            ok, data, elapsed_ms, used = await d.invoke({"arg": "35"})
+    """
+    def __init__(
+        self,
+        gateway_url: str,
+        functions: List[str],
+        session: Optional["aiohttp.ClientSession"] = None,
+        alpha: float = 0.25,
+        hedge_ms: float = 40.0,
+        ewma_init: float = 120.0,
+        ewma_slow_threshold: float = 180.0,
+        quarantine_ms: float = 1000.0,
+        per_func_concurrency: int = 2,
+        request_timeout: int = 30,
+        hedge_cancel: bool = True,
+        cancel_signal: bool = True,
+        hedge_quantile: Optional[float] = None,
+        hedge_key: str = "func",
+        hedge_min_samples: int = 20,
+        queue_policy: Union[str, Callable, None] = None,
+        queue_aging: float = 0.5,
+        lb_policy: str = "ewma",
+        max_connections: int = 0,             # 0이면 커넥션 수 제한 없음
+        metrics: Optional[Metrics] = None,
+        tracer=None,
+        sched_hint: Union[str, Callable, None] = None,
+        response_mode: str = "json",
+        warm_ttl_ms: float = 60000.0,
+        replica_concurrency: int = 0,
+        cold_critical_ms: Optional[float] = None
+    ):
+        if aiohttp is None:
+            raise RuntimeError("AsyncCustomDispatcher requires aiohttp (pip install aiohttp)")
+        super().__init__(gateway_url, functions, alpha=alpha, hedge_ms=hedge_ms,
+                         ewma_init=ewma_init, ewma_slow_threshold=ewma_slow_threshold,
+                         quarantine_ms=quarantine_ms, request_timeout=request_timeout,
+                         hedge_cancel=hedge_cancel, cancel_signal=cancel_signal,
+                         hedge_quantile=hedge_quantile, hedge_key=hedge_key,
+                         hedge_min_samples=hedge_min_samples,
+                         queue_policy=queue_policy, queue_aging=queue_aging,
+                         lb_policy=lb_policy, metrics=metrics, tracer=tracer,
+                         sched_hint=sched_hint, response_mode=response_mode,
+                         warm_ttl_ms=warm_ttl_ms, replica_concurrency=replica_concurrency,
+                         cold_critical_ms=cold_critical_ms)
+        self.session = session
+        self._own_session = session is None
+        self.max_connections = max_connections
+        self.func_cap = per_func_concurrency
+        if queue_policy is not None:
+            self.gate = AsyncPriorityGate(self.funcs, per_func_concurrency, queue_policy, queue_aging)
+            self.tb = {f: self.gate.view(f) for f in self.funcs}
+        else:
+            self.tb: Dict[str, AsyncTokenBucket] = {f: AsyncTokenBucket(per_func_concurrency) for f in self.funcs}
+        self._bg = set()    # 취소 신호 등 백그라운드 태스크 (GC 방지)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def start(self):
+        if self.session is None:
+            conn = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+            self.session = aiohttp.ClientSession(
+                connector=conn, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self._bg:
+            await asyncio.gather(*self._bg, return_exceptions=True)
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
 
+    def _spawn(self, coro):
+        t = asyncio.ensure_future(coro)
+        self._bg.add(t)
+        t.add_done_callback(self._bg.discard)
+        return t
+
+    async def _post(self, f: str, payload: dict, attempt: Optional[_Attempt] = None):
+        url = f"{self.base}/function/{f}"
+        attempt = attempt or _Attempt(f, payload)
+        self.load.add(f, waiting=1)
+        t_wait = now_ms()
+        tw = time.perf_counter()
+        try:
+            await self.tb[f].acquire(self._queue_prio(attempt))
+        finally:
+            self.load.add(f, waiting=-1)
+        self.m_stage["token_wait"].observe((time.perf_counter() - tw) * 1000.0)
+        if not attempt.hold(self.tb[f]):
+            self._trace(attempt, t_wait, None, None, None, False, None)
+            return False, {}, 0.0, f
+        self.load.add(f, inflight=1)
+        self.m_req[f].inc()
+        t0 = now_ms()
+        t_recv = decode_s = None
+        try:
+            async with self.session.post(url, json=attempt.payload,
+                                         headers=self._headers(attempt)) as r:
+                ok = (r.status == 200)
+                if self.lean:
+                    async for _ in r.content.iter_chunked(1 << 16):
+                        pass
+                    body = b""
+                else:
+                    body = await r.read() if ok else b""
+                t_recv = now_ms()
+                td = time.perf_counter()
+                data = (lean_data(r.headers) if self.lean else json.loads(body)) if ok else {}
+                decode_s = time.perf_counter() - td
+        except asyncio.CancelledError:
+            # hedge에서 진 쪽: 잘린 시간은 지연 통계에 넣지 않음
+            self._trace(attempt, t_wait, t0, None, None, False, None)
+            raise
+        except Exception:
+            ok = False
+            data = {}
+        finally:
+            attempt.release()
+            self.load.add(f, inflight=-1)
+        t1 = now_ms()
+        elapsed = max(0.0, t1 - t0)
+        self._observe_post(f, ok, elapsed, decode_s)
+        self._trace(attempt, t_wait, t0, t_recv, t1, ok, data)
+
+        self._account(f, attempt, ok, data, elapsed, t0)
+        return ok, data, elapsed, f
+
+    async def _send_cancel(self, attempt: _Attempt):
+        try:
+            async with self.session.post(f"{self.base}/function/{attempt.f}",
+                                         json={"cancel": attempt.hedge_id}) as r:
+                if r.status == 200:
+                    self._account_cancel_ack(await r.json(content_type=None))
+        except Exception:
+            pass
+
+    def _settle(self, backup_won: bool, losers: List):
+        if backup_won:
+            self.stats.add(won=1)
+        for t, attempt in losers:
+            if t.done():
+                continue
+            if self.hedge_cancel:
+                attempt.cancel()
+                t.cancel()          # aiohttp 커넥션을 닫음
+                self.stats.add(cancelled=1)
+                if attempt.hedge_id:
+                    self._spawn(self._send_cancel(attempt))
+            else:
+                t.add_done_callback(
+                    lambda tt: None if tt.cancelled() else self._account_loser(tt.result()))
+
+    async def invoke(self, payload: dict, request_id: Optional[str] = None):
+        """
+        1) 빠른 후보 1개에 즉시 전송
+        2) hedge 지연 안에 끝나지 않으면 다른 빠른 후보에 1회 복제
+        3) 먼저 성공한 쪽을 채택, 남은 요청은 취소(hedge_cancel=False면 끝까지 실행)
+        """
+        if self.session is None:
+            self.start()
+        arrival = now_ms()
+        t_in = time.perf_counter()
+        try:
+            return await self._invoke(payload, arrival, t_in, request_id)
+        finally:
+            self.m_stage["invoke"].observe((time.perf_counter() - t_in) * 1000.0)
+
+    async def _invoke(self, payload: dict, arrival: float, t_in: float, rid: Optional[str]):
+        primary, backup = self._pick_pair(payload)
+        self.m_stage["pick"].observe((time.perf_counter() - t_in) * 1000.0)
+
+        a1 = self._new_attempt(primary, payload, arrival, rid, 0)
+        t1 = asyncio.ensure_future(self._post(primary, a1.payload, a1))
+        pending = {t1}
+        settled = False
+        try:
+            done, pending = await asyncio.wait(
+                pending, timeout=self._hedge_delay_ms(primary, payload) / 1000.0)
+            if done:
+                settled = True
+                return t1.result()
+
+            self.stats.add(fired=1)
+            self.m_stage["hedge_wait"].observe((time.perf_counter() - t_in) * 1000.0)
+            a2 = self._new_attempt(backup, payload, arrival, rid, 1)
+            t2 = asyncio.ensure_future(self._post(backup, a2.payload, a2))
+            pending.add(t2)
+            first = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    res = t.result()
+                    if res[0]:
+                        other = (t2, a2) if t is t1 else (t1, a1)
+                        self._settle(t is t2, [other])
+                        settled = True
+                        return res
+                    first = first or res
+            settled = True
+            return first
+        finally:
+            if not settled:
+                # invoke 자체가 취소/실패한 경우: 남은 요청도 정리
+                for t in pending:
+                    t.cancel()
@@ -5,6 +5,15 @@ import random
 import hashlib
 import logging
 import ctypes
+import itertools
+import socket
+import threading
+from collections import OrderedDict
+
+try:
+    from . import sched_policy      # faas 템플릿: function 패키지로 import
+except ImportError:
+    import sched_policy             # mock_gateway / 로컬: HANDLER_DIR이 sys.path에 있음
 
 logging.basicConfig(level=logging.INFO)
 
@@ -44,6 +53,37 @@ BASE_DELAY_MS   = float(os.getenv("BASE_DELAY_MS", "0"))
 JITTER_MS       = float(os.getenv("JITTER_MS", "0"))
 MAX_ARG         = int(os.getenv("MAX_ARG", "1000"))
 RESPONSE_BYTES  = int(os.getenv("RESPONSE_BYTES", "0"))
+SCHED_STATS     = os.getenv("SCHED_STATS", "1") != "0"   # 0이면 /proc, cgroup 통계 생략
+
+# lean 응답 (요청 헤더 X-Response-Mode: lean)
+# - 지표는 응답 헤더에 숫자/쉼표 목록으로, 본문은 padding 바이트만 (JSON 인코딩/디코딩 없음)
+# - X-Fn-Elapsed-Ms / X-Fn-Ctxsw(vol,nonvol,total) / X-Fn-Work / X-Fn-Cancelled
+#   X-Fn-Sched(runq_wait_ms,on_cpu_ms,migrations,cpu,throttled_ms,nr_throttled)
+#   X-Fn-Trace(id,arrive_ns,mono0,mono1,mono2,gw_start_ns) / X-Fn-Instance(id,start_ns,seq)
+_PADDING = b"x" * min(max(RESPONSE_BYTES, 0), 1_000_000)   # 요청마다 만들지 않음
+
+# 인스턴스(replica 프로세스) 정보 -> 디스패처가 cold start와 warm replica 수를 판정
+# - id: 호스트(Pod) 이름:pid, start_ns: 프로세스 시작 시각(epoch ns), seq: 이 프로세스의 몇 번째 호출
+# - seq == 1 이면 그 요청이 프로세스 기동(cold start) 비용을 치른 것
+# - {"ping": hold_ms}: 작업 없이 hold_ms만 붙잡고 인스턴스 정보만 응답 (keep-warm)
+#   붙잡는 동안 동시에 온 ping은 gateway가 다른 replica로 보냄
+def _proc_start_ns() -> int:
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])    # starttime (부팅 후 clock tick)
+        with open("/proc/stat") as f:
+            btime = next(int(l.split()[1]) for l in f if l.startswith("btime"))
+        return int((btime + ticks / os.sysconf("SC_CLK_TCK")) * 1e9)
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time_ns()   # import 시각으로 대신
+
+_INSTANCE_ID = f"{os.getenv('HOSTNAME') or socket.gethostname()}:{os.getpid()}"
+_START_NS = _proc_start_ns()
+_SEQ = itertools.count(1)
+_PING_MAX_MS = 1000.0
+
+def _instance(seq: int) -> dict:
+    return {"id": _INSTANCE_ID, "start_ns": _START_NS, "seq": seq}
 
 def _parse_event(event):
     body_text = ""
@@ -67,21 +107,76 @@ def _parse_event(event):
         data["arg"] = q["arg"]
     return data
 
-def _busy_cpu_ms(target_ms: float):
+def _header(event, name: str):
+    h = getattr(event, "headers", None) or {}
+    try:
+        return h.get(name) or h.get(name.lower())
+    except AttributeError:
+        return None
+
+# hedge 취소 신호 (같은 프로세스 안의 요청끼리 공유)
+_CANCEL_LOCK = threading.Lock()
+_CANCELLED = OrderedDict()     # hedge_id -> True (최근 _CANCEL_KEEP개만 유지)
+_RUNNING = {}                  # hedge_id -> 작업 시작 시각(perf_counter)
+_SLEEPING = {}                 # hedge_id -> Event (sleep 모드에서 취소 시 깨움)
+_CANCEL_KEEP = 4096
+_CANCEL_CHECK_ROUNDS = 64      # 해시 라운드 몇 번마다 취소 여부 확인
+
+def _cancel(hedge_id: str) -> float:
+    """취소 등록, 이미 실행 중이면 지금까지 쓴 시간(ms) 반환"""
+    with _CANCEL_LOCK:
+        _CANCELLED[hedge_id] = True
+        while len(_CANCELLED) > _CANCEL_KEEP:
+            _CANCELLED.popitem(last=False)
+        started = _RUNNING.get(hedge_id)
+        wake = _SLEEPING.get(hedge_id)
+    if wake is not None:
+        wake.set()
+    if started is None:
+        return 0.0
+    return (time.perf_counter() - started) * 1000.0
+
+def _busy_cpu_ms(target_ms: float, hedge_id=None) -> bool:
+    """목표 시간만큼 CPU를 사용, 중간에 취소되면 True"""
     end = time.perf_counter() + target_ms / 1000.0
     blob = b"openfaas"
     h = hashlib.sha256
+    n = 0
     while time.perf_counter() < end:
         blob = h(blob).digest()
+        if hedge_id is not None:
+            n += 1
+            if n % _CANCEL_CHECK_ROUNDS == 0 and hedge_id in _CANCELLED:
+                return True
+    return False
 
-def _fib_linear(n: int) -> int:
+def _fib_linear(n: int, hedge_id=None):
+    """중간에 취소되면 None"""
     if n <= 1:
         return n
     a, b = 0, 1
-    for _ in range(2, n + 1):
+    for i in range(2, n + 1):
         a, b = b, (a + b)
+        if hedge_id is not None and i % _CANCEL_CHECK_ROUNDS == 0 and hedge_id in _CANCELLED:
+            return None
     return b
 
+def _cancellable_sleep_ms(target_ms: float, hedge_id) -> bool:
+    """목표 시간만큼 sleep, 중간에 취소되면 True (취소 시 Event로 바로 깨어남)"""
+    if hedge_id is None:
+        _random_sleep_ms(target_ms, 0.0)
+        return False
+    wake = threading.Event()
+    with _CANCEL_LOCK:
+        if hedge_id in _CANCELLED:
+            return True
+        _SLEEPING[hedge_id] = wake
+    try:
+        return wake.wait(target_ms / 1000.0) if target_ms > 0 else False
+    finally:
+        with _CANCEL_LOCK:
+            _SLEEPING.pop(hedge_id, None)
+
 def _random_sleep_ms(base_ms: float, jitter_ms: float):
     if base_ms <= 0 and jitter_ms <= 0:
         return
@@ -103,13 +198,135 @@ def _ctx_read():
     except Exception:
         return {"voluntary": 0, "nonvoluntary": 0, "total": 0}
 
+# 커널 스케줄링 통계 (요청을 처리한 스레드 기준)
+# - /proc/self/task/<tid>/schedstat: on-CPU ns, run-queue 대기 ns, timeslice 수
+# - /proc/self/task/<tid>/sched: 마이그레이션 수, 정책 (CONFIG_SCHED_DEBUG 커널에서만 있음)
+# - cgroup cpu.stat: CFS bandwidth throttling (프로세스/컨테이너 단위라 동시 요청끼리 공유)
+_SCHED_KEYS = {"se.nr_migrations": "migrations", "policy": "policy", "prio": "prio"}
+_CG_PATH = False     # False = 아직 찾지 않음, None = 없음
+_LIBC = None
+
+def _cgroup_cpu_stat_path():
+    cands = []
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                hier, ctrls, path = line.rstrip("\n").split(":", 2)
+                path = path.rstrip("/")
+                if hier == "0" and ctrls == "":
+                    cands += [f"/sys/fs/cgroup{path}/cpu.stat", f"/sys/fs/cgroup/unified{path}/cpu.stat"]
+                elif "cpu" in ctrls.split(","):
+                    cands += [f"/sys/fs/cgroup/{ctrls}{path}/cpu.stat", f"/sys/fs/cgroup/cpu{path}/cpu.stat"]
+    except (OSError, ValueError):
+        pass
+    cands += ["/sys/fs/cgroup/cpu.stat", "/sys/fs/cgroup/cpu/cpu.stat"]
+    for c in cands:
+        try:
+            with open(c) as f:
+                if "nr_throttled" in f.read():
+                    return c
+        except OSError:
+            continue
+    return None
+
+def _cg_read():
+    global _CG_PATH
+    if _CG_PATH is False:
+        _CG_PATH = _cgroup_cpu_stat_path()
+    if _CG_PATH is None:
+        return None
+    try:
+        with open(_CG_PATH) as f:
+            kv = dict(line.split() for line in f if line.strip())
+        if "throttled_usec" in kv:          # cgroup v2
+            thr_ms = int(kv["throttled_usec"]) / 1000.0
+        else:                               # v1: ns
+            thr_ms = int(kv.get("throttled_time", 0)) / 1e6
+        return {"nr_periods": int(kv.get("nr_periods", 0)),
+                "nr_throttled": int(kv.get("nr_throttled", 0)), "throttled_ms": thr_ms}
+    except (OSError, ValueError):
+        return None
+
+def _getcpu() -> int:
+    global _LIBC
+    try:
+        if _LIBC is None:
+            _LIBC = ctypes.CDLL("libc.so.6", use_errno=True)
+        return int(_LIBC.sched_getcpu())
+    except Exception:
+        return -1
+
+def _sched_read():
+    tid = threading.get_native_id()
+    out = {"cpu": _getcpu()}
+    try:
+        with open(f"/proc/self/task/{tid}/schedstat") as f:
+            on_ns, wait_ns, slices = f.read().split()[:3]
+        out.update(on_cpu_ns=int(on_ns), runq_ns=int(wait_ns), timeslices=int(slices))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(f"/proc/self/task/{tid}/sched") as f:
+            for line in f:
+                k, _, v = line.partition(":")
+                k = _SCHED_KEYS.get(k.strip())
+                if k:
+                    out[k] = int(float(v))
+    except (OSError, ValueError):
+        pass
+    return out
+
+def _sched_delta(before, after, cg_before, cg_after):
+    d = {"cpu_start": before["cpu"], "cpu_end": after["cpu"]}
+    if "runq_ns" in before and "runq_ns" in after:
+        d["runq_wait_ms"] = round((after["runq_ns"] - before["runq_ns"]) / 1e6, 4)
+        d["on_cpu_ms"] = round((after["on_cpu_ns"] - before["on_cpu_ns"]) / 1e6, 4)
+        d["timeslices"] = after["timeslices"] - before["timeslices"]
+    if "migrations" in before and "migrations" in after:
+        d["migrations"] = after["migrations"] - before["migrations"]
+    for k in ("policy", "prio"):
+        if k in after:
+            d[k] = after[k]
+    if cg_before and cg_after:
+        d["cgroup"] = {k: round(cg_after[k] - cg_before[k], 4) for k in cg_after}
+    return d
+
 def handle(event, context):
     _apply_scheduler_if_needed()
 
     start = time.perf_counter()
+    # 추적: X-Request-Id가 있으면 도착(wall ns) + monotonic 시각(도착/작업 시작/작업 끝)을 응답에 포함
+    request_id = _header(event, "X-Request-Id")
+    if request_id:
+        arrive_ns, mono = time.time_ns(), [time.monotonic_ns()]
     data = _parse_event(event)
 
+    if "cancel" in data:
+        hid = str(data["cancel"])
+        ran_ms = _cancel(hid)
+        body = {"ok": True, "cancelled": hid, "ran_ms": round(ran_ms, 3)}
+        return {"statusCode": 200, "body": json.dumps(body), "headers": {"Content-Type": "application/json"}}
+
+    seq = next(_SEQ)
+    if "ping" in data:
+        try:
+            hold_ms = min(max(float(data["ping"] or 0), 0.0), _PING_MAX_MS)
+        except (TypeError, ValueError):
+            hold_ms = 0.0
+        if hold_ms:
+            time.sleep(hold_ms / 1000.0)
+        body = {"ok": True, "ping": True, "instance": _instance(seq)}
+        return {"statusCode": 200, "body": json.dumps(body), "headers": {"Content-Type": "application/json"}}
+
+    hedge_id = data.get("hedge_id")
+    if hedge_id is not None:
+        hedge_id = str(hedge_id)
+        with _CANCEL_LOCK:
+            _RUNNING[hedge_id] = start
+
     ctx_before = _ctx_read()
+    if SCHED_STATS:
+        sched_before, cg_before = _sched_read(), _cg_read()
 
     arg_raw = data.get("arg", 0)
     try:
@@ -123,29 +340,65 @@ def handle(event, context):
 
     target_ms = max(arg * SCALE_MS, 0.0)
 
-    _random_sleep_ms(BASE_DELAY_MS, JITTER_MS)
+    if request_id:
+        mono.append(time.monotonic_ns())
+    # 요청 단위 정책 ("sched": {"policy", "prio", "nice", "cpus", ...}), 작업 동안만 이 스레드에 적용
+    with sched_policy.applied(data.get("sched")) as policy:
+        _random_sleep_ms(BASE_DELAY_MS, JITTER_MS)
 
-    work_result = None
-    if MODE == "sleep":
-        _random_sleep_ms(target_ms, 0.0)
-        work_kind = "sleep"
-    elif MODE == "fib":
-        n = min(arg, MAX_ARG)
-        work_result = _fib_linear(n)
-        work_kind = "fib"
-    else:
-        _busy_cpu_ms(target_ms)
-        work_kind = "cpu"
+        work_result = None
+        cancelled = hedge_id is not None and hedge_id in _CANCELLED
+        if cancelled:
+            work_kind = "cancelled"    # 시작 전에 이미 취소됨
+        elif MODE == "sleep":
+            cancelled = _cancellable_sleep_ms(target_ms, hedge_id)
+            work_kind = "sleep"
+        elif MODE == "fib":
+            n = min(arg, MAX_ARG)
+            work_result = _fib_linear(n, hedge_id)
+            cancelled = work_result is None
+            work_kind = "fib"
+        else:
+            cancelled = _busy_cpu_ms(target_ms, hedge_id)
+            work_kind = "cpu"
+
+    if hedge_id is not None:
+        with _CANCEL_LOCK:
+            _RUNNING.pop(hedge_id, None)
 
     elapsed_ms = (time.perf_counter() - start) * 1000.0
+    if request_id:
+        mono.append(time.monotonic_ns())
 
     ctx_after = _ctx_read()
+    if SCHED_STATS:
+        sched = _sched_delta(sched_before, _sched_read(), cg_before, _cg_read())
     ctx_delta = {
         "voluntary": max(0, ctx_after["voluntary"] - ctx_before["voluntary"]),
         "nonvoluntary": max(0, ctx_after["nonvoluntary"] - ctx_before["nonvoluntary"]),
         "total": max(0, ctx_after["total"] - ctx_before["total"]),
     }
 
+    if (_header(event, "X-Response-Mode") or "").lower() == "lean":
+        hdrs = {
+            "Content-Type": "application/octet-stream",
+            "X-Fn-Elapsed-Ms": f"{elapsed_ms:.3f}",
+            "X-Fn-Ctxsw": f"{ctx_delta['voluntary']},{ctx_delta['nonvoluntary']},{ctx_delta['total']}",
+            "X-Fn-Work": work_kind,
+            "X-Fn-Cancelled": "1" if cancelled else "0",
+            "X-Fn-Instance": f"{_INSTANCE_ID},{_START_NS},{seq}",
+        }
+        if SCHED_STATS and sched:
+            cg = sched.get("cgroup") or {}
+            hdrs["X-Fn-Sched"] = ",".join("" if v is None else str(v) for v in (
+                sched.get("runq_wait_ms"), sched.get("on_cpu_ms"), sched.get("migrations"),
+                sched.get("cpu_end"), cg.get("throttled_ms"), cg.get("nr_throttled")))
+        if request_id:
+            gw_ns = _header(event, "X-Start-Time")
+            hdrs["X-Fn-Trace"] = ",".join([request_id, str(arrive_ns)] + [str(m) for m in mono]
+                                          + [gw_ns if gw_ns and str(gw_ns).isdigit() else ""])
+        return {"statusCode": 200, "body": _PADDING, "headers": hdrs}
+
     resp = {
         "ok": True,
         "sched_mode": os.environ.get("SCHED_MODE", "CFS"),
@@ -155,11 +408,19 @@ def handle(event, context):
         "base_delay_ms": BASE_DELAY_MS,
         "jitter_ms": JITTER_MS,
         "work_kind": work_kind,
+        "cancelled": cancelled,
         "elapsed_ms": round(elapsed_ms, 3),
         "ctxsw": { "before": ctx_before, "after": ctx_after, "delta": ctx_delta },
+        "sched": sched if SCHED_STATS else None,
+        "sched_policy": policy,
+        "instance": _instance(seq),
         "ts": time.time(),
         "echo": data
     }
+    if request_id:
+        gw_ns = _header(event, "X-Start-Time")
+        resp["trace"] = {"id": request_id, "arrive_ns": arrive_ns, "mono_ns": mono,
+                         "gw_start_ns": int(gw_ns) if gw_ns and str(gw_ns).isdigit() else None}
     if work_result is not None:
         try:
             resp["fib_digits"] = len(str(work_result))
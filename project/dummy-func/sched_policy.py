@@ -0,0 +1,140 @@
+import ctypes
+import logging
+import os
+import platform
+import threading
+from contextlib import contextmanager
+
+# 요청 단위 스케줄링 정책 (Pod 재시작 없이 요청 메타데이터로 지정)
+# - 요청을 처리하는 스레드에만 적용하고 요청이 끝나면 원래 값으로 복원
+#   (Linux에서 pid 0 = 호출한 스레드: sched_setscheduler / sched_setaffinity / setpriority(tid))
+# - spec 예: {"policy": "fifo", "prio": 60} / {"policy": "batch", "nice": 5} / {"cpus": [0, 1]}
+#            {"policy": "deadline", "runtime_ms": 5, "deadline_ms": 20, "period_ms": 20}
+# - CAP_SYS_NICE가 없으면 되돌릴 수 없는 변경(RT, deadline, idle, nice)은 하지 않고 CFS로 실행
+#   (nice는 올리는 것만 되고 내리는 건 권한이 필요 -> 요청 끝나고 복원할 수 없음)
+
+SCHED_DEADLINE = 6
+POLICIES = {
+    "other": os.SCHED_OTHER, "cfs": os.SCHED_OTHER,
+    "batch": os.SCHED_BATCH, "idle": os.SCHED_IDLE,
+    "fifo": os.SCHED_FIFO, "rr": os.SCHED_RR,
+    "deadline": SCHED_DEADLINE,
+}
+_RT = (os.SCHED_FIFO, os.SCHED_RR)
+_NEEDS_CAP = (os.SCHED_FIFO, os.SCHED_RR, os.SCHED_IDLE, SCHED_DEADLINE)
+_NR_SCHED_SETATTR = {"x86_64": 314, "aarch64": 274}
+_CAP_SYS_NICE = 23
+
+class _SchedAttr(ctypes.Structure):
+    _fields_ = [("size", ctypes.c_uint32), ("sched_policy", ctypes.c_uint32),
+                ("sched_flags", ctypes.c_uint64), ("sched_nice", ctypes.c_int32),
+                ("sched_priority", ctypes.c_uint32), ("sched_runtime", ctypes.c_uint64),
+                ("sched_deadline", ctypes.c_uint64), ("sched_period", ctypes.c_uint64)]
+
+_libc = None
+_cap = None
+
+def has_sys_nice() -> bool:
+    """유효 capability에 CAP_SYS_NICE가 있는지 (/proc/self/status CapEff)"""
+    global _cap
+    if _cap is None:
+        _cap = False
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("CapEff:"):
+                        _cap = bool(int(line.split()[1], 16) >> _CAP_SYS_NICE & 1)
+        except (OSError, ValueError):
+            pass
+    return _cap
+
+def _set_deadline(runtime_ms: float, deadline_ms: float, period_ms: float):
+    global _libc
+    nr = _NR_SCHED_SETATTR.get(platform.machine())
+    if nr is None:
+        raise OSError(f"sched_setattr syscall number unknown for {platform.machine()}")
+    if _libc is None:
+        _libc = ctypes.CDLL("libc.so.6", use_errno=True)
+    ns = lambda ms: int(ms * 1e6)
+    attr = _SchedAttr(ctypes.sizeof(_SchedAttr), SCHED_DEADLINE, 0, 0, 0,
+                      ns(runtime_ms), ns(deadline_ms), ns(period_ms))
+    if _libc.syscall(nr, 0, ctypes.byref(attr), 0) != 0:
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+
+def _save(tid: int) -> dict:
+    return {"policy": os.sched_getscheduler(0), "param": os.sched_getparam(0),
+            "nice": os.getpriority(os.PRIO_PROCESS, tid), "cpus": os.sched_getaffinity(0)}
+
+def _apply(spec: dict, tid: int, report: dict):
+    cap = has_sys_nice()
+    cpus = spec.get("cpus")
+    if cpus:
+        try:
+            os.sched_setaffinity(0, [int(c) for c in cpus])
+            report["applied"]["cpus"] = sorted(os.sched_getaffinity(0))
+        except (OSError, ValueError) as e:
+            report["denied"]["cpus"] = str(e)
+
+    name = str(spec.get("policy", "")).lower()
+    if name:
+        pol = POLICIES.get(name)
+        if pol is None:
+            report["denied"]["policy"] = f"unknown policy {name}"
+        elif pol in _NEEDS_CAP and not cap:
+            report["denied"]["policy"] = f"{name} needs CAP_SYS_NICE"
+        else:
+            try:
+                if pol == SCHED_DEADLINE:
+                    rt = float(spec.get("runtime_ms", 5.0))
+                    dl = float(spec.get("deadline_ms", max(rt, 10.0)))
+                    _set_deadline(rt, dl, float(spec.get("period_ms", dl)))
+                else:
+                    prio = int(spec.get("prio", 50)) if pol in _RT else 0
+                    os.sched_setscheduler(0, pol, os.sched_param(prio))
+                report["applied"]["policy"] = name
+                if pol in _RT:
+                    report["applied"]["prio"] = os.sched_getparam(0).sched_priority
+            except (OSError, ValueError) as e:
+                report["denied"]["policy"] = str(e)
+
+    if "nice" in spec:
+        if not cap:
+            report["denied"]["nice"] = "needs CAP_SYS_NICE (could not be restored)"
+        else:
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, int(spec["nice"]))
+                report["applied"]["nice"] = os.getpriority(os.PRIO_PROCESS, tid)
+            except (OSError, ValueError) as e:
+                report["denied"]["nice"] = str(e)
+
+def _restore(saved: dict, tid: int, report: dict):
+    try:
+        if "policy" in report["applied"]:
+            os.sched_setscheduler(0, saved["policy"], saved["param"])
+        if "nice" in report["applied"]:
+            os.setpriority(os.PRIO_PROCESS, tid, saved["nice"])
+        if "cpus" in report["applied"]:
+            os.sched_setaffinity(0, saved["cpus"])
+    except OSError as e:
+        # 복원 실패: 이 스레드는 다음 요청에도 바뀐 정책으로 남음
+        logging.warning(f"[SCHED] restore failed on tid {tid}: {e}")
+        report["restore_error"] = str(e)
+
+@contextmanager
+def applied(spec):
+    """
+    with applied({"policy": "fifo", "prio": 70}) as report: ...
+    report = {"applied": {...}, "denied": {...}} (spec가 없으면 None)
+    """
+    if not spec or not isinstance(spec, dict):
+        yield None
+        return
+    tid = threading.get_native_id()
+    report = {"applied": {}, "denied": {}}
+    saved = _save(tid)
+    _apply(spec, tid, report)
+    try:
+        yield report
+    finally:
+        _restore(saved, tid, report)
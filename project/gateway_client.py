@@ -0,0 +1,353 @@
+import http.client
+import json as _json
+import socket
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Metrics
+
+try:
+    import httpx
+except ImportError:  # backend="h2"을 쓸 때만 필요 (pip install "httpx[http2]")
+    httpx = None
+
+# gateway 호출 전용 클라이언트 (requests.Session.post 대신)
+# - requests 기본 풀은 호스트당 10개 -> 워커 200개가 풀에서 기다리거나 연결을 열고 버림
+#   -> 그 시간이 res_ms에 섞여 스케줄러 탓으로 보임
+# - pool: http.client 연결을 동시성만큼 keep-alive로 유지 (LIFO 재사용, TCP_NODELAY)
+#         풀 대기 / 연결 수립 시간을 따로 계측, 끊긴 keep-alive 연결은 한 번 다시 연결해 재시도
+# - requests: HTTPAdapter 풀 크기만 맞춘 기존 경로 (프록시, https 등)
+# - h2: httpx HTTP/2 (한 연결에 다중화, h2c prior knowledge), httpx[http2] 설치 시
+# post()는 requests.Session.post와 같은 모양 (status_code / content / json()) -> 호출부 그대로
+# abort: post(abort=Abort())로 보낸 요청은 다른 스레드에서 abort()로 끊을 수 있음 (pool backend만)
+#   -> hedge에서 진 요청이 응답을 기다리며 연결과 호출 스레드를 붙잡지 않음 (끊긴 연결은 풀에서 버림)
+# lean 응답: LEAN_HEADERS를 보내면 handler가 지표를 X-Fn-* 헤더로, 본문은 padding만 보냄
+#   -> post(discard=True)로 본문은 읽어 버리고 lean_data(헤더)로 JSON 응답과 같은 모양의 dict 복원
+
+BACKENDS = ("pool", "requests", "h2")
+LEAN_HEADERS = {"X-Response-Mode": "lean"}
+_DRAIN = 1 << 16
+
+def _nums(v: Optional[str]) -> list:
+    return [float(x) if x else None for x in v.split(",")] if v else []
+
+def lean_data(headers) -> dict:
+    """lean 응답 헤더 -> {"elapsed_ms", "ctxsw": {"delta"}, "sched", "trace", "instance", ...} (없는 항목은 빠짐)"""
+    get = headers.get
+    data = {"elapsed_ms": float(get("X-Fn-Elapsed-Ms") or 0.0),
+            "work_kind": get("X-Fn-Work"), "cancelled": get("X-Fn-Cancelled") == "1"}
+    ctx = _nums(get("X-Fn-Ctxsw"))
+    if len(ctx) == 3:
+        data["ctxsw"] = {"delta": dict(zip(("voluntary", "nonvoluntary", "total"), ctx))}
+    sc = _nums(get("X-Fn-Sched"))
+    if len(sc) == 6:
+        cpu = sc[3]
+        data["sched"] = {"runq_wait_ms": sc[0], "on_cpu_ms": sc[1], "migrations": sc[2],
+                         "cpu_end": int(cpu) if cpu is not None else None,
+                         "cgroup": {"throttled_ms": sc[4], "nr_throttled": sc[5]}}
+    tr = get("X-Fn-Trace")
+    if tr:
+        rid, arrive, m0, m1, m2, gw = tr.split(",")
+        data["trace"] = {"id": rid, "arrive_ns": int(arrive), "mono_ns": [int(m0), int(m1), int(m2)],
+                         "gw_start_ns": int(gw) if gw else None}
+    inst = get("X-Fn-Instance")
+    if inst:
+        iid, start, seq = inst.rsplit(",", 2)
+        data["instance"] = {"id": iid, "start_ns": int(start), "seq": int(seq)}
+    return data
+
+class Aborted(ConnectionError):
+    """abort()로 끊긴 요청"""
+
+class Abort:
+    """진행 중인 post()를 끊는 핸들 (abort()는 아무 스레드에서나, 보내기 전에 불러도 됨)"""
+    __slots__ = ("aborted", "_sock", "_lock")
+
+    def __init__(self):
+        self.aborted = False
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _bind(self, sock) -> bool:
+        with self._lock:
+            self._sock = sock
+            return not self.aborted
+
+    def _unbind(self):
+        with self._lock:
+            self._sock = None
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)     # 다른 스레드의 blocking recv를 깨움
+            except OSError:
+                pass
+
+class Response:
+    __slots__ = ("status_code", "content", "headers")
+
+    def __init__(self, status_code: int, content: bytes, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    def json(self):
+        return _json.loads(self.content)
+
+class _HostPool:
+    """호스트 하나의 keep-alive 연결 풀 (최대 size개, 모자라면 반납될 때까지 대기)"""
+    def __init__(self, host: str, port: int, size: int, connect_timeout: float, client: "GatewayClient"):
+        self.host, self.port = host, port
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self.client = client
+        self.idle = []          # LIFO: 최근에 쓴(살아 있을 가능성이 높은) 연결부터
+        self.opened = 0
+        self.cond = threading.Condition()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        t0 = time.perf_counter()
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        try:
+            conn.connect()
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception:
+            conn.close()
+            self._forget()
+            raise
+        self.client._observe_connect((time.perf_counter() - t0) * 1000.0)
+        return conn
+
+    def _forget(self):
+        with self.cond:
+            self.opened -= 1
+            self.cond.notify()
+
+    def acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """(연결, 재사용 여부)"""
+        t0 = time.perf_counter()
+        with self.cond:
+            while not self.idle and self.opened >= self.size:
+                self.cond.wait()
+            conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                self.opened += 1
+        self.client._observe_wait((time.perf_counter() - t0) * 1000.0)
+        if conn is not None:
+            return conn, True
+        return self._connect(), False
+
+    def release(self, conn: http.client.HTTPConnection, keep: bool):
+        if not keep:
+            conn.close()
+            self._forget()
+            return
+        with self.cond:
+            self.idle.append(conn)
+            self.cond.notify()
+
+    def reconnect(self, conn: http.client.HTTPConnection) -> http.client.HTTPConnection:
+        """끊긴 연결을 닫고 같은 자리에 새로 연결 (opened 수는 그대로, 실패하면 자리 반납)"""
+        conn.close()
+        return self._connect()
+
+    def prefill(self, n: int):
+        conns = []
+        try:
+            for _ in range(n):
+                with self.cond:
+                    if self.opened >= self.size:
+                        break
+                    self.opened += 1
+                conns.append(self._connect())
+        finally:
+            for c in conns:
+                self.release(c, True)
+
+    def close(self):
+        with self.cond:
+            idle, self.idle = self.idle, []
+            self.opened -= len(idle)
+        for c in idle:
+            c.close()
+
+class GatewayClient:
+    """
+    client = GatewayClient("http://127.0.0.1:8080", pool_size=200, metrics=m)
+    r = client.post(f"{base}/function/func-01", json={"arg": "35"}, timeout=30)
+    pool_size: 동시에 보낼 수 있는 요청 수 (= 호출 스레드 수에 맞출 것)
+    """
+    def __init__(self, base_url: str, pool_size: int = 64, timeout: float = 30.0,
+                 connect_timeout: float = 5.0, backend: str = "pool",
+                 metrics: Optional[Metrics] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
+        self.base = base_url.rstrip("/")
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.backend = backend
+        self._pools: Dict[Tuple[str, int], _HostPool] = {}
+        self._lock = threading.Lock()
+
+        m = self.metrics = metrics or Metrics()
+        self.m_wait = m.histogram("client_pool_wait", "time waiting for a pooled connection")
+        self.m_connect = m.histogram("client_connect", "TCP connect time of new connections")
+        self.m_opened = m.counter("client_connections_opened_total", "new connections")
+        self.m_reused = m.counter("client_connections_reused_total", "requests on a kept-alive connection")
+        self.m_retry = m.counter("client_stale_retries_total", "requests retried after a closed keep-alive")
+        self.m_drained = m.counter("client_discarded_bytes_total", "response body bytes read and dropped")
+        self._buf = threading.local()
+        m.gauge("client_connections_open", lambda: sum(p.opened for p in self._pools.values()),
+                "open gateway connections")
+        m.gauge("client_connections_idle", lambda: sum(len(p.idle) for p in self._pools.values()),
+                "idle gateway connections")
+
+        self._session = self._h2 = None
+        if backend == "requests":
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        elif backend == "h2":
+            if httpx is None:
+                raise RuntimeError('backend="h2" requires httpx (pip install "httpx[http2]")')
+            self._h2 = httpx.Client(
+                http1=False, http2=True, timeout=timeout,
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size))
+
+    def _observe_wait(self, ms: float):
+        self.m_wait.observe(ms)
+
+    def _observe_connect(self, ms: float):
+        self.m_opened.inc()
+        self.m_connect.observe(ms)
+
+    def snapshot(self) -> dict:
+        """풀 대기 / 연결 수립 요약 (run.json)"""
+        return {"backend": self.backend, "pool_size": self.pool_size,
+                "opened": self.m_opened.value, "reused": self.m_reused.value,
+                "stale_retries": self.m_retry.value,
+                "pool_wait": self.m_wait.snapshot(), "connect": self.m_connect.snapshot()}
+
+    def _pool(self, host: str, port: int) -> _HostPool:
+        key = (host, port)
+        p = self._pools.get(key)
+        if p is None:
+            with self._lock:
+                p = self._pools.setdefault(key, _HostPool(host, port, self.pool_size,
+                                                          self.connect_timeout, self))
+        return p
+
+    def prefill(self, n: Optional[int] = None):
+        """측정 전에 연결을 미리 열어 둠 (연결 수립 시간이 첫 요청들의 응답 시간에 섞이지 않게)"""
+        if self.backend != "pool":
+            return
+        u = urlsplit(self.base)
+        self._pool(u.hostname, u.port or 80).prefill(min(n or self.pool_size, self.pool_size))
+
+    def _drain_buf(self) -> memoryview:
+        b = getattr(self._buf, "v", None)
+        if b is None:
+            b = self._buf.v = memoryview(bytearray(_DRAIN))
+        return b
+
+    def post(self, url: str, json=None, data: Optional[bytes] = None,
+             headers: Optional[dict] = None, timeout: Optional[float] = None,
+             discard: bool = False, abort: Optional[Abort] = None) -> Response:
+        """
+        discard=True: 본문을 버퍼 하나로 읽어 버림 (content는 b"", lean 응답용)
+        abort: 끊으면 Aborted 예외 (pool backend만, 다른 backend는 끝까지 기다림)
+        """
+        if self._session is not None:
+            r = self._session.post(url, json=json, data=data, headers=headers,
+                                   timeout=timeout or self.timeout, stream=discard)
+            if discard:
+                self.m_drained.inc(sum(len(c) for c in r.iter_content(_DRAIN)))
+            return r
+        if self._h2 is not None:
+            if not discard:
+                return self._h2.post(url, json=json, content=data, headers=headers,
+                                     timeout=timeout or self.timeout)
+            with self._h2.stream("POST", url, json=json, content=data, headers=headers,
+                                 timeout=timeout or self.timeout) as r:
+                self.m_drained.inc(sum(len(c) for c in r.iter_raw(_DRAIN)))
+            return r
+
+        u = urlsplit(url)
+        if u.scheme != "http":
+            raise ValueError(f'backend="pool" supports http:// only: {url}')
+        path = u.path + ("?" + u.query if u.query else "")
+        body = _json.dumps(json).encode() if json is not None else (data or b"")
+        hdrs = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+        if headers:
+            hdrs.update(headers)
+        pool = self._pool(u.hostname, u.port or 80)
+        if abort is not None and abort.aborted:
+            raise Aborted(url)
+        conn, reused = pool.acquire()
+        keep = False
+        try:
+            for attempt in (0, 1):
+                try:
+                    conn.sock.settimeout(timeout or self.timeout)
+                    if abort is not None and not abort._bind(conn.sock):
+                        raise Aborted(url)
+                    conn.request("POST", path, body, hdrs)
+                    r = conn.getresponse()
+                    break
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # 서버가 idle keep-alive 연결을 닫음 -> 요청은 처리되지 않았으므로 한 번 재시도
+                    if abort is not None and abort.aborted:
+                        raise Aborted(url)
+                    if not reused or attempt:
+                        raise
+                    self.m_retry.inc()
+                    old, conn = conn, None
+                    conn = pool.reconnect(old)
+                    reused = False
+            if discard:
+                buf, n, content = self._drain_buf(), 0, b""
+                while True:
+                    k = r.readinto(buf)
+                    if not k:
+                        break
+                    n += k
+                self.m_drained.inc(n)
+            else:
+                content = r.read()
+            if abort is not None:
+                abort._unbind()
+                if abort.aborted:
+                    raise Aborted(url)      # 본문을 읽는 중에 끊김 (연결은 버림)
+            if reused:
+                self.m_reused.inc()
+            keep = not r.will_close
+            return Response(r.status, content, r.headers)   # headers: 대소문자 무시 .get()
+        except OSError:
+            if abort is not None and abort.aborted:
+                raise Aborted(url) from None
+            raise
+        finally:
+            if abort is not None:
+                abort._unbind()
+            if conn is not None:
+                pool.release(conn, keep)
+
+    def close(self):
+        for p in self._pools.values():
+            p.close()
+        if self._session is not None:
+            self._session.close()
+        if self._h2 is not None:
+            self._h2.close()
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from gateway_client import GatewayClient
+from metrics import Metrics
+
+# 함수별 warm replica 유지 (replayer의 일회성 _prewarm을 주기적으로)
+# - interval_s마다 함수마다 ping {"ping": hold_ms}을 replicas x per_replica개 동시에 보냄
+#   handler는 작업 없이 hold_ms만 붙잡고 instance(id, start_ns, seq)로 응답
+#   -> 붙잡는 동안 replica의 동시 실행 슬롯(per_replica개)이 차서 나머지 ping은 다른 replica로 감
+#      (한 개씩 보내면 같은 replica만 깨움)
+# - replica가 idle로 scale-down(또는 scale-to-zero) 되기 전에 다시 호출 -> 측정 요청이 cold start를 치르지 않음
+# - on_reply(func, data, elapsed_ms): CustomDispatcher.note_ping 등 warm 추적에 반영
+
+class KeepWarm:
+    """
+    kw = KeepWarm(client, "http://127.0.0.1:8080", funcs, replicas=2, per_replica=4,
+                  interval_s=30, on_reply=dispatcher.note_ping)
+    per_replica: replica당 동시 실행 수 (python3-http 템플릿의 스레드 수)
+    kw.ping_all()     # 한 번 (prewarm)
+    kw.start() ... kw.stop()
+    """
+    def __init__(self, session: GatewayClient, base_url: str, functions: List[str],
+                 replicas: int = 1, per_replica: int = 1, interval_s: float = 30.0,
+                 hold_ms: float = 50.0, timeout: float = 10.0, on_reply: Optional[Callable[[str, dict, float], None]] = None,
+                 metrics: Optional[Metrics] = None):
+        self.session = session
+        self.base = base_url.rstrip("/")
+        self.funcs = list(functions)
+        self.replicas = max(1, replicas)
+        self.fanout = self.replicas * max(1, per_replica)      # 함수당 동시 ping 수
+        self.interval_s = interval_s
+        self.hold_ms = hold_ms if self.fanout > 1 else 0.0      # 하나면 붙잡을 필요 없음
+        self.timeout = timeout
+        self.on_reply = on_reply
+        self.instances: Dict[str, set] = {f: set() for f in self.funcs}   # 마지막 라운드에 응답한 인스턴스
+        self.rounds = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = ThreadPoolExecutor(max_workers=len(self.funcs) * self.fanout,
+                                        thread_name_prefix="keepwarm")
+
+        m = metrics or Metrics()
+        self.m_ping = m.histogram("keepwarm_ping", "keep-warm ping round trip")
+        self.m_cold = m.counter("keepwarm_cold_total", "instances started by a keep-warm ping")
+        for f in self.funcs:
+            m.gauge("keepwarm_instances", lambda f=f: len(self.instances[f]),
+                    "instances answering the last keep-warm round", function=f)
+
+    def _ping(self, f: str):
+        t0 = time.perf_counter()
+        try:
+            r = self.session.post(f"{self.base}/function/{f}", json={"ping": self.hold_ms},
+                                  timeout=self.timeout)
+            data = r.json() if r.status_code == 200 else None
+        except Exception:
+            data = None
+        ms = (time.perf_counter() - t0) * 1000.0
+        if not data:
+            return f, None, ms
+        self.m_ping.observe(ms)
+        if (data.get("instance") or {}).get("seq") == 1:
+            self.m_cold.inc()
+        if self.on_reply is not None:
+            self.on_reply(f, data, ms)
+        return f, data, ms
+
+    def ping_all(self) -> Dict[str, int]:
+        """함수마다 ping fanout개를 동시에 -> {함수: 응답한 인스턴스 수}"""
+        futs = [self._pool.submit(self._ping, f) for f in self.funcs for _ in range(self.fanout)]
+        seen = {f: set() for f in self.funcs}
+        for fut in futs:
+            f, data, _ = fut.result()
+            if data is None:
+                self.failed += 1
+            else:
+                seen[f].add((data.get("instance") or {}).get("id"))
+        self.instances = seen
+        self.rounds += 1
+        return {f: len(s) for f, s in seen.items()}
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            self.ping_all()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="keepwarm", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pool.shutdown(wait=True)
+
+    def snapshot(self) -> dict:
+        return {"replicas": self.replicas, "interval_s": self.interval_s, "rounds": self.rounds,
+                "failed": self.failed, "cold_woken": self.m_cold.value,
+                "ping": self.m_ping.snapshot(),
+                "instances": {f: len(s) for f, s in self.instances.items()}}
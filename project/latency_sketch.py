@@ -0,0 +1,121 @@
+import math
+import threading
+from typing import Optional
+
+import numpy as np
+
+class LogHistogram:
+    """
+    로그 버킷 히스토그램 (스트리밍 분위수 추정)
+    - 버킷 경계가 gamma 배씩 커짐 -> 상대 오차 rel_err 이내
+    - 메모리 고정: 버킷 수는 (min_ms, max_ms, rel_err)로만 결정
+    - add는 O(1), quantile은 O(버킷 수)
+    - window를 넘으면 카운트를 절반으로 줄여 최근 분포를 따라감
+    - 같은 설정끼리 merge 가능
+    - zero_bucket=True: 0 이하 값은 따로 세고 0으로 보고 (0이 흔한 지표, 예: run-queue 대기)
+    """
+    def __init__(self, min_ms: float = 0.1, max_ms: float = 120000.0,
+                 rel_err: float = 0.02, window: int = 0, zero_bucket: bool = False):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.rel_err = rel_err
+        self.window = window            # 0이면 감쇠 없음
+        self.zero_bucket = zero_bucket
+        self._off = 1 if zero_bucket else 0
+        self._gamma = (1.0 + rel_err) / (1.0 - rel_err)
+        self._log_gamma = math.log(self._gamma)
+        # (zero_bucket이면 0번: 0 이하) 그다음: min_ms 이하, 마지막: max_ms 초과
+        self.n_buckets = int(math.ceil(math.log(max_ms / min_ms) / self._log_gamma)) + 2 + self._off
+        self.counts = [0] * self.n_buckets
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _index(self, x: float) -> int:
+        if x <= self.min_ms:
+            return 0 if self.zero_bucket and x <= 0 else self._off
+        i = int(math.log(x / self.min_ms) / self._log_gamma) + 1 + self._off
+        return i if i < self.n_buckets else self.n_buckets - 1
+
+    def _value(self, i: int) -> float:
+        if i < self._off:
+            return 0.0
+        i -= self._off
+        if i == 0:
+            return self.min_ms
+        # 버킷 (min*g^(i-1), min*g^i]의 대표값
+        return min(self.min_ms * self._gamma ** (i - 0.5), self.max_ms)
+
+    def add(self, x: float, n: int = 1):
+        i = self._index(x)
+        with self.lock:
+            self.counts[i] += n
+            self.count += n
+            if self.window and self.count > self.window:
+                self.counts = [c // 2 for c in self.counts]
+                self.count = sum(self.counts)
+
+    def add_array(self, xs):
+        """여러 값을 한 번에 (numpy 벡터 연산, 감쇠 없음)"""
+        xs = np.asarray(xs, dtype=np.float64)
+        xs = xs[~np.isnan(xs)]
+        idx = np.full(len(xs), self._off, dtype=np.int64)
+        if self.zero_bucket:
+            idx[xs <= 0] = 0
+        big = xs > self.min_ms
+        idx[big] = (np.log(xs[big] / self.min_ms) / self._log_gamma).astype(np.int64) + 1 + self._off
+        np.minimum(idx, self.n_buckets - 1, out=idx)
+        self.add_counts(np.bincount(idx, minlength=self.n_buckets))
+
+    def add_counts(self, counts):
+        """같은 버킷 구성의 카운트 배열을 더함 (프로세스 간 전달용)"""
+        counts = [int(c) for c in counts]
+        if len(counts) != self.n_buckets:
+            raise ValueError("bucket count mismatch")
+        with self.lock:
+            for i, c in enumerate(counts):
+                self.counts[i] += c
+            self.count += sum(counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+        if total <= 0:
+            return None
+        rank = q * (total - 1)
+        acc = 0
+        for i, c in enumerate(counts):
+            acc += c
+            if acc > rank:
+                return self._value(i)
+        return self._value(self.n_buckets - 1)
+
+    def quantiles(self, qs, interpolate: bool = False) -> Optional[np.ndarray]:
+        """
+        여러 분위수를 한 번에 (quantile()과 같은 규칙, 벡터 연산)
+        interpolate: 버킷 안에서 순위 비율만큼 기하 보간 (ECDF 그릴 때 계단 제거)
+        """
+        with self.lock:
+            counts = np.asarray(self.counts, dtype=np.int64)
+            total = self.count
+        if total <= 0:
+            return None
+        rank = np.asarray(qs, dtype=np.float64) * (total - 1)
+        cum = np.cumsum(counts)
+        idx = np.minimum(np.searchsorted(cum, rank, side="right"), self.n_buckets - 1)
+        j = idx - self._off
+        if interpolate:
+            frac = (rank - (cum[idx] - counts[idx]) + 0.5) / np.maximum(counts[idx], 1)
+            expo = j - 1 + np.clip(frac, 0.0, 1.0)
+        else:
+            expo = j - 0.5
+        vals = np.minimum(self.min_ms * self._gamma ** expo, self.max_ms)
+        return np.where(j < 0, 0.0, np.where(j == 0, self.min_ms, vals))
+
+    def merge(self, other: "LogHistogram"):
+        if ((other.n_buckets, other.min_ms, other.rel_err, other.zero_bucket)
+                != (self.n_buckets, self.min_ms, self.rel_err, self.zero_bucket)):
+            raise ValueError("cannot merge LogHistogram with different bucket layout")
+        with other.lock:
+            counts = list(other.counts)
+        self.add_counts(counts)
@@ -0,0 +1,252 @@
+import argparse, csv, json, os, time, threading
+import multiprocessing as mp
+import urllib.error, urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from workload_replayer import build_parser, from_args
+
+# 여러 프로세스/호스트로 replayer를 나눠 돌리는 부하 생성기
+# - 워크로드를 i % N == k 로 N개 shard로 나누고, 각 shard는 원래 도착 시각을 그대로 유지
+# - 모든 shard가 같은 start_at(epoch s)에 시작 -> 합치면 원래 trace와 같은 도착 과정
+# - shard 결과 ({MODE}_result.shard{k}.csv)를 timestamp 순으로 합쳐 {MODE}_result.csv
+# 여러 호스트에서 돌릴 때는 시계가 NTP로 맞춰져 있어야 함 (start_at, timestamp 모두 epoch 기준)
+
+def shard_tag(k: int) -> str:
+    return f".shard{k}"
+
+def _run_shard(args: dict, k: int, n: int, start_at: float):
+    a = argparse.Namespace(**args)
+    # warmup은 합친 뒤에 한 번만 버림, prewarm은 shard 0만, 병합용 CSV는 항상 생성
+    # 계측 포트/스냅샷 파일은 shard마다 따로 (port + k, 경로에 shard 접미사)
+    r = from_args(a, shard=(k, n), start_at=start_at, result_tag=shard_tag(k),
+                  warmup_drop=0, prewarm=(k == 0), csv_export=True,
+                  metrics_port=a.metrics_port + k if a.metrics_port else None,
+                  metrics_snapshot=a.metrics_snapshot + shard_tag(k) if a.metrics_snapshot else None)
+    r.replay(max_items=a.max_items)
+
+def run_local(args: dict, shards, n: int, start_at: float):
+    """shards에 해당하는 replayer를 프로세스 하나씩 띄워서 실행"""
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_run_shard, args=(args, k, n, start_at)) for k in shards]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    failed = [k for k, p in zip(shards, procs) if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"shard(s) {failed} exited with error")
+
+def _read_mode() -> str:
+    # replayer와 같은 규칙
+    mode = "CFS"
+    if os.path.exists("SCHEDULER_MODE.txt"):
+        m = open("SCHEDULER_MODE.txt").read().strip().upper()
+        if "FIFO" in m: mode = "FIFO"
+        elif "CUSTOM" in m: mode = "CUSTOM"
+    return mode
+
+def _sum_keys(dicts, keys):
+    return {k: sum(d.get(k, 0) for d in dicts) for k in keys}
+
+def merge_shards(mode: str, n: int, warmup_drop: int = 50, keep: bool = False) -> str:
+    """shard CSV/JSON -> {MODE}_result.csv, {MODE}_run.json"""
+    out_dir = f"./{mode}"
+    header, rows = None, []
+    for k in range(n):
+        with open(f"{out_dir}/{mode}_result{shard_tag(k)}.csv", newline="") as f:
+            rd = csv.reader(f)
+            header = next(rd)
+            rows.extend(rd)
+    rows.sort(key=lambda r: float(r[0]))
+    drop = min(warmup_drop, len(rows))
+    out_path = f"{out_dir}/{mode}_result.csv"
+    with open(out_path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows[drop:])
+
+    runs = []
+    for k in range(n):
+        p = f"{out_dir}/{mode}_run{shard_tag(k)}.json"
+        if os.path.exists(p):
+            with open(p) as f:
+                runs.append(json.load(f))
+    run = {"mode": mode, "shards": n, **_sum_keys(runs, ("sent", "succeeded"))}
+    loads = [r["load"] for r in runs if r.get("load", {}).get("arrivals")]
+    if loads:
+        # rps는 shard 합, lag 분위수는 shard 중 최댓값 (보수적)
+        run["load"] = {
+            **_sum_keys(loads, ("arrivals", "intended_rps", "achieved_rps")),
+            **{k: max(L[k] for L in loads)
+               for k in ("lag_ms_p50", "lag_ms_p95", "lag_ms_p99", "lag_ms_max", "late_1ms_frac")},
+        }
+    hedges = [r["hedge"] for r in runs if "hedge" in r]
+    if hedges:
+        run["hedge"] = _sum_keys(hedges, hedges[0].keys())
+    run["per_shard"] = runs
+    with open(f"{out_dir}/{mode}_run.json", "w") as f:
+        json.dump(run, f, indent=2)
+
+    if not keep:
+        for k in range(n):
+            for p in (f"{out_dir}/{mode}_result{shard_tag(k)}.csv", f"{out_dir}/{mode}_run{shard_tag(k)}.json"):
+                if os.path.exists(p):
+                    os.remove(p)
+    L = run.get("load", {})
+    print(f"[LoadGen] merged {n} shards: {len(rows) - drop} rows -> {out_path}"
+          + (f" (intended={L['intended_rps']:.2f} achieved={L['achieved_rps']:.2f} rps)" if L else ""))
+    return out_path
+
+# ---------------- multi-host ----------------
+
+class _Coordinator:
+    """shard 배정, 공통 시작 시각 배포, 결과 수집"""
+    def __init__(self, args: dict, n: int, start_delay: float, keep: bool):
+        self.args = args
+        self.n = n
+        self.start_delay = start_delay
+        self.keep = keep
+        self.next = 0
+        self.start_at = None
+        self.merged = False
+        self.got = set()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def join(self, procs: int) -> dict:
+        with self.lock:
+            shards = list(range(self.next, min(self.next + procs, self.n)))
+            self.next += len(shards)
+            if self.next >= self.n and self.start_at is None:
+                self.start_at = time.time() + self.start_delay
+                print(f"[LoadGen] all {self.n} shards joined, start_at={self.start_at:.3f}")
+        return {"shards": shards, "n_shards": self.n, "args": self.args}
+
+    def put(self, kind: str, k: int, mode: str, body: bytes):
+        os.makedirs(f"./{mode}", exist_ok=True)
+        ext = "csv" if kind == "result" else "json"
+        with open(f"./{mode}/{mode}_{kind}{shard_tag(k)}.{ext}", "wb") as f:
+            f.write(body)
+        with self.lock:
+            if kind == "result":
+                self.got.add(k)
+            finished = len(self.got) >= self.n and not self.merged
+            self.merged |= finished
+        if finished:
+            merge_shards(mode, self.n, self.args["warmup_drop"], self.keep)
+            self.done.set()
+
+def _handler(coord: _Coordinator):
+    class H(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _json(self, code: int, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            u = urlparse(self.path)
+            q = parse_qs(u.query)
+            if u.path == "/join":
+                self._json(200, coord.join(int(q.get("procs", ["1"])[0])))
+            elif u.path == "/start":
+                if coord.start_at is None:
+                    self._json(503, {"waiting": coord.n - coord.next})
+                else:
+                    self._json(200, {"start_at": coord.start_at})
+            else:
+                self._json(404, {})
+
+        def do_POST(self):
+            u = urlparse(self.path)
+            q = parse_qs(u.query)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if u.path in ("/result", "/run"):
+                coord.put(u.path[1:], int(q["shard"][0]), q["mode"][0], body)
+                self._json(200, {"ok": True})
+            else:
+                self._json(404, {})
+    return H
+
+def serve_coordinator(args: dict, n: int, port: int, start_delay: float, keep: bool):
+    coord = _Coordinator(args, n, start_delay, keep)
+    srv = ThreadingHTTPServer(("0.0.0.0", port), _handler(coord))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f"[LoadGen] coordinator on :{port}, waiting for {n} shards")
+    coord.done.wait()
+    srv.shutdown()
+
+def _http(url: str, data: bytes = None, timeout: float = 30.0):
+    req = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET")
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return json.loads(r.read())
+
+def run_worker(coord_url: str, procs: int, poll_s: float = 0.2):
+    base = coord_url.rstrip("/")
+    j = _http(f"{base}/join?procs={procs}")
+    shards, n, args = j["shards"], j["n_shards"], j["args"]
+    if not shards:
+        print("[LoadGen] no shard left to run")
+        return
+    print(f"[LoadGen] worker shards={shards}/{n}")
+    while True:
+        try:
+            start_at = _http(f"{base}/start")["start_at"]
+            break
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                raise
+            time.sleep(poll_s)
+    run_local(args, shards, n, start_at)
+    mode = _read_mode()
+    for k in shards:
+        for kind, ext in (("run", "json"), ("result", "csv")):
+            p = f"./{mode}/{mode}_{kind}{shard_tag(k)}.{ext}"
+            with open(p, "rb") as f:
+                _http(f"{base}/{kind}?shard={k}&mode={mode}", f.read())
+
+def parse_args():
+    rp = build_parser(add_help=False)
+    ap = argparse.ArgumentParser(description="sharded load generation for workload_replayer")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    lo = sub.add_parser("local", parents=[rp], help="한 호스트에서 N개 프로세스로 실행 후 병합")
+    lo.add_argument("--procs", type=int, default=os.cpu_count() or 1)
+    lo.add_argument("--start-delay", type=float, default=3.0,
+                    help="프로세스 기동 후 공통 시작까지 여유(s)")
+    lo.add_argument("--keep-shards", action="store_true")
+    co = sub.add_parser("coordinator", parents=[rp], help="여러 호스트의 worker를 묶어서 실행/병합")
+    co.add_argument("--shards", type=int, required=True)
+    co.add_argument("--port", type=int, default=9400)
+    co.add_argument("--start-delay", type=float, default=5.0)
+    co.add_argument("--keep-shards", action="store_true")
+    wo = sub.add_parser("worker", help="coordinator에서 shard를 받아 실행")
+    wo.add_argument("--coordinator", required=True, help="예: http://10.0.0.1:9400")
+    wo.add_argument("--procs", type=int, default=os.cpu_count() or 1)
+    me = sub.add_parser("merge", help="남아 있는 shard 파일만 병합")
+    me.add_argument("--shards", type=int, required=True)
+    me.add_argument("--mode", default=None)
+    me.add_argument("--warmup-drop", type=int, default=50)
+    me.add_argument("--keep-shards", action="store_true")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    if a.cmd in ("local", "coordinator"):
+        rargs = {k: v for k, v in vars(a).items()
+                 if k not in ("cmd", "procs", "start_delay", "keep_shards", "shards", "port")}
+    if a.cmd == "local":
+        start_at = time.time() + a.start_delay
+        run_local(rargs, list(range(a.procs)), a.procs, start_at)
+        merge_shards(_read_mode(), a.procs, a.warmup_drop, a.keep_shards)
+    elif a.cmd == "coordinator":
+        serve_coordinator(rargs, a.shards, a.port, a.start_delay, a.keep_shards)
+    elif a.cmd == "worker":
+        run_worker(a.coordinator, a.procs)
+    else:
+        merge_shards(a.mode or _read_mode(), a.shards, a.warmup_drop, a.keep_shards)
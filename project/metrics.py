@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, List, Tuple
+
+from latency_sketch import LogHistogram
+
+# 디스패처 내부 계측 (상시 켜 둘 수 있는 비용)
+# - Counter: lock 하나 + 정수 덧셈
+# - Histogram: LogHistogram(버킷 고정, 상대 오차 2%) + 합계 -> 관측 1건 O(1)
+# - 이름/레이블 조회는 생성 시 한 번, 이후에는 객체를 들고 있다가 바로 기록
+# - 노출: Prometheus text (GET /metrics), 주기적 JSON lines 스냅샷 파일
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+class Histogram:
+    """ms 단위로 기록, Prometheus에는 초 단위 summary로 노출"""
+    __slots__ = ("sketch", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.sketch = LogHistogram(min_ms=0.001, max_ms=120000.0)
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        s = self.sketch
+        i = s._index(ms)
+        with s.lock:        # 버킷/합계/최대를 lock 한 번에
+            s.counts[i] += 1
+            s.count += 1
+            self.sum_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def snapshot(self) -> dict:
+        n = self.sketch.count
+        if not n:
+            return {"count": 0}
+        q = self.sketch.quantiles(QUANTILES)
+        out = {"count": n, "avg_ms": round(self.sum_ms / n, 4), "max_ms": round(self.max_ms, 4)}
+        out.update({f"p{int(x * 100)}_ms": round(float(v), 4) for x, v in zip(QUANTILES, q)})
+        return out
+
+class Metrics:
+    """
+    계측 레지스트리
+    counter()/histogram()은 같은 (이름, 레이블)에 같은 객체를 돌려줌 -> 호출 측에서 미리 받아 둘 것
+    gauge()는 노출 시점에 fn()을 호출 (대기열 길이, EWMA 등)
+    """
+    def __init__(self, prefix: str = "dispatcher"):
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}     # name -> (type, help)
+        self._series: Dict[Tuple[str, Tuple], object] = {}
+        self._gauges: List[Tuple[str, Dict[str, str], Callable[[], float]]] = []
+
+    def _get(self, kind: str, name: str, help: str, labels: Dict[str, str], cls):
+        name = f"{self.prefix}_{name}"
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            m = self._series.get(key)
+            if m is None:
+                self._help.setdefault(name, (kind, help))
+                m = self._series[key] = cls()
+        return m
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get("counter", name, help, labels, Counter)
+
+    def histogram(self, name: str, help: str = "", **labels) -> Histogram:
+        return self._get("summary", name, help, labels, Histogram)
+
+    def gauge(self, name: str, fn: Callable[[], float], help: str = "", **labels):
+        name = f"{self.prefix}_{name}"
+        with self._lock:
+            self._help.setdefault(name, ("gauge", help))
+            self._gauges.append((name, labels, fn))
+
+    def snapshot(self) -> dict:
+        """{이름{레이블}: 값 | 히스토그램 요약}"""
+        out = {"ts": time.time(), "uptime_s": round(time.time() - self.started, 3)}
+        with self._lock:
+            series = list(self._series.items())
+            gauges = list(self._gauges)
+        for (name, labels), m in series:
+            key = name + _labels(dict(labels))
+            out[key] = m.value if isinstance(m, Counter) else m.snapshot()
+        for name, labels, fn in gauges:
+            try:
+                out[name + _labels(labels)] = fn()
+            except Exception:
+                pass
+        return out
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        by_name: Dict[str, List[str]] = {}
+        with self._lock:
+            series = list(self._series.items())
+            gauges = list(self._gauges)
+        for (name, labels), m in series:
+            labels = dict(labels)
+            lines = by_name.setdefault(name, [])
+            if isinstance(m, Counter):
+                lines.append(f"{name}{_labels(labels)} {m.value}")
+                continue
+            n = m.sketch.count
+            q = m.sketch.quantiles(QUANTILES) if n else None
+            for i, x in enumerate(QUANTILES):
+                v = float(q[i]) / 1000.0 if q is not None else float("nan")
+                lines.append(f"{name}{_labels(dict(labels, quantile=str(x)))} {v:.9g}")
+            lines.append(f"{name}_sum{_labels(labels)} {m.sum_ms / 1000.0:.9g}")
+            lines.append(f"{name}_count{_labels(labels)} {n}")
+        for name, labels, fn in gauges:
+            try:
+                v = float(fn())
+            except Exception:
+                continue
+            by_name.setdefault(name, []).append(f"{name}{_labels(labels)} {v:.9g}")
+        out = []
+        for name, lines in by_name.items():
+            kind, help = self._help.get(name, ("untyped", ""))
+            if help:
+                out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+def _handler(metrics: Metrics):
+    class H(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics":
+                body = metrics.render().encode()
+                ctype = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path.split("?")[0] == "/metrics.json":
+                body = json.dumps(metrics.snapshot()).encode()
+                ctype = "application/json"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    return H
+
+class MetricsServer:
+    """GET /metrics (Prometheus text), /metrics.json (스냅샷)"""
+    def __init__(self, metrics: Metrics, port: int, host: str = "0.0.0.0"):
+        self.srv = ThreadingHTTPServer((host, port), _handler(metrics))
+        self.srv.daemon_threads = True
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        print(f"[Metrics] serving http://{host}:{port}/metrics")
+
+    def close(self):
+        self.srv.shutdown()
+        self.srv.server_close()
+
+class SnapshotWriter:
+    """interval_s마다 스냅샷 한 줄씩 JSON lines로 이어 씀 (close 시 마지막 한 줄)"""
+    def __init__(self, metrics: Metrics, path: str, interval_s: float = 5.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._t = threading.Thread(target=self._loop, daemon=True)
+        self._t.start()
+
+    def _write(self):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.metrics.snapshot()) + "\n")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            self._write()
+
+    def close(self):
+        self._stop.set()
+        self._t.join()
+        self._write()
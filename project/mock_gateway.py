@@ -0,0 +1,443 @@
+import argparse, asyncio, itertools, json, os, random, signal, sys, threading, time
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, parse_qsl
+
+from latency_sketch import LogHistogram
+
+# 로컬 OpenFaaS 대용 (Kubernetes 없이 replayer/dispatcher 전체 경로 벤치마크)
+# - asyncio HTTP/1.1 keep-alive 서버: POST /function/<name>, GET /system/functions, /healthz
+# - 함수마다 worker 프로세스(--procs-per-func)에서 dummy-func/handler.handle 실행
+#   프로세스 하나 = Pod 하나 (python3-http 템플릿처럼 스레드 --concurrency개)
+# - 느린 함수(--slow), 요청 단위 straggler(--straggler-p/--straggler-x) 주입
+# - worker를 SCHED_FIFO/RR로 (fifo_on.sh의 chrt처럼), CPU 고정 (--worker-cpus)
+# - autoscale (--scale-max): 함수의 모든 replica가 --concurrency개씩 실행 중이면 새 프로세스를 띄우고
+#   그 요청은 기동을 기다림 (= cold start, --cold-start-ms로 이미지 pull/컨테이너 기동 시간 추가)
+#   --idle-s 동안 요청이 없던 replica는 --procs-per-func개(0이면 scale-to-zero)까지 줄임
+#   -> python mock_gateway.py --port 8080 --slow func-03:4 & python workload_replayer.py
+
+HANDLER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dummy-func")
+SCHED_POLICIES = {"cfs": "SCHED_OTHER", "fifo": "SCHED_FIFO", "rr": "SCHED_RR"}
+
+class _Event:
+    """python3-http 템플릿의 event와 같은 필드"""
+    __slots__ = ("body", "headers", "method", "query", "queryString", "path")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method, self.path, self.headers, self.body = method, path, headers, body
+        self.query = self.queryString = query
+
+def _apply_policy(sched: str, rtprio: int, cpus: Optional[List[int]]) -> str:
+    """스레드를 만들기 전에 호출 -> 이후 스레드가 정책/affinity 상속"""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    if sched == "cfs":
+        return "cfs"
+    try:
+        pol = getattr(os, SCHED_POLICIES[sched])
+        os.sched_setscheduler(0, pol, os.sched_param(rtprio))
+        return sched
+    except (PermissionError, OSError) as e:
+        print(f"[MockGW] {SCHED_POLICIES[sched]} not permitted ({e}), staying on CFS", file=sys.stderr)
+        return "cfs"
+
+def _worker_main(name: str, env: dict, threads: int, sched: str, rtprio: int,
+                 cpus: Optional[List[int]], req_q, resp_q, wid: int, cold_start_ms: float = 0.0):
+    if cold_start_ms > 0:
+        time.sleep(cold_start_ms / 1000.0)     # 컨테이너 기동 흉내
+    os.environ.update(env)              # handler는 import 시점에 환경변수를 읽음
+    sys.path.insert(0, HANDLER_DIR)
+    policy = _apply_policy(sched, rtprio, cpus)
+    import handler
+
+    def run(rid, method, path, query, headers, body):
+        try:
+            r = handler.handle(_Event(method, path, query, headers, body), None)
+            status = int(r.get("statusCode", 200))
+            out, hdrs = r.get("body", b""), r.get("headers") or {}
+        except Exception as e:
+            status, out, hdrs = 500, f"handler error: {e}", {}
+        if isinstance(out, str):
+            out = out.encode()
+        elif not isinstance(out, (bytes, bytearray)):
+            out = json.dumps(out).encode()
+        resp_q.put((rid, status, bytes(out), hdrs))
+
+    ex = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=name)
+    resp_q.put(("ready", wid, policy, os.getpid()))
+    while True:
+        t = req_q.get()
+        if t is None:
+            break
+        ex.submit(run, *t)
+    ex.shutdown(wait=True)
+
+class _Worker:
+    __slots__ = ("func", "proc", "q", "inflight", "wid", "ready", "last")
+
+    def __init__(self, func, proc, q, wid, ready):
+        self.func, self.proc, self.q, self.inflight = func, proc, q, 0
+        self.wid, self.ready = wid, ready    # ready: 기동(handler import)이 끝나면 완료되는 Future
+        self.last = time.monotonic()        # 마지막 요청이 끝난 시각 (idle scale-down)
+
+class MockGateway:
+    def __init__(self, funcs: List[str], procs_per_func: int = 1, concurrency: int = 4,
+                 env: Optional[dict] = None, slow: Optional[Dict[str, float]] = None,
+                 straggler_p: float = 0.0, straggler_x: float = 10.0,
+                 sched: str = "cfs", rtprio: int = 50, worker_cpus: Optional[List[int]] = None,
+                 seed: int = 0, scale_max: int = 0, idle_s: float = 0.0, cold_start_ms: float = 0.0):
+        self.funcs = list(funcs)
+        self.procs_per_func = procs_per_func
+        self.concurrency = concurrency
+        self.env = dict(env or {})
+        self.slow = dict(slow or {})
+        self.straggler_p = straggler_p
+        self.straggler_x = straggler_x
+        self.sched, self.rtprio = sched, rtprio
+        self.worker_cpus = worker_cpus
+        self.scale_max = scale_max      # 0이면 procs_per_func개 고정
+        self.idle_s = idle_s
+        self.cold_start_ms = cold_start_ms
+        self.scale_outs = self.scale_ins = 0
+        self._retired: List[_Worker] = []
+        self.rng = random.Random(seed)
+        self.workers: Dict[str, List[_Worker]] = {}
+        self.pending: Dict[int, asyncio.Future] = {}
+        self._rid = itertools.count()
+        self.count = {f: 0 for f in self.funcs}
+        self.stragglers = 0
+        self.hist = {f: LogHistogram() for f in self.funcs}
+        self.total_ms = {f: 0.0 for f in self.funcs}
+        self.loop = None
+
+    # ---------------- worker 프로세스 ----------------
+
+    def _func_env(self, f: str) -> dict:
+        env = {k: str(v) for k, v in self.env.items()}
+        x = self.slow.get(f, 1.0)
+        if x != 1.0:
+            # 느린 Pod: arg당 시간과 고정 지연을 배수로
+            env["SCALE_MS"] = str(float(env.get("SCALE_MS", 3)) * x)
+            env["BASE_DELAY_MS"] = str(float(env.get("BASE_DELAY_MS", 0)) * x)
+        return env
+
+    def _spawn(self, f: str, cold_start_ms: float = 0.0) -> _Worker:
+        q = self._ctx.Queue()
+        wid = next(self._wid)
+        p = self._ctx.Process(target=_worker_main, daemon=True,
+                              args=(f, self._func_env(f), self.concurrency, self.sched,
+                                    self.rtprio, [next(self._cpus)] if self._cpus else None,
+                                    q, self.resp_q, wid, cold_start_ms))
+        p.start()
+        ready = self.loop.create_future()
+        self.pending[("ready", wid)] = ready
+        w = _Worker(f, p, q, wid, ready)
+        self.workers[f].append(w)
+        return w
+
+    def start(self, timeout: float = 60.0):
+        self.loop = asyncio.get_running_loop()
+        self._ctx = mp.get_context("spawn")
+        self.resp_q = self._ctx.Queue()
+        self._cpus = itertools.cycle(self.worker_cpus) if self.worker_cpus else None
+        self._wid = itertools.count()
+        for f in self.funcs:
+            self.workers[f] = []
+            for _ in range(self.procs_per_func):
+                self._spawn(f)
+        # 모든 worker가 handler import를 끝낼 때까지 대기 (측정에 기동 시간이 섞이지 않게)
+        policies = {}
+        n = sum(len(ws) for ws in self.workers.values())
+        deadline = time.time() + timeout
+        while len(policies) < n:
+            _, i, pol, _pid = self.resp_q.get(timeout=max(deadline - time.time(), 0.1))
+            policies[i] = pol
+            self.pending.pop(("ready", i)).set_result(pol)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        if self.scale_max and self.idle_s > 0:
+            self._reaper = self.loop.create_task(self._reap())
+        return sorted(set(policies.values())) or [self.sched]
+
+    def _read_loop(self):
+        while True:
+            item = self.resp_q.get()
+            if item is None:
+                break
+            self.loop.call_soon_threadsafe(self._resolve, item)
+
+    def _resolve(self, item):
+        if item[0] == "ready":      # scale-out worker 기동 완료
+            fut = self.pending.pop(item[:2], None)
+            if fut is not None and not fut.done():
+                fut.set_result(item[2])
+            return
+        fut = self.pending.pop(item[0], None)
+        if fut is not None and not fut.done():
+            fut.set_result(item[1:])
+
+    async def _reap(self):
+        # idle_s 동안 요청이 없던 replica 정리 (procs_per_func개는 남김)
+        while True:
+            await asyncio.sleep(min(self.idle_s / 2.0, 1.0))
+            now = time.monotonic()
+            for f, ws in self.workers.items():
+                for w in list(ws):
+                    if len(ws) <= self.procs_per_func:
+                        break
+                    if w.ready.done() and not w.inflight and now - w.last >= self.idle_s:
+                        ws.remove(w)
+                        w.q.put(None)
+                        self._retired.append(w)
+                        self.scale_ins += 1
+
+    def _pick(self, f: str) -> _Worker:
+        ws = self.workers[f]
+        w = min(ws, key=lambda w: w.inflight) if ws else None
+        if self.scale_max and len(ws) < self.scale_max and (w is None or w.inflight >= self.concurrency):
+            # 모든 replica가 꽉 참(또는 scale-to-zero 상태) -> scale out, 이 요청이 기동 시간을 치름
+            self.scale_outs += 1
+            w = self._spawn(f, self.cold_start_ms)
+        return w
+
+    def stop(self):
+        if getattr(self, "_reaper", None) is not None:
+            self._reaper.cancel()
+        for ws in self.workers.values():
+            for w in ws:
+                w.q.put(None)
+        for w in [w for ws in self.workers.values() for w in ws] + self._retired:
+            w.proc.join(timeout=5)
+            if w.proc.is_alive():
+                w.proc.terminate()
+        self.resp_q.put(None)
+        self._reader.join()     # 남은 응답을 loop가 닫히기 전에 넘김
+
+    # ---------------- 요청 처리 ----------------
+
+    async def _call(self, w: _Worker, method, path, query, headers, body):
+        rid = next(self._rid)
+        w.inflight += 1
+        try:
+            if not w.ready.done():
+                await asyncio.shield(w.ready)     # 기동 중인 replica (cold start)
+            fut = self.loop.create_future()
+            self.pending[rid] = fut
+            w.q.put((rid, method, path, query, headers, body))
+            return await fut
+        finally:
+            w.inflight -= 1
+            w.last = time.monotonic()
+
+    def _straggle(self, body: bytes) -> bytes:
+        # arg를 straggler_x배로 -> 해당 요청만 오래 실행 (취소 요청, 숫자 아닌 arg는 그대로)
+        try:
+            data = json.loads(body)
+            data["arg"] = int(float(data["arg"]) * self.straggler_x)
+        except (ValueError, TypeError, KeyError):
+            return body
+        self.stragglers += 1
+        return json.dumps(data).encode()
+
+    async def invoke(self, f: str, method, path, query, headers, body):
+        if b'"cancel"' in body:
+            # 취소 신호는 그 함수의 모든 프로세스로 (어느 프로세스에서 실행 중인지 모름)
+            ws = [w for w in self.workers[f] if w.ready.done()]
+            if not ws:
+                return 200, json.dumps({"ok": True, "ran_ms": 0.0}).encode(), {}
+            res = await asyncio.gather(*(self._call(w, method, path, query, headers, body) for w in ws))
+            return max(res, key=lambda r: _ran_ms(r[1]))
+        if self.straggler_p > 0 and self.rng.random() < self.straggler_p:
+            body = self._straggle(body)
+        w = self._pick(f)
+        t0 = time.perf_counter()
+        res = await self._call(w, method, path, query, headers, body)
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.count[f] += 1
+        self.total_ms[f] += ms
+        self.hist[f].add(ms)
+        return res
+
+    async def route(self, method: str, target: str, headers: dict, body: bytes):
+        u = urlsplit(target)
+        path = u.path
+        if path.startswith("/function/"):
+            f = path[len("/function/"):].split("/", 1)[0]
+            if f not in self.workers:
+                return 404, f"function {f} not found".encode(), {}
+            headers["x-start-time"] = str(time.time_ns())     # OpenFaaS gateway처럼 수신 시각(ns)
+            return await self.invoke(f, method, path, dict(parse_qsl(u.query)), headers, body)
+        if path == "/system/functions":
+            out = [{"name": f, "replicas": sum(w.ready.done() for w in self.workers[f]),
+                    "invocationCount": self.count[f]} for f in self.funcs]
+            return 200, json.dumps(out).encode(), {"Content-Type": "application/json"}
+        if path == "/healthz":
+            return 200, b"OK", {}
+        return 404, b"not found", {}
+
+    async def _conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, ver = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for ln in lines[1:]:
+                    if ln:
+                        k, _, v = ln.partition(":")
+                        headers[k.strip().lower()] = v.strip()
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    body = await _read_chunked(reader)
+                else:
+                    n = int(headers.get("content-length") or 0)
+                    body = await reader.readexactly(n) if n else b""
+                conn = headers.get("connection", "").lower()
+                keep = conn != "close" if ver == "HTTP/1.1" else conn == "keep-alive"
+
+                t0 = time.perf_counter()
+                status, out, hdrs = await self.route(method, target, headers, body)
+                hdrs = dict(hdrs)
+                hdrs["Content-Length"] = str(len(out))
+                hdrs["X-Duration-Seconds"] = f"{time.perf_counter() - t0:.6f}"
+                hdrs["Connection"] = "keep-alive" if keep else "close"
+                resp = [f"HTTP/1.1 {status} {_phrase(status)}"] + [f"{k}: {v}" for k, v in hdrs.items()]
+                writer.write(("\r\n".join(resp) + "\r\n\r\n").encode("latin-1") + out)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def report(self) -> dict:
+        out = {}
+        for f in self.funcs:
+            h = self.hist[f]
+            if self.count[f]:
+                q = h.quantiles([0.5, 0.99])
+                out[f] = {"requests": self.count[f], "avg_ms": round(self.total_ms[f] / self.count[f], 3),
+                          "p50_ms": round(float(q[0]), 3), "p99_ms": round(float(q[1]), 3)}
+        return out
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    parts = []
+    while True:
+        n = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+        if n == 0:
+            await reader.readuntil(b"\r\n")
+            return b"".join(parts)
+        parts.append(await reader.readexactly(n))
+        await reader.readexactly(2)
+
+def _phrase(code: int) -> str:
+    try:
+        return HTTPStatus(code).phrase
+    except ValueError:
+        return ""
+
+def _ran_ms(body: bytes) -> float:
+    try:
+        return float(json.loads(body).get("ran_ms") or 0.0)
+    except (ValueError, TypeError, AttributeError):
+        return 0.0
+
+def _parse_slow(spec: Optional[str]) -> Dict[str, float]:
+    # 예: "func-03:4,func-07:2.5"
+    out = {}
+    for part in (spec or "").split(","):
+        if part:
+            f, x = part.split(":")
+            out[f] = float(x)
+    return out
+
+def _parse_cpus(spec: Optional[str]) -> Optional[List[int]]:
+    # 예: "1-3,6" -> [1, 2, 3, 6]
+    if not spec:
+        return None
+    out = []
+    for part in spec.split(","):
+        lo, _, hi = part.partition("-")
+        out.extend(range(int(lo), int(hi or lo) + 1))
+    return out
+
+async def serve(gw: MockGateway, host: str, port: int, backlog: int = 4096):
+    policies = gw.start()
+    srv = await asyncio.start_server(gw._conn, host, port, backlog=backlog)
+    n = sum(len(ws) for ws in gw.workers.values())
+    print(f"[MockGW] {len(gw.funcs)} functions x {gw.procs_per_func} procs x {gw.concurrency} threads "
+          f"({n} workers, policy {','.join(policies)}) on http://{host}:{port}")
+    if gw.scale_max:
+        print(f"[MockGW] autoscale up to {gw.scale_max} procs/func, idle scale-down after {gw.idle_s:g}s, "
+              f"cold start +{gw.cold_start_ms:g} ms")
+    stop = asyncio.Event()
+    for s in (signal.SIGINT, signal.SIGTERM):
+        gw.loop.add_signal_handler(s, stop.set)
+    async with srv:
+        await stop.wait()
+    gw.stop()
+    print(f"[MockGW] stragglers injected: {gw.stragglers}")
+    if gw.scale_max:
+        print(f"[MockGW] scale-outs: {gw.scale_outs}, scale-ins: {gw.scale_ins}")
+    print(json.dumps(gw.report(), indent=2))
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="local OpenFaaS gateway stand-in running dummy-func/handler.py")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--funcs", type=int, default=15)
+    ap.add_argument("--procs-per-func", type=int, default=1, help="함수당 worker 프로세스(Pod) 수")
+    ap.add_argument("--concurrency", type=int, default=4, help="worker 프로세스당 스레드 수")
+    # handler 환경변수 (stack.yaml과 같은 의미)
+    ap.add_argument("--mode", choices=["cpu", "sleep", "fib"], default="cpu")
+    ap.add_argument("--scale-ms", type=float, default=3.0)
+    ap.add_argument("--base-delay-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--response-bytes", type=int, default=0)
+    # 지연 주입
+    ap.add_argument("--slow", default=None, help="느린 함수, 예: func-03:4,func-07:2.5")
+    ap.add_argument("--straggler-p", type=float, default=0.0, help="요청이 straggler가 될 확률")
+    ap.add_argument("--straggler-x", type=float, default=10.0, help="straggler 요청의 arg 배수")
+    ap.add_argument("--seed", type=int, default=0)
+    # 스케줄링
+    ap.add_argument("--sched", choices=list(SCHED_POLICIES), default="cfs",
+                    help="worker 스케줄링 정책 (fifo/rr은 CAP_SYS_NICE 필요, 없으면 CFS 유지)")
+    ap.add_argument("--rtprio", type=int, default=50)
+    ap.add_argument("--worker-cpus", default=None,
+                    help="worker를 CPU 하나씩 돌아가며 고정, 예: 1-7 (gateway용 CPU는 비워 둘 것)")
+    ap.add_argument("--gateway-cpus", default=None, help="gateway 프로세스 CPU, 예: 0")
+    # autoscale (cold start)
+    ap.add_argument("--scale-max", type=int, default=0,
+                    help="함수당 최대 replica 수 (0: --procs-per-func개 고정)")
+    ap.add_argument("--idle-s", type=float, default=0.0,
+                    help="이 시간 요청이 없던 replica를 --procs-per-func개까지 줄임 (0: 줄이지 않음)")
+    ap.add_argument("--cold-start-ms", type=float, default=0.0,
+                    help="scale-out replica의 추가 기동 시간 (프로세스 기동 + handler import에 더해짐)")
+    a = ap.parse_args()
+    if a.scale_max and a.scale_max < a.procs_per_func:
+        ap.error("--scale-max must be >= --procs-per-func")
+    if not a.scale_max and a.procs_per_func < 1:
+        ap.error("--procs-per-func 0 (scale to zero) needs --scale-max")
+    return a
+
+if __name__ == "__main__":
+    a = parse_args()
+    if a.gateway_cpus:
+        os.sched_setaffinity(0, _parse_cpus(a.gateway_cpus))
+    env = {"MODE": a.mode, "SCALE_MS": a.scale_ms, "BASE_DELAY_MS": a.base_delay_ms,
+           "JITTER_MS": a.jitter_ms, "RESPONSE_BYTES": a.response_bytes,
+           "SCHED_MODE": "CFS"}     # 정책은 worker 기동 시 적용 (fifo_on.sh의 chrt와 같음)
+    gw = MockGateway([f"func-{i:02d}" for i in range(a.funcs)], a.procs_per_func, a.concurrency,
+                     env=env, slow=_parse_slow(a.slow), straggler_p=a.straggler_p,
+                     straggler_x=a.straggler_x, sched=a.sched, rtprio=a.rtprio,
+                     worker_cpus=_parse_cpus(a.worker_cpus), seed=a.seed,
+                     scale_max=a.scale_max, idle_s=a.idle_s, cold_start_ms=a.cold_start_ms)
+    asyncio.run(serve(gw, a.host, a.port))
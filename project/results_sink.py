@@ -0,0 +1,190 @@
+import itertools
+import os
+import queue
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+# 결과 한 건 = 컬럼 배열의 한 칸
+# - 요청마다 dict를 만들지 않고, 미리 잡아 둔 chunk(컬럼별 numpy 배열)에 바로 기록
+# - 칸 번호는 itertools.count로 받음 (GIL 아래 원자적) -> 기록 경로에 lock 없음
+# - chunk가 다 차면 writer 스레드가 append-only 파일에 이어 씀
+#   (pyarrow 있으면 Arrow IPC stream, 없으면 CSV) -> 비정상 종료 시에도 chunk 단위까지 보존
+# - 끝난 뒤 export_csv()로 기존 {MODE}_result.csv 형식 생성
+
+# (이름, dtype) / "cat"은 categories 목록의 번호(int16, -1 = 없음)
+RESULT_SCHEMA: List[Tuple[str, str]] = [
+    ("timestamp", "f8"),
+    ("function", "cat"),
+    ("arg", "i2"),
+    ("trun_around_ms", "f8"),
+    ("exec_ms", "f8"),
+    ("res_ms", "f8"),
+    ("ctxsw_delta_total", "f8"),
+    ("ctxsw_delta_vol", "f8"),
+    ("ctxsw_delta_invol", "f8"),
+    # handler의 커널 스케줄링 통계 (sched 필드, 없으면 NaN / cpu=-1)
+    ("runq_wait_ms", "f8"),
+    ("oncpu_ms", "f8"),
+    ("migrations", "f8"),
+    ("cpu", "i2"),
+    ("throttled_ms", "f8"),
+    ("nr_throttled", "f8"),
+    ("success", "u1"),
+]
+# 기존 CSV export 컬럼 (success, seq 제외)
+CSV_COLUMNS = [n for n, _ in RESULT_SCHEMA if n != "success"]
+
+def _np_dtype(t: str) -> str:
+    return "i2" if t == "cat" else t
+
+class _Chunk:
+    __slots__ = ("cols", "filled")
+
+    def __init__(self, schema, size: int):
+        self.cols = [np.empty(size, dtype=_np_dtype(t)) for _, t in schema]
+        self.filled = itertools.count(1)
+
+class ResultSink:
+    """
+    고정 크기 chunk 기반 결과 기록기
+    fmt: auto | arrow | csv  (auto: pyarrow가 있으면 arrow)
+    """
+    def __init__(self, path_base: str, categories: Sequence[str],
+                 schema: List[Tuple[str, str]] = RESULT_SCHEMA,
+                 chunk_rows: int = 1024, fmt: str = "auto"):
+        if fmt == "auto":
+            fmt = "arrow" if pa is not None else "csv"
+        if fmt == "arrow" and pa is None:
+            raise RuntimeError("results format arrow requires pyarrow (pip install pyarrow)")
+        self.fmt = fmt
+        self.path = path_base + (".arrow" if fmt == "arrow" else ".stream.csv")
+        self.schema = schema
+        self.names = [n for n, _ in schema]
+        self.categories = list(categories)
+        self.cat_index = {c: i for i, c in enumerate(self.categories)}
+        self.chunk_rows = chunk_rows
+        self._slot = itertools.count()
+        self._chunks = {}
+        self._new_chunk = threading.Lock()    # chunk 생성 시에만 (chunk_rows건당 한 번)
+        self._q = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        self.count = 0
+
+    def _chunk(self, cid: int) -> _Chunk:
+        c = self._chunks.get(cid)
+        if c is None:
+            with self._new_chunk:
+                c = self._chunks.get(cid)
+                if c is None:
+                    c = self._chunks[cid] = _Chunk(self.schema, self.chunk_rows)
+        return c
+
+    def add(self, *values):
+        """schema 순서대로 값 하나씩 (cat 컬럼은 categories 번호)"""
+        slot = next(self._slot)
+        cid, off = divmod(slot, self.chunk_rows)
+        c = self._chunk(cid)
+        for col, v in zip(c.cols, values):
+            col[off] = v
+        if next(c.filled) == self.chunk_rows:
+            self._q.put((cid, self.chunk_rows))
+
+    # ---------------- writer ----------------
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "wb")
+        if self.fmt == "arrow":
+            fields = [pa.field(n, pa.dictionary(pa.int16(), pa.string()) if t == "cat"
+                               else pa.from_numpy_dtype(np.dtype(t)))
+                      for n, t in self.schema] + [pa.field("seq", pa.int64())]
+            return f, pa_ipc.new_stream(f, pa.schema(fields))
+        f.write((",".join(self.names + ["seq"]) + "\n").encode())
+        return f, None
+
+    def _write_chunk(self, f, w, cid: int, n: int):
+        c = self._chunks.pop(cid)
+        seq = np.arange(cid * self.chunk_rows, cid * self.chunk_rows + n, dtype=np.int64)
+        cols = [col[:n] for col in c.cols]
+        if w is not None:
+            cats = pa.array(self.categories, type=pa.string())
+            arrays = [pa.DictionaryArray.from_arrays(pa.array(col, mask=col < 0), cats)
+                      if t == "cat" else pa.array(col)
+                      for col, (_, t) in zip(cols, self.schema)]
+            w.write_batch(pa.record_batch(arrays + [pa.array(seq)], names=self.names + ["seq"]))
+        else:
+            lines = []
+            out = [self._csv_col(col, t) for col, (_, t) in zip(cols, self.schema)]
+            for row in zip(*out, seq.tolist()):
+                lines.append(",".join(map(str, row)))
+            f.write(("\n".join(lines) + "\n").encode())
+        f.flush()
+        self.count += n
+
+    def _csv_col(self, col: np.ndarray, t: str) -> list:
+        if t == "cat":
+            return [self.categories[i] if i >= 0 else "" for i in col.tolist()]
+        if t == "f8":
+            return ["" if x != x else repr(x) for x in col.tolist()]
+        return col.tolist()
+
+    def _write_loop(self):
+        f, w = self._open()
+        try:
+            while True:
+                item = self._q.get()
+                if item is None:
+                    break
+                self._write_chunk(f, w, *item)
+        finally:
+            if w is not None:
+                w.close()
+            f.close()
+
+    def close(self):
+        """남은 부분 chunk까지 기록하고 파일 닫기 (모든 add가 끝난 뒤 호출)"""
+        total = next(self._slot)
+        for cid in sorted(list(self._chunks)):
+            n = min(self.chunk_rows, total - cid * self.chunk_rows)
+            if n < self.chunk_rows:
+                self._q.put((cid, n))
+        self._q.put(None)
+        self._writer.join()
+
+def read_results(path: str):
+    """sink 파일(.arrow | .stream.csv) -> pandas DataFrame (seq 순)"""
+    import pandas as pd
+    if path.endswith(".arrow"):
+        if pa is None:
+            raise RuntimeError("reading .arrow results requires pyarrow")
+        with open(path, "rb") as f:
+            df = pa_ipc.open_stream(f).read_all().to_pandas()
+        df["function"] = df["function"].astype(object)
+    else:
+        df = pd.read_csv(path, keep_default_na=False, na_values=[""],
+                         dtype={"function": str})
+    return df.sort_values("seq", kind="stable").reset_index(drop=True)
+
+def export_csv(src: str, out_path: Optional[str], warmup_drop: int = 0,
+               columns: Optional[List[str]] = None):
+    """
+    성공한 결과만 기존 CSV 형식으로 (완료 순서 기준 앞의 warmup_drop건 제외, out_path가 None이면 쓰지 않음)
+    반환: (DataFrame, 성공 건수(warmup 포함), 전체 건수)
+    """
+    df = read_results(src)
+    total = len(df)
+    succ = df[df["success"] == 1]
+    n_ok = len(succ)
+    succ = succ.iloc[min(warmup_drop, n_ok):]
+    if out_path:
+        succ.to_csv(out_path, columns=columns or CSV_COLUMNS, index=False)
+    return succ, n_ok, total
@@ -31,23 +31,21 @@ for M in "${MODES[@]}"; do
   hard_bounce
   sleep "$SLEEP_BETWEEN"
 
-  rm -f "./$M/${M}_result.csv" "./$M/${M}_result_"*.csv 2>/dev/null || true
+  rm -f "./$M/${M}_result.csv" "./$M/${M}_result_"*.csv "./$M/${M}_result_"*.arrow 2>/dev/null || true
 
   for i in $(seq 1 $RUNS); do
     echo "[Run] $M #$i"
     $REPLAYER
     mv "./$M/${M}_result.csv" "./$M/${M}_result_${i}.csv"
+    mv "./$M/${M}_run.json" "./$M/${M}_run_${i}.json" 2>/dev/null || true
+    for ext in arrow stream.csv; do
+      mv "./$M/${M}_result.$ext" "./$M/${M}_result_${i}.$ext" 2>/dev/null || true
+    done
     sleep 1
   done
-
-  head -n1 "./$M/${M}_result_1.csv" > "./$M/${M}_result.csv"
-  for i in $(seq 1 $RUNS); do
-    tail -n +2 "./$M/${M}_result_${i}.csv" >> "./$M/${M}_result.csv"
-  done
-  echo "[Mode $M] merged -> ./$M/${M}_result.csv"
 done
 
-python3 compare_three.py
+python3 compare_three.py --modes "$(IFS=,; echo "${MODES[*]}")"
 
-echo "[RunAll] done. Outputs in: compare_results/three  and  compare_results/three_runs"
+echo "[RunAll] done. Outputs in: compare_results/three"
 
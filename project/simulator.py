@@ -0,0 +1,552 @@
+import argparse
+import heapq
+import itertools
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from custom_scheduler import _DispatcherCore, _Attempt, LoadTracker, QUEUE_POLICIES
+from trace_parser import dur_list, fib
+from results_sink import CSV_COLUMNS
+from workload_io import open_workload, iter_records
+
+# 이산 사건 시뮬레이터
+# - 가상 시계(ms) 위에서 custom_scheduler의 정책 코드(_DispatcherCore: EWMA, 격리,
+#   후보 선택, hedge 지연, 대기열 우선순위)를 그대로 실행
+# - 함수마다 Pod 1개 = 서버 1개 (cores개 CPU)
+#   ps  : processor sharing (CFS 근사, 실행 중인 요청이 CPU를 나눠 씀)
+#   fifo: run-to-completion (SCHED_FIFO 근사, 도착 순으로 cores개씩)
+# - 서비스 시간: trace (fib N -> dur_list 보정값) | scale (arg * service_ms_per_arg, handler MODE=cpu)
+#   | recorded (replayer 결과 CSV의 arg별 exec_ms 분포에서 표본 추출)
+# - 도착: 워크로드 파일의 inter-arrival 그대로
+
+_FIB_MS = dict(zip(fib, dur_list))
+
+class _Events:
+    """(시각, 순번, 함수, 인자) 최소 힙"""
+    def __init__(self):
+        self.q = []
+        self.now = 0.0
+        self._seq = itertools.count()
+
+    def at(self, t: float, fn, *args):
+        heapq.heappush(self.q, (t, next(self._seq), fn, args))
+
+    def run(self, until: float = float("inf")):
+        q = self.q
+        while q and q[0][0] <= until:
+            t, _, fn, args = heapq.heappop(q)
+            self.now = t
+            fn(*args)
+
+class _Job:
+    __slots__ = ("work", "done", "start", "vfinish", "alive")
+
+    def __init__(self, work: float, done):
+        self.work = work            # 필요한 CPU 시간(ms)
+        self.done = done            # done(exec_ms) 콜백
+        self.start = None
+        self.vfinish = 0.0
+        self.alive = True
+
+class PSServer:
+    """
+    processor sharing: n개가 실행 중이면 각자 min(1, cores/n) 속도
+    가상 시간 V(t)를 속도만큼 증가시키고, 작업은 V가 시작 V + work에 닿으면 끝남
+    """
+    def __init__(self, ev: _Events, cores: int = 1):
+        self.ev = ev
+        self.cores = cores
+        self.v = 0.0
+        self.t = 0.0
+        self.n = 0
+        self.heap = []
+        self._ver = 0
+        self._seq = itertools.count()
+
+    def _rate(self) -> float:
+        return min(1.0, self.cores / self.n) if self.n else 0.0
+
+    def _advance(self):
+        now = self.ev.now
+        self.v += (now - self.t) * self._rate()
+        self.t = now
+
+    def _reschedule(self):
+        self._ver += 1
+        while self.heap and not self.heap[0][2].alive:
+            heapq.heappop(self.heap)
+        if self.heap:
+            dt = (self.heap[0][0] - self.v) / self._rate()
+            self.ev.at(self.t + max(dt, 0.0), self._complete, self._ver)
+
+    def submit(self, job: _Job):
+        if not job.alive:
+            return      # 도착 전에 취소됨
+        self._advance()
+        job.start = self.ev.now
+        job.vfinish = self.v + job.work
+        heapq.heappush(self.heap, (job.vfinish, next(self._seq), job))
+        self.n += 1
+        self._reschedule()
+
+    def _complete(self, ver: int):
+        if ver != self._ver:
+            return
+        self._advance()
+        # 버전이 같으면 예약 당시 맨 앞 작업은 끝난 것 (부동소수 오차로 v가 살짝 모자라도)
+        if self.heap:
+            self.v = max(self.v, self.heap[0][0])
+        done = []
+        while self.heap and (self.heap[0][0] <= self.v + 1e-9 or not self.heap[0][2].alive):
+            _, _, job = heapq.heappop(self.heap)
+            if job.alive:
+                job.alive = False
+                self.n -= 1
+                done.append(job)
+        self._reschedule()
+        for job in done:
+            job.done(self.ev.now - job.start)
+
+    def cancel(self, job: _Job) -> float:
+        """실행을 멈추고 그때까지 쓴 CPU 시간(ms) 반환"""
+        if not job.alive:
+            return 0.0
+        self._advance()
+        job.alive = False
+        if job.start is None:
+            return 0.0
+        self.n -= 1
+        served = job.work - (job.vfinish - self.v)
+        self._reschedule()
+        return max(0.0, served)
+
+class FIFOServer:
+    """run-to-completion: cores개까지 도착 순으로 실행, 나머지는 대기"""
+    def __init__(self, ev: _Events, cores: int = 1):
+        self.ev = ev
+        self.free = cores
+        self.q = deque()
+
+    def submit(self, job: _Job):
+        if not job.alive:
+            return
+        if self.free > 0:
+            self._start(job)
+        else:
+            self.q.append(job)
+
+    def _start(self, job: _Job):
+        self.free -= 1
+        job.start = self.ev.now
+        self.ev.at(self.ev.now + job.work, self._complete, job)
+
+    def _complete(self, job: _Job):
+        if not job.alive:
+            return
+        job.alive = False
+        self._next()
+        job.done(self.ev.now - job.start)
+
+    def _next(self):
+        self.free += 1
+        while self.q and self.free > 0:
+            j = self.q.popleft()
+            if j.alive:
+                self._start(j)
+
+    def cancel(self, job: _Job) -> float:
+        if not job.alive:
+            return 0.0
+        job.alive = False
+        if job.start is None:
+            return 0.0      # 대기 중이었으면 큐에서 나중에 걸러짐
+        self._next()
+        return self.ev.now - job.start
+
+SERVERS = {"ps": PSServer, "fifo": FIFOServer}
+
+class _Gate:
+    """함수별 동시 실행 상한 + 대기열 (queue_policy가 없으면 도착 순)"""
+    def __init__(self, capacity: int, key_fn=None, aging: float = 0.5):
+        self.free = capacity
+        self.capacity = capacity
+        self.q = []
+        self.key_fn = key_fn
+        self.aging = aging
+        self._seq = itertools.count()
+
+    def acquire(self, prio, start) -> bool:
+        if self.free > 0 and not self.q:
+            self.free -= 1
+            return True
+        key = self.key_fn(prio[0], prio[1], prio[2], self.aging) if (self.key_fn and prio) else 0.0
+        heapq.heappush(self.q, (key, next(self._seq), start))
+        return False
+
+    def release(self):
+        while self.q:
+            _, _, start = heapq.heappop(self.q)
+            if start():
+                return
+        self.free = min(self.free + 1, self.capacity)
+
+class _SimLoad(LoadTracker):
+    """단일 스레드용 LoadTracker (lock 생략)"""
+    def add(self, f: str, waiting: int = 0, inflight: int = 0):
+        self.waiting[f] += waiting
+        self.inflight[f] += inflight
+
+class _Request:
+    __slots__ = ("i", "arrival", "payload", "attempts", "done", "hedged")
+
+    def __init__(self, i: int, arrival: float, payload: dict):
+        self.i = i
+        self.arrival = arrival
+        self.payload = payload
+        self.attempts = []
+        self.done = False
+        self.hedged = False
+
+class _SimAttempt(_Attempt):
+    """_Attempt + 시뮬레이션 상태 (대기 중 / 서버 작업)"""
+    def __init__(self, f, payload, hedge_id, arrival_ms, req):
+        super().__init__(f, payload, hedge_id, arrival_ms)
+        self.req = req
+        self.job = None
+        self.t0 = None
+        self.finished = False
+
+class SimDispatcher(_DispatcherCore):
+    """
+    _DispatcherCore 정책을 가상 시계에서 실행하는 디스패처
+    CustomDispatcher.invoke/_post와 같은 순서: 후보 선택 -> 토큰 대기 -> 실행,
+    hedge 지연이 지나면 backup에 1회 복제, 먼저 끝난 쪽 채택, 진 쪽은 취소(또는 끝까지 실행)
+    """
+    def __init__(self, sim: "Simulator", functions: List[str], per_func_concurrency: int = 2, **kw):
+        super().__init__("sim://", functions, clock=lambda: sim.ev.now, **kw)
+        self.sim = sim
+        self.load = _SimLoad(self.funcs)
+        key_fn = None
+        if self.queue_policy is not None:
+            key_fn = QUEUE_POLICIES[self.queue_policy] if isinstance(self.queue_policy, str) else self.queue_policy
+        self.gates: Dict[str, _Gate] = {f: _Gate(per_func_concurrency, key_fn, self.queue_aging)
+                                         for f in self.funcs}
+        if key_fn is not None:
+            self.gate = self.gates  # _queue_prio / _observe가 대기열 모드로 동작하도록
+        self._hid = itertools.count(1)
+
+    def _new_attempt(self, f, payload, arrival_ms=None):
+        hid = next(self._hid) if (self.hedge_cancel and self.cancel_signal) else None
+        return _SimAttempt(f, payload, hid, arrival_ms, None)
+
+    def invoke(self, req: _Request):
+        primary, backup = self._pick_pair()
+        self._post(req, primary)
+        delay = self._hedge_delay_ms(primary, req.payload)
+        self.sim.ev.at(self.sim.ev.now + delay, self._hedge, req, backup)
+
+    def _hedge(self, req: _Request, backup: str):
+        if req.done or req.hedged:
+            return
+        req.hedged = True
+        self.stats.add(fired=1)
+        self._post(req, backup)
+
+    def _post(self, req: _Request, f: str):
+        a = self._new_attempt(f, req.payload, req.arrival)
+        a.req = req
+        req.attempts.append(a)
+        self.load.add(f, waiting=1)
+        if self.gates[f].acquire(self._queue_prio(a), lambda: self._start(a)):
+            self._start(a)
+
+    def _start(self, a: _SimAttempt) -> bool:
+        # 토큰을 얻은 시점 (취소된 시도면 토큰을 다음 대기자에게)
+        self.load.add(a.f, waiting=-1)
+        if a.cancelled:
+            return False
+        self.load.add(a.f, inflight=1)
+        a.t0 = self.sim.ev.now
+        self.sim.send(a, self._finish)
+        return True
+
+    def _finish(self, a: _SimAttempt, exec_ms: float):
+        if a.finished or a.cancelled:
+            return
+        a.finished = True
+        self.load.add(a.f, inflight=-1)
+        self.gates[a.f].release()
+        elapsed = self.sim.ev.now - a.t0
+        self._record(a.f, elapsed)
+        self._observe(a.f, a.payload, elapsed)
+        req = a.req
+        if req.done:
+            # 취소하지 않은 진 쪽: 끝까지 실행한 시간이 낭비
+            self.stats.add(wasted_cpu_ms=exec_ms)
+            return
+        req.done = True
+        if len(req.attempts) > 1 and a is req.attempts[1]:
+            self.stats.add(won=1)
+        for other in req.attempts:
+            if other is a or other.finished:
+                continue
+            if self.hedge_cancel:
+                self._cancel(other)
+        self.sim.complete(req, a.f, exec_ms)
+
+    def _cancel(self, a: _SimAttempt):
+        a.cancelled = True
+        self.stats.add(cancelled=1)
+        if a.t0 is None:
+            return      # 아직 토큰 대기 중: 토큰을 받는 순간 버려짐
+        self.load.add(a.f, inflight=-1)
+        self.gates[a.f].release()
+        served = self.sim.cancel(a)
+        self.stats.add(wasted_cpu_ms=served)
+
+class Simulator:
+    """
+    dispatch: custom (SimDispatcher) | rr (replayer CFS/FIFO 모드처럼 라운드로빈, 상한/hedge 없음)
+    server: ps | fifo
+    """
+    def __init__(self, n_funcs: int = 15, dispatch: str = "custom", server: str = "ps",
+                 cores: int = 1, service: str = "trace", service_ms_per_arg: float = 3.0,
+                 rtt_ms: float = 1.0, jitter: float = 0.0, slow: Optional[Dict[str, float]] = None,
+                 seed: int = 0, per_func_concurrency: int = 2,
+                 recorded: Optional[Dict[int, np.ndarray]] = None, **custom_kwargs):
+        self.ev = _Events()
+        self.funcs = [f"func-{i:02d}" for i in range(n_funcs)]
+        self.servers = {f: SERVERS[server](self.ev, cores) for f in self.funcs}
+        self.dispatch = dispatch
+        self.service = service
+        self.service_ms_per_arg = service_ms_per_arg
+        self.recorded = recorded or {}  # service=recorded: arg -> exec_ms 표본
+        if service == "recorded" and not self.recorded:
+            raise ValueError("service=recorded needs recorded samples (load_recorded)")
+        self.rtt_ms = rtt_ms
+        self.jitter = jitter            # 서비스 시간 lognormal sigma
+        self.slow = slow or {}          # 함수별 서비스 시간 배율 (느린 Pod 주입)
+        self.rng = np.random.default_rng(seed)
+        self._jit = []
+        self._unif = []
+        self._rr = 0
+        self.disp = None
+        if dispatch == "custom":
+            self.disp = SimDispatcher(self, self.funcs, per_func_concurrency,
+                                      service_ms_per_arg=service_ms_per_arg, **custom_kwargs)
+            self.disp._rng.seed(seed)
+
+    def service_ms(self, f: str, arg: int) -> float:
+        rec = self.recorded.get(arg) if self.service == "recorded" else None
+        if rec is not None:
+            ms = float(rec[int(self._uniform_next() * len(rec))])
+        elif self.service != "scale" and arg in _FIB_MS:
+            ms = float(_FIB_MS[arg])
+        else:
+            ms = arg * self.service_ms_per_arg
+        if self.jitter:
+            ms *= self._jitter_next()
+        return ms * self.slow.get(f, 1.0)
+
+    def _jitter_next(self) -> float:
+        # 난수는 4096개씩 미리 뽑아 둠 (호출당 numpy 오버헤드 제거)
+        if not self._jit:
+            self._jit = self.rng.lognormal(0.0, self.jitter, 4096).tolist()
+        return self._jit.pop()
+
+    def _uniform_next(self) -> float:
+        if not self._unif:
+            self._unif = self.rng.random(4096).tolist()
+        return self._unif.pop()
+
+    def send(self, a, on_done):
+        """요청 전송 -> 서버 실행 -> 응답 (rtt 절반씩)"""
+        f = a.f
+        job = _Job(self.service_ms(f, a.payload["arg"]), lambda ex: self.ev.at(self.ev.now + self.rtt_ms / 2,
+                                                                                 on_done, a, ex))
+        a.job = job
+        self.ev.at(self.ev.now + self.rtt_ms / 2, self.servers[f].submit, job)
+
+    def cancel(self, a) -> float:
+        job = a.job
+        if job is None:
+            return 0.0
+        return self.servers[a.f].cancel(job)
+
+    def complete(self, req: _Request, f: str, exec_ms: float):
+        i = req.i
+        self.t_arr[i] = req.arrival
+        self.trun[i] = self.ev.now - req.arrival
+        self.exec[i] = exec_ms
+        self.fidx[i] = self._fidx[f]
+        self.n_done += 1
+
+    # ---- rr 디스패치 (상한/hedge 없음) ----
+    class _Plain:
+        __slots__ = ("f", "payload", "req", "job")
+
+        def __init__(self, f, payload, req):
+            self.f, self.payload, self.req, self.job = f, payload, req, None
+
+    def _rr_invoke(self, req: _Request, fid: int):
+        if fid >= 0:
+            f = self.funcs[fid % len(self.funcs)]
+        else:
+            f = self.funcs[self._rr % len(self.funcs)]
+            self._rr += 1
+        self.send(self._Plain(f, req.payload, req), lambda a, ex: self.complete(a.req, a.f, ex))
+
+    def _arrive(self, i: int, arg: int, fid: int):
+        req = _Request(i, self.ev.now, {"arg": arg})
+        if self.disp is not None:
+            self.disp.invoke(req)
+        else:
+            self._rr_invoke(req, fid)
+
+    def run(self, records, n: int, horizon_ms: float = float("inf")) -> dict:
+        """records: (ia, arg, func) 반복자, n: 레코드 수 (결과 배열 크기)"""
+        self.t_arr = np.full(n, np.nan)
+        self.trun = np.full(n, np.nan)
+        self.exec = np.full(n, np.nan)
+        self.args = np.zeros(n, dtype=np.int16)
+        self.fidx = np.full(n, -1, dtype=np.int16)
+        self._fidx = {f: i for i, f in enumerate(self.funcs)}
+        self.n_done = 0
+        wall = time.perf_counter()
+        t = 0.0
+        i = 0
+        # 도착은 미리 다 넣지 않고, 다음 도착 시각까지 사건을 처리하면서 하나씩 추가
+        for ia, arg, fid in records:
+            t += ia * 1000.0
+            self.ev.run(until=t)
+            self.ev.now = t
+            self.args[i] = arg
+            self._arrive(i, arg, fid)
+            i += 1
+        self.ev.run(until=horizon_ms)
+        self.n = i
+        self.wall_s = time.perf_counter() - wall
+        return self.summary()
+
+    def summary(self) -> dict:
+        ok = ~np.isnan(self.trun[:self.n])
+        trun, ex = self.trun[:self.n][ok], self.exec[:self.n][ok]
+        res = np.maximum(trun - ex, 0.0)
+
+        def q(a):
+            if not len(a):
+                return {}
+            p = np.percentile(a, [50, 95, 99])
+            return {"avg": round(float(a.mean()), 3), "p50": round(float(p[0]), 3),
+                    "p95": round(float(p[1]), 3), "p99": round(float(p[2]), 3)}
+        out = {"requests": int(self.n), "completed": int(ok.sum()),
+               "sim_span_s": round(self.ev.now / 1000.0, 3), "wall_s": round(self.wall_s, 3),
+               "turnaround": q(trun), "execution": q(ex), "response": q(res)}
+        if self.disp is not None:
+            out["hedge"] = self.disp.stats.snapshot()
+        return out
+
+    def save_csv(self, path: str):
+        """replayer와 같은 컬럼의 결과 CSV (ctxsw는 비움)"""
+        import pandas as pd
+        n = self.n
+        ok = ~np.isnan(self.trun[:n])
+        names = np.array(self.funcs, dtype=object)
+        df = pd.DataFrame({
+            "timestamp": self.t_arr[:n][ok] / 1000.0,
+            "function": names[self.fidx[:n][ok]],
+            "arg": self.args[:n][ok],
+            "trun_around_ms": self.trun[:n][ok],
+            "exec_ms": self.exec[:n][ok],
+            "res_ms": np.maximum(self.trun[:n][ok] - self.exec[:n][ok], 0.0),
+            "ctxsw_delta_total": np.nan, "ctxsw_delta_vol": np.nan, "ctxsw_delta_invol": np.nan,
+        })
+        for c in CSV_COLUMNS[len(df.columns):]:
+            df[c] = -1 if c == "cpu" else np.nan     # handler 스케줄링 통계는 시뮬레이션하지 않음
+        df.to_csv(path, index=False)
+
+def simulate(workload: str, max_items: Optional[int] = None, **kw) -> Tuple[dict, "Simulator"]:
+    wl = open_workload(workload, max_items)
+    sim = Simulator(**kw)
+    return sim.run(iter_records(wl), len(wl)), sim
+
+def load_recorded(path: str) -> Dict[int, np.ndarray]:
+    """replayer 결과 CSV -> {arg: exec_ms 배열} (recorded 서비스 시간용)"""
+    import pandas as pd
+    df = pd.read_csv(path, usecols=["arg", "exec_ms"]).dropna()
+    df = df[pd.to_numeric(df["arg"], errors="coerce").notna()]
+    return {int(k): g.to_numpy(dtype=float) for k, g in df.groupby(df["arg"].astype(int))["exec_ms"]}
+
+def _parse_slow(spec: Optional[str]) -> Dict[str, float]:
+    # 예: "func-03:4,func-07:2.5"
+    out = {}
+    for part in (spec or "").split(","):
+        if part:
+            f, x = part.split(":")
+            out[f] = float(x)
+    return out
+
+def build_parser(add_help: bool = True) -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="discrete-event simulation of the dispatcher policies",
+                                 add_help=add_help)
+    ap.add_argument("--workload", default="workload_dur.txt")
+    ap.add_argument("--max-items", type=int, default=None)
+    ap.add_argument("--dispatch", choices=["custom", "rr"], default="custom",
+                    help="custom: _DispatcherCore 정책 | rr: replayer CFS/FIFO 모드의 라운드로빈")
+    ap.add_argument("--server", choices=list(SERVERS), default="ps",
+                    help="ps: processor sharing (CFS) | fifo: run-to-completion (SCHED_FIFO)")
+    ap.add_argument("--cores", type=int, default=1, help="Pod당 CPU 수")
+    ap.add_argument("--funcs", type=int, default=15)
+    ap.add_argument("--service", choices=["trace", "scale", "recorded"], default="trace",
+                    help="trace: fib N -> dur_list | scale: arg * --ms-per-arg (handler MODE=cpu) "
+                         "| recorded: --recorded 결과 CSV의 exec_ms 분포")
+    ap.add_argument("--recorded", default=None, help="예: CFS/CFS_result.csv")
+    ap.add_argument("--ms-per-arg", type=float, default=3.0)
+    ap.add_argument("--rtt-ms", type=float, default=1.0)
+    ap.add_argument("--jitter", type=float, default=0.0, help="서비스 시간 lognormal sigma")
+    ap.add_argument("--slow", default=None, help="느린 Pod 주입, 예: func-03:4,func-07:2.5")
+    ap.add_argument("--seed", type=int, default=0)
+    # CustomDispatcher 파라미터
+    ap.add_argument("--alpha", type=float, default=0.25)
+    ap.add_argument("--hedge-ms", type=float, default=40.0)
+    ap.add_argument("--ewma-init", type=float, default=120.0)
+    ap.add_argument("--ewma-slow-threshold", type=float, default=180.0)
+    ap.add_argument("--quarantine-ms", type=float, default=1000.0)
+    ap.add_argument("--per-func-concurrency", type=int, default=2)
+    ap.add_argument("--no-hedge-cancel", action="store_true")
+    ap.add_argument("--hedge-quantile", type=float, default=None)
+    ap.add_argument("--hedge-key", choices=["func", "arg", "func_arg"], default="func")
+    ap.add_argument("--queue-policy", choices=list(QUEUE_POLICIES), default=None)
+    ap.add_argument("--queue-aging", type=float, default=0.5)
+    ap.add_argument("--lb", choices=["ewma", "p2c", "jsq", "lect"], default="ewma")
+    ap.add_argument("--out", default=None, help="결과 CSV 경로 (replayer와 같은 컬럼)")
+    return ap
+
+def parse_args():
+    return build_parser().parse_args()
+
+def sim_kwargs(a) -> dict:
+    kw = dict(n_funcs=a.funcs, dispatch=a.dispatch, server=a.server, cores=a.cores,
+              service=a.service, service_ms_per_arg=a.ms_per_arg, rtt_ms=a.rtt_ms,
+              jitter=a.jitter, slow=_parse_slow(a.slow), seed=a.seed)
+    if a.service == "recorded":
+        kw["recorded"] = load_recorded(a.recorded)
+    if a.dispatch == "custom":
+        kw.update(alpha=a.alpha, hedge_ms=a.hedge_ms, ewma_init=a.ewma_init,
+                  ewma_slow_threshold=a.ewma_slow_threshold, quarantine_ms=a.quarantine_ms,
+                  per_func_concurrency=a.per_func_concurrency, hedge_cancel=not a.no_hedge_cancel,
+                  hedge_quantile=a.hedge_quantile, hedge_key=a.hedge_key,
+                  queue_policy=a.queue_policy, queue_aging=a.queue_aging, lb_policy=a.lb)
+    return kw
+
+if __name__ == "__main__":
+    a = parse_args()
+    summary, sim = simulate(a.workload, a.max_items, **sim_kwargs(a))
+    if a.out:
+        sim.save_csv(a.out)
+        summary["out"] = a.out
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,261 @@
+import argparse
+import json
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from trace_parser import (DEFAULT_DATASET_DIR, FIB_ARR, MINUTES_PER_DAY, bucket_counts,
+                          write_arrivals, _parse_days)
+
+# Azure trace 통계 모델 -> 임의 길이/배율의 합성 워크로드
+# - fit: 날짜별 fib 버킷 x 분 호출 수(trace_parser.bucket_counts)에서 버킷마다
+#     rate       : 분당 평균 호출 수 (전체 규모)
+#     profile    : bin_minutes 단위 일중(diurnal) 배율 (평균 1)
+#     idc        : 일중 추세를 뺀 분당 호출 수의 분산/평균 (Poisson이면 1)
+#     model      : poisson | mmpp(2상태, 분 단위 상태 전이) | lognormal(heavy-tail renewal)
+#   -> JSON 하나 (버킷 18개 x profile 96개 정도)
+# - gen: 분 단위로 도착을 만들고 chunk_minutes마다 (시각, arg) 배열을 내보냄 (generator)
+#     poisson   : 분마다 Poisson(λ) 개를 균등 난수 위치에
+#     mmpp      : 상태별 배율 x λ, 상태 지속 시간은 지수분포 (분 경계를 넘어 이어짐)
+#     lognormal : 연산 시간(기대 도착 수) 축에서 평균 1, SCV c2인 간격 -> λ(t)로 실제 시각 환산
+#   scale = 전체 규모 대비 비율 (trace_parser --downscale과 같은 의미)
+#   이항 샘플링과 맞추기 위해 lognormal의 과분산은 scale에 비례해 줄임: c2 = 1 + scale * (idc - 1)
+#   (mmpp는 상태별 배율이 그대로 남음)
+
+MODELS = ("auto", "poisson", "mmpp", "lognormal")
+VERSION = 1
+
+# ---------------- fit ----------------
+
+def _fit_mmpp(z: np.ndarray) -> dict:
+    """z: (일, 분) 추세 대비 배율 (nan = 기대값 0) -> 2상태 MMPP (2-means로 상태 분리)"""
+    v = z[np.isfinite(z)]
+    c0, c1 = np.percentile(v, [25, 75])
+    for _ in range(50):
+        thr = (c0 + c1) / 2.0
+        lo, hi = v[v <= thr], v[v > thr]
+        if not len(lo) or not len(hi):
+            break
+        n0, n1 = float(lo.mean()), float(hi.mean())
+        if abs(n0 - c0) + abs(n1 - c1) < 1e-9:
+            break
+        c0, c1 = n0, n1
+    thr = (c0 + c1) / 2.0
+    s = np.where(np.isfinite(z), z > thr, False)
+    p_hi = float(s.mean())
+    if p_hi in (0.0, 1.0):
+        return {"between": 0.0}
+    norm = (1 - p_hi) * c0 + p_hi * c1      # 정상 상태 평균 배율이 1이 되도록
+    a, b = s[:, :-1], s[:, 1:]
+    up = (~a & b).sum() / max((~a).sum(), 1)
+    down = (a & ~b).sum() / max(a.sum(), 1)
+    var = float(v.var())
+    return {"rates": [round(float(c0 / norm), 5), round(float(c1 / norm), 5)],
+            "dwell_s": [round(60.0 / max(float(up), 1e-6), 3), round(60.0 / max(float(down), 1e-6), 3)],
+            "between": round(float(p_hi * (1 - p_hi) * (c1 - c0) ** 2 / var), 4) if var > 0 else 0.0}
+
+def fit_bucket(x: np.ndarray, bin_minutes: int = 15, kind: str = "auto") -> Optional[dict]:
+    """x: (일, 1440) 분당 호출 수 -> 버킷 모델 (호출이 없으면 None)"""
+    mu = float(x.mean())
+    if mu <= 0:
+        return None
+    nb = MINUTES_PER_DAY // bin_minutes
+    prof = x.reshape(x.shape[0], nb, bin_minutes).mean(axis=(0, 2)) / mu
+    e = mu * np.repeat(prof, bin_minutes)[None, :]
+    mask = np.broadcast_to(e > 0, x.shape)
+    idc = float(((x - e)[mask] ** 2).sum() / np.broadcast_to(e, x.shape)[mask].sum())
+    out = {"rate_per_min": round(mu, 4), "profile": [round(float(p), 4) for p in prof],
+           "idc": round(idc, 4)}
+
+    mm = None
+    if kind in ("auto", "mmpp"):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mm = _fit_mmpp(np.where(e > 0, x / e, np.nan))
+    if kind == "auto":
+        # 과분산이 작으면 Poisson, 두 상태로 대부분 설명되고 상태가 몇 분 이상 유지되면 MMPP
+        if idc <= 1.2:
+            kind = "poisson"
+        elif mm.get("between", 0.0) >= 0.5 and min(mm["dwell_s"]) >= 120.0:
+            kind = "mmpp"
+        else:
+            kind = "lognormal"
+    out["model"] = kind
+    if kind == "mmpp":
+        if "rates" not in mm:
+            out["model"] = "poisson"    # 상태가 하나뿐
+        else:
+            out["mmpp"] = {k: mm[k] for k in ("rates", "dwell_s")}
+    return out
+
+def fit(count_days: List[np.ndarray], bin_minutes: int = 15, kind: str = "auto") -> dict:
+    """count_days: 날짜별 (버킷, 1440) 호출 수"""
+    if MINUTES_PER_DAY % bin_minutes:
+        raise ValueError(f"bin_minutes must divide {MINUTES_PER_DAY}")
+    x = np.stack(count_days).astype(np.float64)     # (일, 버킷, 분)
+    buckets = []
+    for b in range(x.shape[1]):
+        m = fit_bucket(x[:, b, :], bin_minutes, kind)
+        if m is not None:
+            m["arg"] = int(FIB_ARR[b])
+            buckets.append(m)
+    return {"version": VERSION, "days": x.shape[0], "bin_minutes": bin_minutes, "buckets": buckets}
+
+def fit_days(days: List[int], dataset_dir: str = DEFAULT_DATASET_DIR, bin_minutes: int = 15,
+             kind: str = "auto") -> dict:
+    model = fit([bucket_counts(d, dataset_dir) for d in days], bin_minutes, kind)
+    model["source"] = {"days": days}
+    return model
+
+def save_model(model: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(model, f, separators=(",", ":"))
+
+def load_model(path: str) -> dict:
+    with open(path) as f:
+        model = json.load(f)
+    if model.get("version") != VERSION:
+        raise ValueError(f"unsupported synth model version {model.get('version')}: {path}")
+    return model
+
+# ---------------- generate ----------------
+
+class _Bucket:
+    """버킷 하나의 도착 과정 (분 경계를 넘는 상태: MMPP 상태/남은 지속 시간, renewal 남은 간격)"""
+    def __init__(self, m: dict, scale: float, bin_minutes: int, rng: np.random.Generator):
+        self.arg = m["arg"]
+        self.kind = m["model"]
+        self.rate_s = m["rate_per_min"] * scale / 60.0
+        self.profile = np.asarray(m["profile"], dtype=np.float64)
+        self.bin_minutes = bin_minutes
+        self.rng = rng
+        if self.kind == "mmpp":
+            self.rates = m["mmpp"]["rates"]
+            self.dwell = m["mmpp"]["dwell_s"]
+            pi_hi = self.dwell[1] / (self.dwell[0] + self.dwell[1])
+            self.state = int(rng.random() < pi_hi)
+            self.left = rng.exponential(self.dwell[self.state])
+        elif self.kind == "lognormal":
+            c2 = 1.0 + scale * max(m["idc"] - 1.0, 0.0)
+            self.sigma = float(np.sqrt(np.log1p(c2)))
+            self.mu = -self.sigma ** 2 / 2.0        # 평균 1
+            self.u = self._gaps(1)[0] * rng.random()    # 정상 상태에서 시작 (첫 간격 일부만)
+
+    def _gaps(self, n: int) -> np.ndarray:
+        return self.rng.lognormal(self.mu, self.sigma, n)
+
+    def minute(self, t0: float, minute_of_day: int) -> np.ndarray:
+        """[t0, t0+60) 안의 도착 시각"""
+        lam = self.rate_s * self.profile[(minute_of_day % MINUTES_PER_DAY) // self.bin_minutes]
+        rng = self.rng
+        if self.kind == "poisson":
+            if lam <= 0:
+                return np.empty(0)
+            return t0 + rng.random(rng.poisson(lam * 60.0)) * 60.0
+        if self.kind == "mmpp":
+            out, t, end = [], 0.0, 60.0
+            while t < end:
+                seg = min(self.left, end - t)
+                n = rng.poisson(lam * self.rates[self.state] * seg) if lam > 0 else 0
+                if n:
+                    out.append(t0 + t + rng.random(n) * seg)
+                t += seg
+                self.left -= seg
+                if self.left <= 0:
+                    self.state ^= 1
+                    self.left = rng.exponential(self.dwell[self.state])
+            return np.concatenate(out) if out else np.empty(0)
+        # lognormal renewal: u = 다음 도착까지 남은 연산 시간(기대 도착 수 단위)
+        avail = lam * 60.0
+        if avail <= 0:
+            return np.empty(0)
+        out, base = [], 0.0
+        while self.u < avail:
+            k = int(avail - self.u) + 16
+            pos = self.u + np.concatenate(([0.0], np.cumsum(self._gaps(k - 1))))
+            inside = pos[pos < avail]
+            out.append(inside)
+            if len(inside) < len(pos):
+                self.u = float(pos[len(inside)])
+                break
+            self.u = float(pos[-1]) + self._gaps(1)[0]
+        self.u -= avail
+        return t0 + np.concatenate(out) / lam if out else np.empty(0)
+
+def iter_synth(model: dict, minutes: int, scale: float = 0.002, seed: Optional[int] = None,
+               start_minute: int = 0, chunk_minutes: int = 10,
+               t_offset: float = 0.0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (도착 시각[s], arg) 배열을 chunk_minutes 단위로 생성 (trace_parser.iter_arrivals와 같은 모양)
+    메모리는 chunk 하나 분량만 사용 -> 몇 시간/며칠짜리도 스트리밍
+    """
+    rng = np.random.default_rng(seed)
+    buckets = [_Bucket(m, scale, model["bin_minutes"], rng) for m in model["buckets"]]
+    for m0 in range(0, minutes, chunk_minutes):
+        ts, args = [], []
+        for m in range(m0, min(m0 + chunk_minutes, minutes)):
+            t0 = t_offset + m * 60.0
+            for b in buckets:
+                t = b.minute(t0, start_minute + m)
+                if len(t):
+                    ts.append(t)
+                    args.append(np.full(len(t), b.arg, dtype=np.int64))
+        if not ts:
+            continue
+        t, a = np.concatenate(ts), np.concatenate(args)
+        order = np.argsort(t, kind="stable")
+        yield t[order], a[order]
+
+def describe(model: dict) -> str:
+    lines = [f"days={model.get('days')} bin_minutes={model['bin_minutes']} buckets={len(model['buckets'])}"]
+    for m in model["buckets"]:
+        p = np.asarray(m["profile"])
+        extra = ""
+        if m["model"] == "mmpp":
+            mm = m["mmpp"]
+            extra = f" rates={mm['rates']} dwell_s={mm['dwell_s']}"
+        lines.append(f"  arg={m['arg']:>2} {m['model']:<9} rate={m['rate_per_min']:>12.1f}/min "
+                     f"idc={m['idc']:>10.2f} peak/trough={p.max():.2f}/{p.min():.2f}{extra}")
+    return "\n".join(lines)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="fit / generate synthetic workloads from the Azure Functions trace")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    fi = sub.add_parser("fit", help="dataset CSV -> 모델 JSON")
+    fi.add_argument("--dataset-dir", default=DEFAULT_DATASET_DIR)
+    fi.add_argument("--days", default="1", help="예: 1 | 1-14 | 1,3,5")
+    fi.add_argument("--bin-minutes", type=int, default=15, help="일중 profile 해상도")
+    fi.add_argument("--model", choices=MODELS, default="auto")
+    fi.add_argument("--out", default="synth_model.json")
+    ge = sub.add_parser("gen", help="모델 -> 워크로드 파일")
+    ge.add_argument("--model", default="synth_model.json")
+    ge.add_argument("--minutes", type=int, default=MINUTES_PER_DAY, help="생성할 길이(분)")
+    ge.add_argument("--start-minute", type=int, default=0, help="일중 시작 위치 (0 = 자정)")
+    ge.add_argument("--scale", type=float, default=0.002, help="전체 규모 대비 비율")
+    ge.add_argument("--seed", type=int, default=None)
+    ge.add_argument("--chunk-minutes", type=int, default=10)
+    ge.add_argument("--out", default="workload_synth.txt")
+    ge.add_argument("--format", choices=["text", "bin"], default=None,
+                    help="기본: --out이 .bin으로 끝나면 bin, 아니면 text")
+    inf = sub.add_parser("info", help="모델 요약")
+    inf.add_argument("--model", default="synth_model.json")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    t0 = time.time()
+    if a.cmd == "fit":
+        model = fit_days(_parse_days(a.days), a.dataset_dir, a.bin_minutes, a.model)
+        save_model(model, a.out)
+        print(describe(model))
+        print(f"[Synth] fitted {len(model['buckets'])} buckets -> {a.out} ({time.time() - t0:.2f}s)")
+    elif a.cmd == "gen":
+        model = load_model(a.model)
+        fmt = a.format or ("bin" if a.out.endswith(".bin") else "text")
+        n = write_arrivals(a.out, iter_synth(model, a.minutes, a.scale, a.seed, a.start_minute,
+                                             a.chunk_minutes), fmt)
+        span = a.minutes * 60.0
+        print(f"[Synth] {n} arrivals over {a.minutes} min ({n / span:.2f}/s) -> {a.out} "
+              f"({time.time() - t0:.2f}s)")
+    else:
+        print(describe(load_model(a.model)))
@@ -2,48 +2,18 @@
 # https://github.com/ZhaoNeil/hybrid-scheduler
 # Licensed under the BSD 3-Clause License.
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.axes_grid1.inset_locator import inset_axes, mark_inset
-
-durations_file = "../dataset/function_durations_percentiles.anon.d01.csv"
-invoke_file = "../dataset/invocations_per_function_md.anon.d01.csv"
-workload_file = "workload_dur.txt"
-
-duration_df = pd.read_csv(durations_file).iloc[:, [2, 3]]
-
-invoke_df = pd.read_csv(invoke_file).drop(columns=["HashOwner", "HashApp", "Trigger"])
-
-# Merge the duration and invocation dataframes by the HashFunction column
-df = pd.merge(duration_df, invoke_df, how="inner", on=["HashFunction"])
-
-df = df[df["Average"] > 0]
-df = df[df["Average"] < 1000000]
-df = df.sort_values(by="Average")
-# print(df)
+import argparse
+import os
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-# get the number of function invocation in each minute, key is the function duration
-duration_dict = {}
-for index, row in df.iterrows():
-    duration = list(row)[1]
-    occur_list = list(row)[2:]
-    if duration not in duration_dict:
-        duration_dict[duration] = occur_list
-    else:
-        duration_dict[duration] = list(
-            map(lambda x: x[0] + x[1], zip(duration_dict[duration], occur_list))
-        )
+import numpy as np
+import pandas as pd
 
-# convert the dictionary to dataframe
-duration_occurance = pd.DataFrame.from_dict(duration_dict, orient="index")
-duration_occurance.index.name = "Duration"
-duration_occurance.reset_index(inplace=True)
-print(duration_occurance)
+from workload_io import WorkloadWriter
 
-bucket = {}
-for i in range(29, 47):
-    bucket[i] = [0] * 1440
+DEFAULT_DATASET_DIR = "../dataset"
+workload_file = "workload_dur.txt"
 
 # According to calibration, function duration and the corresponding fib N's
 dur_list = [
@@ -68,66 +38,142 @@ dur_list = [
 ]
 fib = [29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46]
 
-for index, row in duration_occurance.iterrows():
-    Duration = list(row)[0]
-    occur_list = list(row)[1:]
-    for i in range(len(dur_list)):
-        if Duration <= dur_list[i] or i == len(dur_list) - 1 and Duration > dur_list[i]:
-            # Bucket the function invocation based on the duration
-            bucket[fib[i]] = list(
-                map(lambda x: x[0] + x[1], zip(bucket[fib[i]], occur_list))
-            )
-            break
-    # if Duration <= 27:
-    #     bucket[35] = list(map(lambda x: x[0] + x[1], zip(bucket[35], occur_list)))
-    # elif Duration > 27 and Duration <= 37:
-    #     bucket[36] = list(map(lambda x: x[0] + x[1], zip(bucket[36], occur_list)))
-    # elif Duration > 37 and Duration <= 64:
-    #     bucket[37] = list(map(lambda x: x[0] + x[1], zip(bucket[37], occur_list)))
-    # ......
-
-
-arg_df = pd.DataFrame.from_dict(bucket, orient="index")
-arg_df.index.name = "arg"
-print(arg_df)
-
-occur_time = []
-downscale_p = 0.002   # 0.2%만 사용 (환경에 맞게 조절)
-# Generate the workload item for each minute
-"""
-for minute in arg_df.columns[0:2]:
-    for arg in arg_df.index:
-        invoke_times = arg_df.loc[arg, minute] / 100  # downscale
-        interval = 60 / invoke_times
-        for n in range(int(invoke_times)):
-            time = int(minute) * 60 + n * interval
-            occur_time.append((time, str(arg))) """
-for minute in arg_df.columns[0:2]:  # 필요시 전체: for minute in arg_df.columns:
-    for arg in arg_df.index:
-        calls_full = int(arg_df.loc[arg, minute])
-        if calls_full <= 0:
+DUR_ARR = np.asarray(dur_list, dtype=np.float64)
+FIB_ARR = np.asarray(fib, dtype=np.int64)
+MINUTES_PER_DAY = 1440
+MINUTE_COLS = [str(m) for m in range(1, MINUTES_PER_DAY + 1)]
+
+def dataset_paths(day: int, dataset_dir: str = DEFAULT_DATASET_DIR) -> Tuple[str, str]:
+    durations_file = os.path.join(dataset_dir, f"function_durations_percentiles.anon.d{day:02d}.csv")
+    invoke_file = os.path.join(dataset_dir, f"invocations_per_function_md.anon.d{day:02d}.csv")
+    return durations_file, invoke_file
+
+def duration_bucket(durations) -> np.ndarray:
+    """평균 실행 시간(ms) -> fib 버킷 인덱스 (dur_list[i] 이상인 첫 i, 넘으면 마지막)"""
+    idx = np.searchsorted(DUR_ARR, np.asarray(durations, dtype=np.float64), side="left")
+    return np.minimum(idx, len(DUR_ARR) - 1)
+
+def bucket_counts(day: int = 1, dataset_dir: str = DEFAULT_DATASET_DIR,
+                  chunksize: int = 5000) -> np.ndarray:
+    """
+    하루치 호출 수를 fib 버킷별, 분별로 집계 -> shape (len(fib), 1440)
+    invocation CSV는 chunksize 행씩 읽어서 메모리를 일정하게 유지
+    """
+    durations_file, invoke_file = dataset_paths(day, dataset_dir)
+
+    duration_df = pd.read_csv(durations_file, usecols=["HashFunction", "Average"])
+    duration_df = duration_df[(duration_df["Average"] > 0) & (duration_df["Average"] < 1000000)]
+
+    counts = np.zeros((len(fib), MINUTES_PER_DAY), dtype=np.int64)
+    reader = pd.read_csv(invoke_file, usecols=["HashFunction"] + MINUTE_COLS,
+                         dtype={c: np.int32 for c in MINUTE_COLS}, chunksize=chunksize)
+    for chunk in reader:
+        # Merge the duration and invocation dataframes by the HashFunction column
+        df = chunk.merge(duration_df, how="inner", on="HashFunction")
+        if df.empty:
             continue
-
-        # 확률적 다운스케일(평균 유지)
-        calls = np.random.binomial(n=calls_full, p=downscale_p)
-        if calls <= 0:
-            continue  # 0이면 이 분/버킷은 건너뜀
-
-        interval = 60.0 / calls  # 0 나누기 없음(이미 calls>0 보장)
-        for n in range(calls):
-            t = int(minute) * 60 + n * interval
-            occur_time.append((t, str(arg)))
-
-# Sort the items by time
-sort_list = sorted(occur_time, key=lambda x: x[0])
-time_list, arg_list = zip(*sort_list)
-# Get the time difference between each item, which is the inter-arrival time
-diff_list = time_list[0] + np.diff(list(time_list))
-output_list = list(zip(diff_list, arg_list))
-
-# Write the workload to a file
-f = open(workload_file, "w")
-for t in output_list:
-    line = " ".join(str(x) for x in t)
-    f.write(line + "\n")
-f.close()
+        idx = duration_bucket(df["Average"].to_numpy())
+        np.add.at(counts, idx, df[MINUTE_COLS].to_numpy(dtype=np.int64))
+    return counts
+
+def iter_arrivals(counts: np.ndarray, downscale_p: float = 0.002,
+                  rng: Optional[np.random.Generator] = None,
+                  minutes: Optional[Tuple[int, int]] = None,
+                  chunk_minutes: int = 60,
+                  t_offset: float = 0.0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    버킷별 분당 호출 수 -> (도착 시각[s], arg) 배열을 chunk_minutes 단위로 생성
+    - 확률적 다운스케일(이항분포, 평균 유지)
+    - 각 분 안에서는 호출을 균등 간격으로 배치
+    - chunk 안에서 시각 순으로 정렬되어 나오고 chunk끼리도 시각 순
+    """
+    rng = rng or np.random.default_rng()
+    m_lo, m_hi = minutes or (0, counts.shape[1])
+    for m0 in range(m_lo, m_hi, chunk_minutes):
+        m1 = min(m0 + chunk_minutes, m_hi)
+        calls = rng.binomial(counts[:, m0:m1], downscale_p)
+        b, j = np.nonzero(calls)
+        c = calls[b, j]
+        total = int(c.sum())
+        if total == 0:
+            continue
+        start = np.repeat(np.cumsum(c) - c, c)
+        n = np.arange(total) - start
+        per = np.repeat(c, c)
+        t = t_offset + np.repeat(j + m0, c) * 60.0 + n * (60.0 / per)
+        args = np.repeat(FIB_ARR[b], c)
+        order = np.argsort(t, kind="stable")
+        yield t[order], args[order]
+
+def write_arrivals(out_path: str, chunks: Iterable[Tuple[np.ndarray, np.ndarray]],
+                   fmt: str = "text") -> int:
+    """
+    (도착 시각[s], arg) chunk들을 워크로드 파일로 이어 씀 (chunk끼리 시각 순이어야 함)
+    fmt: text ('inter-arrival arg' 줄) | bin (workload_io 바이너리)
+    """
+    written = 0
+    prev_t = 0.0
+    if fmt == "bin":
+        out = WorkloadWriter(out_path)
+    else:
+        out = open(out_path, "w")
+    with out:
+        for t, args in chunks:
+            if not len(t):
+                continue
+            ia = np.diff(t, prepend=prev_t)
+            prev_t = float(t[-1])
+            if fmt == "bin":
+                out.write(ia, args)
+            else:
+                np.savetxt(out, np.column_stack([ia, args]), fmt=["%.6f", "%d"])
+            written += len(t)
+    return written
+
+def write_workload(out_path: str, days: List[int], dataset_dir: str = DEFAULT_DATASET_DIR,
+                   downscale_p: float = 0.002, seed: Optional[int] = None,
+                   minutes: Optional[Tuple[int, int]] = None, chunk_minutes: int = 60,
+                   fmt: str = "text") -> int:
+    """여러 날을 이어 붙여 워크로드 파일을 chunk 단위로 기록"""
+    rng = np.random.default_rng(seed)
+
+    def chunks():
+        for k, day in enumerate(days):
+            counts = bucket_counts(day, dataset_dir)
+            yield from iter_arrivals(counts, downscale_p, rng, minutes, chunk_minutes,
+                                     t_offset=k * MINUTES_PER_DAY * 60.0)
+    return write_arrivals(out_path, chunks(), fmt)
+
+def _parse_days(spec: str) -> List[int]:
+    days = []
+    for part in spec.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            days.extend(range(int(lo), int(hi) + 1))
+        else:
+            days.append(int(part))
+    return days
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Azure Functions trace -> workload file")
+    ap.add_argument("--dataset-dir", default=DEFAULT_DATASET_DIR)
+    ap.add_argument("--days", default="1", help="예: 1 | 1-14 | 1,3,5")
+    ap.add_argument("--minutes", default=None,
+                    help="분 범위 start:end (0부터, 기본: 하루 전체 0:1440)")
+    ap.add_argument("--downscale", type=float, default=0.002,
+                    help="호출을 이 확률로 샘플링 (0.002 = 0.2%%)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--chunk-minutes", type=int, default=60)
+    ap.add_argument("--out", default=workload_file)
+    ap.add_argument("--format", choices=["text", "bin"], default=None,
+                    help="기본: --out이 .bin으로 끝나면 bin, 아니면 text")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    minutes = tuple(int(x) for x in a.minutes.split(":")) if a.minutes else None
+    t0 = time.time()
+    fmt = a.format or ("bin" if a.out.endswith(".bin") else "text")
+    n = write_workload(a.out, _parse_days(a.days), a.dataset_dir, a.downscale, a.seed,
+                       minutes, a.chunk_minutes, fmt)
+    print(f"[TraceParser] {n} arrivals -> {a.out} ({time.time() - t0:.2f}s)")
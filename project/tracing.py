@@ -0,0 +1,153 @@
+import itertools
+import json
+import os
+from typing import Dict, List, Optional
+
+# 요청 단위 span 추적 (replayer -> dispatcher -> gateway -> handler)
+# - 요청 ID는 X-Request-Id 헤더로 전달, handler가 도착/작업 시작/작업 끝 시각을 trace로 되돌려줌
+#   (도착은 wall clock ns, 나머지는 monotonic 차이로 환산 -> handler 안의 구간은 정확)
+# - gateway가 X-Start-Time(ns)을 붙여 주면(mock_gateway.py는 항상) 서버 대기열도 분리
+# - 클라이언트/서버 시각 차이로 계산하는 net_out / net_back은 같은 호스트이거나 NTP 동기화 전제
+#
+# 구간 (attempt = 실제 HTTP 시도 1건, hedge면 요청당 2건)
+#   client_queue : 도착 스케줄 -> 요청 처리 시작 (replayer 스레드 풀 / 동시성 상한 대기)
+#   token_wait   : 토큰버킷 / 우선순위 대기열
+#   net_out      : 전송 -> gateway 수신 (X-Start-Time 없으면 handler 도착까지)
+#   server_queue : gateway 수신 -> handler 도착 (watchdog 대기열 포함)
+#   exec         : handler 도착 -> 작업 끝 (기존 exec_ms와 같은 구간)
+#   net_back     : 작업 끝 -> 응답 수신
+#   decode       : 응답 본문 JSON 파싱
+SPANS = ["client_queue", "token_wait", "net_out", "server_queue", "exec", "net_back", "decode"]
+
+def server_times(data: dict) -> Optional[dict]:
+    """handler 응답의 trace -> wall clock ms (gw, arrive, start, end)"""
+    tr = (data or {}).get("trace")
+    if not tr:
+        return None
+    try:
+        arrive = tr["arrive_ns"] / 1e6
+        m0, m1, m2 = tr["mono_ns"]
+        gw = tr.get("gw_start_ns")
+        return {"gw": float(gw) / 1e6 if gw else None, "arrive": arrive,
+                "start": arrive + (m1 - m0) / 1e6, "end": arrive + (m2 - m0) / 1e6}
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class Tracer:
+    """
+    replayer/디스패처가 시각을 넘기면 요청·시도별로 모아 두었다가
+    {base}_spans.csv (시도별 구간 ms)와 {base}_trace.json (Chrome trace / Perfetto)로 저장
+    sample: 추적할 요청 비율 (1/sample 건마다 하나)
+    시각은 모두 epoch ms (now_ms와 같은 단위)
+    """
+    def __init__(self, sample: float = 1.0):
+        self.every = max(1, int(round(1.0 / sample))) if sample > 0 else 0
+        self.prefix = f"{os.getpid():x}"
+        self._n = itertools.count()
+        self.requests: Dict[str, dict] = {}
+        self.attempts: List[dict] = []      # list.append는 스레드 안전
+
+    def new_id(self) -> Optional[str]:
+        """추적 대상이면 요청 ID, 아니면 None (헤더를 붙이지 않음)"""
+        n = next(self._n)
+        if not self.every or n % self.every:
+            return None
+        return f"{self.prefix}-{n:x}"
+
+    def request(self, rid: str, t_submit: float, t_invoke: float, t_end: float,
+                function: str, ok: bool):
+        self.requests[rid] = {"rid": rid, "t_submit": t_submit, "t_invoke": t_invoke,
+                              "t_end": t_end, "function": function, "ok": ok}
+
+    def attempt(self, rid: str, idx: int, function: str, t_wait: float, t_send: Optional[float],
+                t_recv: Optional[float], t_done: Optional[float], ok: bool, data: Optional[dict]):
+        self.attempts.append({"rid": rid, "idx": idx, "function": function, "t_wait": t_wait,
+                              "t_send": t_send, "t_recv": t_recv, "t_done": t_done, "ok": ok,
+                              "server": server_times(data),
+                              "cancelled": bool((data or {}).get("cancelled"))})
+
+    # ---------------- 내보내기 ----------------
+
+    def _segments(self, a: dict) -> List[tuple]:
+        """(구간 이름, 시작, 끝) 목록, 측정되지 않은 구간은 빠짐"""
+        segs = []
+        if a["t_send"] is not None:
+            segs.append(("token_wait", a["t_wait"], a["t_send"]))
+        s = a["server"]
+        if s and a["t_send"] is not None:
+            first = s["gw"] if s["gw"] is not None else s["arrive"]
+            segs.append(("net_out", a["t_send"], first))
+            if s["gw"] is not None:
+                segs.append(("server_queue", s["gw"], s["arrive"]))
+            segs.append(("exec", s["arrive"], s["end"]))
+            if a["t_recv"] is not None:
+                segs.append(("net_back", s["end"], a["t_recv"]))
+        elif a["t_send"] is not None and a["t_recv"] is not None:
+            segs.append(("http", a["t_send"], a["t_recv"]))    # handler trace 없음
+        if a["t_recv"] is not None and a["t_done"] is not None:
+            segs.append(("decode", a["t_recv"], a["t_done"]))
+        return segs
+
+    def rows(self) -> List[dict]:
+        """시도별 구간 길이(ms), 음수(시계 차이)는 0으로"""
+        out = []
+        for a in self.attempts:
+            r = self.requests.get(a["rid"], {})
+            row = {"rid": a["rid"], "attempt": a["idx"], "function": a["function"], "ok": a["ok"],
+                   "won": bool(r) and r["ok"] and r["function"] == a["function"],
+                   "cancelled": a["cancelled"],
+                   "client_queue": (r["t_invoke"] - r["t_submit"]) if r else None,
+                   "total": (r["t_end"] - r["t_submit"]) if r else None}
+            for name, t0, t1 in self._segments(a):
+                row[name] = max(0.0, t1 - t0)
+            out.append(row)
+        return out
+
+    def chrome_events(self) -> List[dict]:
+        """Chrome trace event format ("X" 완료 이벤트, us), 요청마다 행 3개: 요청 / 시도 0 / 시도 1"""
+        if not self.requests:
+            return []
+        t0 = min(r["t_submit"] for r in self.requests.values())
+        us = lambda t: round((t - t0) * 1000.0, 3)
+        seq = {rid: i for i, rid in enumerate(sorted(self.requests, key=lambda k: self.requests[k]["t_submit"]))}
+        ev = [{"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "replayer"}}]
+
+        def row(tid, name):
+            ev.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": name}})
+            ev.append({"name": "thread_sort_index", "ph": "M", "pid": 0, "tid": tid,
+                       "args": {"sort_index": tid}})
+
+        def span(tid, name, a, b, args=None):
+            e = {"name": name, "ph": "X", "pid": 0, "tid": tid, "ts": us(a), "dur": round(max(0.0, b - a) * 1000.0, 3)}
+            if args:
+                e["args"] = args
+            ev.append(e)
+
+        for rid, r in self.requests.items():
+            tid = seq[rid] * 3
+            row(tid, rid)
+            span(tid, "request", r["t_submit"], r["t_end"], {"function": r["function"], "ok": r["ok"]})
+            span(tid, "client_queue", r["t_submit"], r["t_invoke"])
+        for a in self.attempts:
+            if a["rid"] not in seq:
+                continue
+            tid = seq[a["rid"]] * 3 + 1 + min(a["idx"], 1)
+            row(tid, f"{a['rid']} a{a['idx']} {a['function']}")
+            end = a["t_done"] or a["t_recv"] or a["t_send"] or a["t_wait"]
+            span(tid, f"attempt {a['idx']}", a["t_wait"], end,
+                 {"function": a["function"], "ok": a["ok"], "cancelled": a["cancelled"]})
+            for name, b, e in self._segments(a):
+                span(tid, name, b, e)
+        return ev
+
+    def save(self, base: str) -> dict:
+        """{base}_spans.csv, {base}_trace.json 저장, 구간별 평균(ms) 반환"""
+        import pandas as pd
+        df = pd.DataFrame(self.rows(), columns=["rid", "attempt", "function", "ok", "won", "cancelled",
+                                                "total"] + SPANS + ["http"])
+        df.to_csv(f"{base}_spans.csv", index=False)
+        with open(f"{base}_trace.json", "w") as f:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, f)
+        # 요청에 쓰인(이긴) 시도 기준 평균
+        won = df[df["won"]]
+        return {k: round(float(won[k].mean()), 3) for k in ["total"] + SPANS if won[k].notna().any()}
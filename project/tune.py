@@ -0,0 +1,192 @@
+import argparse, itertools, json, math, os, random, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from simulator import Simulator, build_parser, sim_kwargs
+from workload_io import open_workload, iter_records
+
+try:
+    import optuna
+except ImportError:  # --search optuna를 쓸 때만 필요
+    optuna = None
+
+# CustomDispatcher 파라미터 탐색 (simulator 위에서)
+# - grid / random / optuna(TPE, 설치된 경우) 탐색을 프로세스 풀에서 병렬 실행
+# - trial마다 seed 여러 개로 시뮬레이션 -> P99 turnaround, 낭비된 hedge 작업 비율 평균
+# - P99 기준 순위 + (P99, 낭비) Pareto front, 최적 설정은 JSON으로 저장
+#   -> python workload_replayer.py --custom-config tune_results/best_config.json
+
+# grid 기본값 (--grid로 덮어씀)
+GRID = {
+    "alpha": [0.1, 0.25, 0.5],
+    "hedge_ms": [20.0, 40.0, 80.0, 160.0],
+    "ewma_slow_threshold": [120.0, 180.0, 300.0],
+    "quarantine_ms": [250.0, 1000.0, 4000.0],
+    "per_func_concurrency": [1, 2, 4],
+}
+# random / optuna 범위: (low, high, log, int)
+RANGES = {
+    "alpha": (0.05, 0.8, False, False),
+    "hedge_ms": (5.0, 500.0, True, False),
+    "ewma_slow_threshold": (50.0, 1000.0, True, False),
+    "quarantine_ms": (100.0, 10000.0, True, False),
+    "per_func_concurrency": (1, 8, False, True),
+}
+METRIC_COLS = ("p99_ms", "p50_ms", "wasted_frac", "hedge_rate", "wall_s")   # trial 결과 중 설정이 아닌 열
+
+_W = {}     # 작업 프로세스별 워크로드/기본 설정
+
+def _init_worker(args: dict):
+    a = argparse.Namespace(**args)
+    _W["wl"] = open_workload(a.workload, a.max_items)
+    _W["base"] = sim_kwargs(a)
+    _W["seeds"] = [a.seed + i for i in range(a.repeats)]
+
+def _evaluate(params: dict) -> dict:
+    """params로 seed마다 시뮬레이션, 지표 평균"""
+    wl = _W["wl"]
+    p99, p50, wasted, fired = [], [], [], []
+    t0 = time.perf_counter()
+    for seed in _W["seeds"]:
+        kw = dict(_W["base"], seed=seed, **params)
+        s = Simulator(**kw).run(iter_records(wl), len(wl))
+        t = s["turnaround"]
+        p99.append(t.get("p99", math.inf))
+        p50.append(t.get("p50", math.inf))
+        work = s["execution"].get("avg", 0.0) * s["completed"]
+        wasted.append(s["hedge"]["wasted_cpu_ms"] / work if work else 0.0)
+        fired.append(s["hedge"]["hedges_fired"] / max(s["requests"], 1))
+    return {**params, "p99_ms": float(np.mean(p99)), "p50_ms": float(np.mean(p50)),
+            "wasted_frac": float(np.mean(wasted)), "hedge_rate": float(np.mean(fired)),
+            "wall_s": round(time.perf_counter() - t0, 3)}
+
+def _cast(v: str):
+    # 값마다 int -> float -> 문자열 순으로 (예: lb_policy=p2c, hedge_key=arg)
+    v = v.strip()
+    for cast in (int, float):
+        try:
+            return cast(v)
+        except ValueError:
+            pass
+    return v
+
+def _parse_grid(spec: str) -> Dict[str, list]:
+    # 예: "alpha=0.1,0.25;hedge_ms=20,40;lb_policy=ewma,p2c"
+    grid = {}
+    for part in spec.split(";"):
+        if part.strip():
+            k, vs = part.split("=")
+            grid[k.strip()] = [_cast(v) for v in vs.split(",")]
+    return grid
+
+def grid_trials(grid: Dict[str, list]) -> List[dict]:
+    keys = list(grid)
+    return [dict(zip(keys, vs)) for vs in itertools.product(*(grid[k] for k in keys))]
+
+def _sample(rng: random.Random, k: str):
+    lo, hi, log, is_int = RANGES[k]
+    if is_int:
+        return rng.randint(lo, hi)
+    x = math.exp(rng.uniform(math.log(lo), math.log(hi))) if log else rng.uniform(lo, hi)
+    return round(x, 4)
+
+def random_trials(n: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    return [{k: _sample(rng, k) for k in RANGES} for _ in range(n)]
+
+def objective(r: dict, kind: str, weight: float) -> float:
+    if kind == "wasted":
+        return r["wasted_frac"]
+    if kind == "score":
+        # P99(ms) + weight * 낭비 비율 (예: weight=1000 -> 낭비 10%를 P99 100ms로 환산)
+        return r["p99_ms"] + weight * r["wasted_frac"]
+    return r["p99_ms"]
+
+def pareto(results: List[dict]) -> List[bool]:
+    """(p99_ms, wasted_frac) 둘 다 더 나은 trial이 없으면 True"""
+    out = []
+    for r in results:
+        out.append(not any(o["p99_ms"] <= r["p99_ms"] and o["wasted_frac"] <= r["wasted_frac"]
+                           and (o["p99_ms"], o["wasted_frac"]) != (r["p99_ms"], r["wasted_frac"])
+                           for o in results))
+    return out
+
+def run_optuna(ex, n: int, batch: int, seed: int, kind: str, weight: float) -> List[dict]:
+    if optuna is None:
+        raise RuntimeError("--search optuna requires optuna (pip install optuna)")
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.create_study(direction="minimize", sampler=optuna.samplers.TPESampler(seed=seed))
+    results = []
+    while len(results) < n:
+        trials = [study.ask() for _ in range(min(batch, n - len(results)))]
+        params = []
+        for t in trials:
+            p = {}
+            for k, (lo, hi, log, is_int) in RANGES.items():
+                p[k] = t.suggest_int(k, lo, hi) if is_int else t.suggest_float(k, lo, hi, log=log)
+            params.append(p)
+        for t, r in zip(trials, ex.map(_evaluate, params)):
+            study.tell(t, objective(r, kind, weight))
+            results.append(r)
+    return results
+
+def parse_args():
+    sp = build_parser(add_help=False)
+    ap = argparse.ArgumentParser(description="CustomDispatcher parameter sweep on the simulator",
+                                 parents=[sp])
+    ap.add_argument("--search", choices=["grid", "random", "optuna"], default="grid")
+    ap.add_argument("--grid", default=None,
+                    help='예: "alpha=0.1,0.25;hedge_ms=20,40" (기본: GRID 전체)')
+    ap.add_argument("--trials", type=int, default=64, help="random / optuna trial 수")
+    ap.add_argument("--repeats", type=int, default=1, help="trial당 seed 수")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--objective", choices=["p99", "wasted", "score"], default="p99")
+    ap.add_argument("--wasted-weight", type=float, default=1000.0,
+                    help="score = p99_ms + weight * wasted_frac")
+    ap.add_argument("--out-dir", default="./tune_results")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    a.dispatch = "custom"
+    args = vars(a)
+    workers = a.workers or os.cpu_count() or 1
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args,)) as ex:
+        if a.search == "optuna":
+            results = run_optuna(ex, a.trials, workers, a.seed, a.objective, a.wasted_weight)
+        else:
+            trials = grid_trials(_parse_grid(a.grid) if a.grid else GRID) if a.search == "grid" \
+                else random_trials(a.trials, a.seed)
+            print(f"[Tune] {len(trials)} trials x {a.repeats} seeds on {workers} workers")
+            results = list(ex.map(_evaluate, trials))
+
+    import pandas as pd
+    df = pd.DataFrame(results)
+    df["pareto"] = pareto(results)
+    df["objective"] = [objective(r, a.objective, a.wasted_weight) for r in results]
+    df = df.sort_values(["objective", "p99_ms", "wasted_frac"], kind="stable").reset_index(drop=True)
+    os.makedirs(a.out_dir, exist_ok=True)
+    df.to_csv(os.path.join(a.out_dir, "trials.csv"), index=False)
+
+    best = df.iloc[0]
+    # 이긴 trial의 설정 전부 (grid에 넣은 임의의 dispatcher 인자 포함), numpy 값은 파이썬 값으로
+    params = {k: (best[k].item() if hasattr(best[k], "item") else best[k])
+              for k in results[0] if k not in METRIC_COLS}
+    out = {
+        "params": params,
+        "metrics": {k: float(best[k]) for k in ("p99_ms", "p50_ms", "wasted_frac", "hedge_rate")},
+        "objective": a.objective,
+        "simulation": {k: args[k] for k in ("workload", "max_items", "server", "cores", "service",
+                                            "jitter", "slow", "repeats", "seed")},
+    }
+    best_path = os.path.join(a.out_dir, "best_config.json")
+    with open(best_path, "w") as f:
+        json.dump(out, f, indent=2)
+
+    cols = list(params) + ["p99_ms", "wasted_frac", "hedge_rate", "pareto"]
+    print(df[cols].head(10).round(4).to_string(index=False))
+    print(f"[Tune] {len(df)} trials in {time.time() - t0:.1f}s, "
+          f"{int(df['pareto'].sum())} on the P99/wasted Pareto front -> {best_path}")
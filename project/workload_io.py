@@ -0,0 +1,166 @@
+import argparse
+import os
+import struct
+from typing import Optional
+
+import numpy as np
+
+# 바이너리 워크로드 포맷
+#   header (32 bytes): magic(8) | version(u32) | flags(u32) | count(u64) | reserved(8)
+#   records: RECORD_DTYPE 고정 폭, 헤더 바로 뒤부터 연속
+# count는 close 시점에 기록, 비정상 종료로 0이면 파일 크기로 계산
+MAGIC = b"FAASWL\x00\x01"
+VERSION = 1
+FLAG_HAS_FUNC = 0x1
+_HEADER = struct.Struct("<8sIIQ8x")
+HEADER_SIZE = _HEADER.size
+
+RECORD_DTYPE = np.dtype([
+    ("ia", "<f8"),      # inter-arrival (s)
+    ("arg", "u1"),      # fib N / 작업 크기
+    ("func", "<i2"),    # 함수 번호 (-1이면 지정 없음)
+])
+
+ARG_STR = [str(i) for i in range(256)]
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class WorkloadWriter:
+    """chunk 단위로 레코드를 이어 쓰는 바이너리 워크로드 writer"""
+    def __init__(self, path: str, has_func: bool = False):
+        self.path = path
+        self.flags = FLAG_HAS_FUNC if has_func else 0
+        self.count = 0
+        self.f = open(path, "wb")
+        self.f.write(_HEADER.pack(MAGIC, VERSION, self.flags, 0))
+
+    def write(self, ia, arg, func=None):
+        ia = np.asarray(ia, dtype=np.float64)
+        rec = np.empty(len(ia), dtype=RECORD_DTYPE)
+        rec["ia"] = ia
+        arg = np.asarray(arg)
+        if arg.size and (arg.min() < 0 or arg.max() > 255):
+            raise ValueError("arg out of uint8 range")
+        rec["arg"] = arg
+        rec["func"] = -1 if func is None else func
+        self.f.write(rec.tobytes())
+        self.count += len(rec)
+
+    def close(self):
+        if self.f is None:
+            return
+        self.f.seek(0)
+        self.f.write(_HEADER.pack(MAGIC, VERSION, self.flags, self.count))
+        self.f.close()
+        self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_binary(path: str, max_items: Optional[int] = None) -> np.ndarray:
+    """np.memmap으로 열기 (파일 크기와 무관하게 O(1))"""
+    with open(path, "rb") as f:
+        magic, version, flags, count = _HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError(f"not a binary workload file: {path}")
+    if version != VERSION:
+        raise ValueError(f"unsupported workload version {version}: {path}")
+    n = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count:
+        n = min(n, count)
+    if max_items:
+        n = min(n, max_items)
+    if n == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n,))
+
+def read_text(path: str, max_items: Optional[int] = None) -> np.ndarray:
+    """'inter-arrival arg' 텍스트 포맷을 max_items줄까지만 읽어서 레코드 배열로"""
+    ias, args = [], []
+    with open(path) as f:
+        for line in f:
+            try:
+                ia, arg = line.split()
+                ias.append(float(ia))
+                args.append(int(arg))
+            except Exception:
+                continue
+            if max_items and len(ias) >= max_items:
+                break
+    rec = np.empty(len(ias), dtype=RECORD_DTYPE)
+    rec["ia"] = ias
+    rec["arg"] = args
+    rec["func"] = -1
+    return rec
+
+def open_workload(path: str, max_items: Optional[int] = None) -> np.ndarray:
+    """포맷 자동 판별 (바이너리면 memmap, 아니면 텍스트 파싱)"""
+    if is_binary(path):
+        return read_binary(path, max_items)
+    return read_text(path, max_items)
+
+def iter_records(rec: np.ndarray, chunk: int = 4096):
+    """(ia, arg, func) 튜플을 chunk 단위로 풀어서 생성 (memmap 전체를 올리지 않음)"""
+    for i in range(0, len(rec), chunk):
+        yield from rec[i:i + chunk].tolist()
+
+def iter_shard(rec: np.ndarray, shard: int, n_shards: int, chunk: int = 4096):
+    """
+    i % n_shards == shard 인 레코드만 생성
+    도착 시각이 원래 trace와 같도록 건너뛴 레코드의 inter-arrival을 합쳐서 다시 계산
+    """
+    if n_shards <= 1:
+        yield from iter_records(rec, chunk)
+        return
+    t_base = 0.0        # chunk 시작 시점의 절대 시각
+    last_own = 0.0      # 이 shard가 마지막으로 낸 도착 시각
+    for i in range(0, len(rec), chunk):
+        part = rec[i:i + chunk]
+        t = t_base + np.cumsum(part["ia"])
+        t_base = float(t[-1])
+        own = np.nonzero((np.arange(i, i + len(part)) % n_shards) == shard)[0]
+        if len(own) == 0:
+            continue
+        own_t = t[own]
+        ia = np.diff(own_t, prepend=last_own)
+        last_own = float(own_t[-1])
+        yield from zip(ia.tolist(), part["arg"][own].tolist(), part["func"][own].tolist())
+
+def convert_text(src: str, dst: str, chunk_lines: int = 1_000_000) -> int:
+    """기존 workload_dur.txt -> 바이너리 (chunk 단위, 메모리 일정)"""
+    import pandas as pd
+    n = 0
+    with WorkloadWriter(dst) as w:
+        reader = pd.read_csv(src, sep=r"\s+", header=None, names=["ia", "arg"],
+                             dtype={"ia": np.float64, "arg": np.int64}, chunksize=chunk_lines)
+        for chunk in reader:
+            w.write(chunk["ia"].to_numpy(), chunk["arg"].to_numpy())
+            n += len(chunk)
+    return n
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="binary workload tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="text workload -> binary")
+    c.add_argument("src")
+    c.add_argument("dst")
+    i = sub.add_parser("info", help="print header and summary")
+    i.add_argument("path")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    a = parse_args()
+    if a.cmd == "convert":
+        n = convert_text(a.src, a.dst)
+        print(f"[WorkloadIO] {n} records -> {a.dst}")
+    else:
+        rec = open_workload(a.path)
+        span = float(rec["ia"].sum()) if len(rec) else 0.0
+        fmt = "binary" if is_binary(a.path) else "text"
+        print(f"[WorkloadIO] {a.path}: {fmt}, {len(rec)} records, span={span:.1f}s, "
+              f"rate={len(rec) / span if span > 0 else 0.0:.2f}/s")
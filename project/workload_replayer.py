@@ -1,9 +1,14 @@
-import argparse, time, os, requests
+import argparse, time, os, asyncio, json
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import Counter
-import numpy as np
 from typing import Optional
-from custom_scheduler import CustomDispatcher
+from custom_scheduler import CustomDispatcher, AsyncCustomDispatcher, aiohttp, parse_sched_spec
+from gateway_client import GatewayClient, LEAN_HEADERS, lean_data
+from workload_io import open_workload, iter_shard, ARG_STR
+from arrival import OpenLoopScheduler
+from results_sink import ResultSink, export_csv
+from metrics import Metrics, MetricsServer, SnapshotWriter
+from tracing import Tracer
+from keep_warm import KeepWarm
 
 def _safe_float(x):
     try: return float(x)
@@ -11,15 +16,48 @@ def _safe_float(x):
 
 class WorkloadReplayer:
     def __init__(self, workload_file, gateway_url="http://127.0.0.1:8080",
-                 max_workers=200, request_timeout=30, warmup_drop=50):
+                 max_workers=200, request_timeout=30, warmup_drop=50,
+                 engine="thread", hedge_cancel=True, cancel_signal=True,
+                 hedge_quantile=None, hedge_key="func",
+                 queue_policy=None, queue_aging=0.5, lb_policy="ewma",
+                 spin_ms=0.5, shard=(0, 1), start_at=None, result_tag="",
+                 prewarm=True, results_format="auto", csv_export=True, custom_config=None,
+                 metrics_port=None, metrics_snapshot=None, metrics_interval=5.0,
+                 trace_sample=0.0, sched=None, sched_hint=None, client="pool", pool_size=0,
+                 response_mode="json", keep_warm=0, keep_warm_interval_s=30.0,
+                 warm_ttl_ms=60000.0, cold_critical_ms=None):
         self.workload_file = workload_file
+        self.engine = engine            # thread | async
         self.base = gateway_url.rstrip("/")
         self.timeout = request_timeout
         self.max_workers = max_workers
         self.warmup_drop = warmup_drop
         self.funcs = [f"func-{i:02d}" for i in range(15)]
-        self.session = requests.Session()
-        self.results = []
+        self.results_format = results_format    # auto | arrow | csv (sink 파일 포맷)
+        self.csv_export = csv_export            # 끝난 뒤 {MODE}_result.csv 생성
+        self.sink = None
+        self.spin_ms = spin_ms          # 도착 마감 직전 spin 구간
+        self.load_report = None
+        self.shard = shard              # (k, n): i % n == k 인 도착만 재생
+        self.start_at = start_at        # 여러 프로세스/호스트 공통 시작 시각(epoch s)
+        self.result_tag = result_tag    # 결과 파일 이름 접미사 (shard별 파일)
+        self.prewarm = prewarm
+        self.metrics = Metrics()        # CUSTOM 디스패처 단계별 계측
+        self.metrics_port = metrics_port            # GET /metrics (Prometheus text)
+        self.metrics_snapshot = metrics_snapshot    # 주기적 스냅샷 JSON lines 경로
+        self.metrics_interval = metrics_interval
+        self._metrics_out = []
+        # 요청 단위 span 추적 (0이면 끔, 1.0이면 전부, 0.01이면 100건 중 1건)
+        self.tracer = Tracer(trace_sample) if trace_sample else None
+        # 요청 단위 스케줄링 정책 (handler가 작업 스레드에만 적용) -> 모드 비교에 Pod 재시작 불필요
+        self.sched = parse_sched_spec(sched) if sched else None
+        # lean: 지표는 응답 헤더로 받고 본문(RESPONSE_BYTES padding)은 파싱 없이 버림
+        self.lean = response_mode == "lean"
+        # keep-warm: 함수마다 replica keep_warm개를 주기적인 ping으로 warm 유지 (0이면 시작 전 한 번만)
+        self.keep_warm = keep_warm
+        self.keep_warm_interval_s = keep_warm_interval_s
+        self.warmer = None
+        self.cold_direct = 0            # CFS/FIFO: handler가 seq 1로 보고한 응답 수
 
         self.mode = "CFS"
         if os.path.exists("SCHEDULER_MODE.txt"):
@@ -29,47 +67,95 @@ class WorkloadReplayer:
                 elif "CUSTOM" in m: self.mode = "CUSTOM"
             except: pass
 
-        if self.mode == "CUSTOM":
+        # gateway 연결 풀: 동시에 나갈 수 있는 요청 수만큼 keep-alive 연결
+        # (CUSTOM은 요청당 hedge 1건 + 취소 신호까지 겹칠 수 있음)
+        if not pool_size:
+            pool_size = max_workers * 2 + len(self.funcs) if self.mode == "CUSTOM" else max_workers
+        self.session = GatewayClient(self.base, pool_size=pool_size, timeout=self.timeout,
+                                     backend=client, metrics=self.metrics)
+
+        self.custom_kwargs = dict(
+            alpha=0.25,
+            hedge_ms=40.0,
+            ewma_init=120.0,
+            ewma_slow_threshold=180.0,
+            quarantine_ms=1000.0,
+            per_func_concurrency=2,
+            request_timeout=self.timeout,
+            hedge_cancel=hedge_cancel,
+            cancel_signal=cancel_signal,
+            hedge_quantile=hedge_quantile,
+            hedge_key=hedge_key,
+            queue_policy=queue_policy,
+            queue_aging=queue_aging,
+            lb_policy=lb_policy,
+            sched_hint=sched_hint,
+            response_mode=response_mode,
+            warm_ttl_ms=warm_ttl_ms,
+            cold_critical_ms=cold_critical_ms
+        )
+        if custom_config:
+            # tune.py가 찾은 설정 (best_config.json의 params) -> 기본값 덮어씀
+            self.custom_kwargs.update(custom_config)
+            print(f"[Replayer] custom config: {custom_config}")
+        if self.mode == "CUSTOM" and self.engine == "thread":
             self.custom = CustomDispatcher(
                 gateway_url=self.base,
                 functions=self.funcs,
                 session=self.session,
-                alpha=0.25,             
-                hedge_ms=40.0,          
-                ewma_init=120.0,
-                ewma_slow_threshold=180.0,
-                quarantine_ms=1000.0,
-                per_func_concurrency=2, 
-                request_timeout=self.timeout
+                metrics=self.metrics,
+                tracer=self.tracer,
+                **self.custom_kwargs
             )
         else:
             self.custom = None
         self._rr = 0
+        self._fidx = {f: i for i, f in enumerate(self.funcs)}
 
     def _rr_next(self):
         f = self.funcs[self._rr % len(self.funcs)]
         self._rr += 1
         return f
 
-    def _prewarm(self):
-        for f in self.funcs:
-            try:
-                self.session.post(f"{self.base}/function/{f}", json={"arg":"warm"}, timeout=5)
-            except Exception:
-                pass
+    def _func_for(self, fid: int):
+        # 워크로드에 함수 번호가 있으면 그대로, 없으면(-1) 라운드로빈
+        if fid >= 0:
+            return self.funcs[fid % len(self.funcs)]
+        return self._rr_next()
 
-    def _call_one(self, func_name: str, arg: str):
-        t0 = time.time()
-        ok = False; data = {}
+    def _on_ping(self, f: str, data: dict, ms: float):
+        if self.custom is not None:
+            self.custom.note_ping(f, data, ms)
+
+    def _replay_pings(self):
+        # async 디스패처는 prewarm 뒤에 생성됨 -> 이미 응답한 인스턴스를 warm으로 알려 줌
+        if self.warmer is not None and self.custom is not None:
+            for f, ids in self.warmer.instances.items():
+                for iid in ids:
+                    self.custom.note_ping(f, {"instance": {"id": iid}})
+
+    def _prewarm(self):
+        if not self.prewarm and not self.keep_warm:
+            return
+        # 작업 없는 ping으로 replica를 깨움 (cold start가 측정에 섞이지 않게)
+        self.warmer = KeepWarm(self.session, self.base, self.funcs, replicas=max(self.keep_warm, 1),
+                               per_replica=self.custom_kwargs.get("replica_concurrency") or 1,
+                               interval_s=self.keep_warm_interval_s, timeout=self.timeout,
+                               on_reply=self._on_ping, metrics=self.metrics)
+        n = self.warmer.ping_all()
+        print(f"[KeepWarm] {sum(n.values())} instances answered across {len(n)} functions"
+              + (f", pinging {self.keep_warm}/func every {self.keep_warm_interval_s:g}s"
+                 if self.keep_warm else ""))
+        if self.keep_warm:
+            self.warmer.start()
+        if not self.prewarm:
+            return
         try:
-            r = self.session.post(f"{self.base}/function/{func_name}",
-                                  json={"arg": arg}, timeout=self.timeout)
-            ok = (r.status_code == 200)
-            data = r.json() if ok else {}
-        except Exception:
-            ok = False
-        t1 = time.time()
-        trun = (t1 - t0) * 1000.0
+            self.session.prefill()      # 연결 수립 시간이 측정에 섞이지 않게 미리 연결
+        except OSError as e:
+            print(f"[Replayer] connection prefill failed: {e}")
+
+    def _record(self, func_name: str, arg: str, ok: bool, data: dict, trun: float):
         exec_ms = _safe_float(data.get("elapsed_ms"))
         res_ms = trun - exec_ms if exec_ms is not None else None
         if res_ms is not None and res_ms < 0: res_ms = 0.0
@@ -79,108 +165,359 @@ class WorkloadReplayer:
         cvol = _safe_float(ctx.get("voluntary"))
         cinv = _safe_float(ctx.get("nonvoluntary"))
 
-        self.results.append({
-            "timestamp": time.time(), "function": func_name, "arg": arg,
-            "trun_around_ms": trun, "exec_ms": exec_ms, "res_ms": res_ms,
-            "ctxsw_delta_total": ctot, "ctxsw_delta_vol": cvol, "ctxsw_delta_invol": cinv,
-            "success": ok
-        })
+        if (data.get("instance") or {}).get("seq") == 1:
+            self.cold_direct += 1
 
-    def _call_one_custom(self, arg: str):
-        ok, data, elapsed_ms, used = self.custom.invoke({"arg": arg})
-        exec_ms = _safe_float(data.get("elapsed_ms"))
-        res_ms = elapsed_ms - exec_ms if exec_ms is not None else None
-        if res_ms is not None and res_ms < 0: res_ms = 0.0
+        sc = data.get("sched") or {}
+        cg = sc.get("cgroup") or {}
+        cpu = sc.get("cpu_end")
 
-        ctx = data.get("ctxsw", {}).get("delta", {})
-        ctot = _safe_float(ctx.get("total"))
-        cvol = _safe_float(ctx.get("voluntary"))
-        cinv = _safe_float(ctx.get("nonvoluntary"))
+        self.sink.add(time.time(), self._fidx.get(func_name, -1), int(arg),
+                      trun, exec_ms, res_ms, ctot, cvol, cinv,
+                      _safe_float(sc.get("runq_wait_ms")), _safe_float(sc.get("on_cpu_ms")),
+                      _safe_float(sc.get("migrations")), cpu if isinstance(cpu, int) else -1,
+                      _safe_float(cg.get("throttled_ms")), _safe_float(cg.get("nr_throttled")), ok)
+
+    def _open_sink(self):
+        os.makedirs(f"./{self.mode}", exist_ok=True)
+        self.sink = ResultSink(f"./{self.mode}/{self.mode}_result{self.result_tag}",
+                               self.funcs, fmt=self.results_format)
+
+    def _start_metrics(self):
+        if self.metrics_port:
+            self._metrics_out.append(MetricsServer(self.metrics, self.metrics_port))
+        if self.metrics_snapshot:
+            self._metrics_out.append(
+                SnapshotWriter(self.metrics, self.metrics_snapshot, self.metrics_interval))
+
+    def _stop_metrics(self):
+        for m in self._metrics_out:
+            m.close()
+        self._metrics_out = []
+
+    def _stop_keep_warm(self):
+        if self.warmer is not None:
+            self.warmer.stop()
+
+    def _trace_id(self):
+        return self.tracer.new_id() if self.tracer is not None else None
+
+    def _trace_direct(self, rid, func_name, t_sub, t0, t_recv, t1, ok, data):
+        # CFS/FIFO 모드: 토큰 대기 없는 시도 1건
+        self.tracer.attempt(rid, 0, func_name, t0, t0, t_recv, t1, ok, data)
+        self.tracer.request(rid, t_sub, t0, t1, func_name, ok)
+
+    def _req_headers(self, rid) -> Optional[dict]:
+        h = dict(LEAN_HEADERS) if self.lean else {}
+        if rid:
+            h["X-Request-Id"] = rid
+        return h or None
+
+    def _payload(self, arg: str) -> dict:
+        return {"arg": arg, "sched": self.sched} if self.sched else {"arg": arg}
+
+    def _call_one(self, func_name: str, arg: str, t_sub: float = None):
+        rid = self._trace_id()
+        t0 = time.time()
+        ok = False; data = {}; t_recv = None
+        try:
+            r = self.session.post(f"{self.base}/function/{func_name}",
+                                  json=self._payload(arg), timeout=self.timeout,
+                                  headers=self._req_headers(rid), discard=self.lean)
+            ok = (r.status_code == 200)
+            t_recv = time.time()
+            data = (lean_data(r.headers) if self.lean else r.json()) if ok else {}
+        except Exception:
+            ok = False
+        t1 = time.time()
+        self._record(func_name, arg, ok, data, (t1 - t0) * 1000.0)
+        if rid:
+            self._trace_direct(rid, func_name, t_sub or t0 * 1000.0, t0 * 1000.0,
+                               t_recv and t_recv * 1000.0, t1 * 1000.0, ok, data)
+        return ok
 
-        self.results.append({
-            "timestamp": time.time(), "function": used, "arg": arg,
-            "trun_around_ms": elapsed_ms, "exec_ms": exec_ms, "res_ms": res_ms,
-            "ctxsw_delta_total": ctot, "ctxsw_delta_vol": cvol, "ctxsw_delta_invol": cinv,
-            "success": bool(ok)
-        })
+    def _call_one_custom(self, arg: str, t_sub: float = None):
+        rid = self._trace_id()
+        t0 = time.time() * 1000.0
+        ok, data, elapsed_ms, used = self.custom.invoke(self._payload(arg), request_id=rid)
+        self._record(used, arg, ok, data, elapsed_ms)
+        if rid:
+            self.tracer.request(rid, t_sub or t0, t0, time.time() * 1000.0, used, ok)
+        return ok
+
+    async def _acall_one(self, session, func_name: str, arg: str, t_sub: float = None):
+        rid = self._trace_id()
+        t0 = time.time()
+        ok = False; data = {}; t_recv = None
+        try:
+            async with session.post(f"{self.base}/function/{func_name}", json=self._payload(arg),
+                                    headers=self._req_headers(rid)) as r:
+                ok = (r.status == 200)
+                if self.lean:
+                    async for _ in r.content.iter_chunked(1 << 16):
+                        pass
+                    body = b""
+                else:
+                    body = await r.read() if ok else b""
+                t_recv = time.time()
+                data = (lean_data(r.headers) if self.lean else json.loads(body)) if ok else {}
+        except Exception:
+            ok = False
+        t1 = time.time()
+        self._record(func_name, arg, ok, data, (t1 - t0) * 1000.0)
+        if rid:
+            self._trace_direct(rid, func_name, t_sub or t0 * 1000.0, t0 * 1000.0,
+                               t_recv and t_recv * 1000.0, t1 * 1000.0, ok, data)
+        return ok
+
+    async def _acall_one_custom(self, arg: str, t_sub: float = None):
+        rid = self._trace_id()
+        t0 = time.time() * 1000.0
+        ok, data, elapsed_ms, used = await self.custom.invoke(self._payload(arg), request_id=rid)
+        self._record(used, arg, ok, data or {}, elapsed_ms)
+        if rid:
+            self.tracer.request(rid, t_sub or t0, t0, time.time() * 1000.0, used, ok)
+        return ok
 
     def replay(self, max_items: Optional[int] = 500):
+        if self.engine == "async":
+            return asyncio.run(self.replay_async(max_items))
+
         print(f"[Replayer] Mode={self.mode}  Start: {self.workload_file}")
         self._prewarm()
 
-        lines = open(self.workload_file).read().strip().splitlines()
-        if max_items:
-            lines = lines[:max_items]
+        wl = open_workload(self.workload_file, max_items)
+        self._open_sink()
+        self._start_metrics()
 
+        sched = OpenLoopScheduler(spin_s=self.spin_ms / 1000.0, start_at=self.start_at)
         start = time.time()
         with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
             futs = []
-            for i, line in enumerate(lines):
-                try:
-                    ia, arg = line.strip().split()
-                    ia = float(ia)
-                except Exception:
-                    continue
-                if ia > 0: time.sleep(ia)
-
-                if self.mode == "CUSTOM":
-                    futs.append(ex.submit(self._call_one_custom, arg))
-                else:
-                    f = self._rr_next()
-                    futs.append(ex.submit(self._call_one, f, arg))
+            for batch in sched.batches(iter_shard(wl, *self.shard)):
+                t_sub = time.time() * 1000.0    # 스레드 풀 대기(client_queue) 시작
+                for arg, fid in batch:
+                    arg = ARG_STR[arg]
+                    if self.mode == "CUSTOM":
+                        futs.append(ex.submit(self._call_one_custom, arg, t_sub))
+                    else:
+                        futs.append(ex.submit(self._call_one, self._func_for(fid), arg, t_sub))
 
             for _ in as_completed(futs):
                 pass
 
-        print(f"[Replayer] Done. Sent {len(lines)} in {time.time()-start:.2f}s")
+        self.sink.close()
+        self._stop_metrics()
+        self._stop_keep_warm()
+        print(f"[Replayer] Done. Sent {self.sink.count} in {time.time()-start:.2f}s")
+        self.load_report = sched.report()
         self._save()
 
-    def _save(self):
-        succ = [r for r in self.results if r["success"]]
-        drop = min(self.warmup_drop, len(succ))
-        succ = succ[drop:]
+    async def replay_async(self, max_items: Optional[int] = 500):
+        """스레드 없이 이벤트 루프 하나로 재생 (동시 in-flight 상한 = max_workers)"""
+        if aiohttp is None:
+            raise RuntimeError("engine=async requires aiohttp (pip install aiohttp)")
+        print(f"[Replayer] Mode={self.mode} (async)  Start: {self.workload_file}")
+        self._prewarm()
+
+        wl = open_workload(self.workload_file, max_items)
+        self._open_sink()
+        self._start_metrics()
+
+        limit = asyncio.Semaphore(self.max_workers)
+        conn = aiohttp.TCPConnector(limit=self.max_workers, keepalive_timeout=30)
+        session = aiohttp.ClientSession(
+            connector=conn, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        if self.mode == "CUSTOM":
+            self.custom = AsyncCustomDispatcher(
+                gateway_url=self.base,
+                functions=self.funcs,
+                session=session,
+                metrics=self.metrics,
+                tracer=self.tracer,
+                **self.custom_kwargs
+            )
+            self._replay_pings()
 
+        async def run(coro):
+            async with limit:
+                await coro
+
+        sched = OpenLoopScheduler(spin_s=self.spin_ms / 1000.0, start_at=self.start_at)
+        start = time.time()
+        try:
+            tasks = []
+            async for batch in sched.abatches(iter_shard(wl, *self.shard)):
+                t_sub = time.time() * 1000.0    # 동시성 상한 대기(client_queue) 시작
+                for arg, fid in batch:
+                    arg = ARG_STR[arg]
+                    if self.mode == "CUSTOM":
+                        coro = self._acall_one_custom(arg, t_sub)
+                    else:
+                        coro = self._acall_one(session, self._func_for(fid), arg, t_sub)
+                    tasks.append(asyncio.ensure_future(run(coro)))
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            if self.custom is not None:
+                await self.custom.close()     # 남은 취소 신호 전송을 끝낸 뒤 세션 종료
+            await session.close()
+
+        self.sink.close()
+        self._stop_metrics()
+        self._stop_keep_warm()
+        print(f"[Replayer] Done. Sent {self.sink.count} in {time.time()-start:.2f}s")
+        self.load_report = sched.report()
+        self._save()
+
+    def _save(self):
         mode = self.mode
         out_dir = f"./{mode}"
-        os.makedirs(out_dir, exist_ok=True)
-        out_path = f"{out_dir}/{mode}_result.csv"
-
-        import csv
-        with open(out_path, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["timestamp","function","arg",
-                        "trun_around_ms","exec_ms","res_ms",
-                        "ctxsw_delta_total","ctxsw_delta_vol","ctxsw_delta_invol"])
-            for r in succ:
-                w.writerow([
-                    r["timestamp"], r["function"], r["arg"],
-                    r["trun_around_ms"], r["exec_ms"], r["res_ms"],
-                    r["ctxsw_delta_total"], r["ctxsw_delta_vol"], r["ctxsw_delta_invol"]
-                ])
-                
-        def N(col): 
-            xs = [ _safe_float(r[col]) for r in succ if r[col] is not None ]
-            xs = [x for x in xs if x is not None]
-            return np.mean(xs) if xs else 0.0
+        out_path = f"{out_dir}/{mode}_result{self.result_tag}.csv" if self.csv_export else None
+        succ, n_ok, total = export_csv(self.sink.path, out_path, self.warmup_drop)
+
+        def N(col):
+            xs = succ[col].dropna()
+            return xs.mean() if len(xs) else 0.0
         print("[Summary] avg turn=%.2f, exec=%.2f, resp=%.2f" %
               (N("trun_around_ms"), N("exec_ms"), N("res_ms")))
-        print(f"[Saved] {out_path}")
+        print(f"[Saved] {out_path or self.sink.path}")
 
-def parse_args():
-    ap = argparse.ArgumentParser()
+        run = {"mode": mode, "sent": total, "succeeded": n_ok, "results": self.sink.path}
+        if self.lean:
+            run["response"] = "lean"
+        if self.sched or self.custom_kwargs.get("sched_hint"):
+            run["sched"] = {"spec": self.sched, "hint": self.custom_kwargs.get("sched_hint")}
+        if self.load_report:
+            run["load"] = self.load_report
+            L = self.load_report
+            if L.get("arrivals"):
+                print("[Load] intended=%.2f rps achieved=%.2f rps lag p50=%.3f p99=%.3f max=%.3f ms" %
+                      (L["intended_rps"], L["achieved_rps"], L["lag_ms_p50"], L["lag_ms_p99"], L["lag_ms_max"]))
+        if self.custom is not None:
+            run["hedge"] = self.custom.stats.snapshot()
+            h = run["hedge"]
+            print("[Hedge] fired=%d won=%d cancelled=%d wasted_cpu_ms=%.1f" %
+                  (h["hedges_fired"], h["hedges_won"], h["hedges_cancelled"], h["wasted_cpu_ms"]))
+            run["cold"] = self.custom.warm.snapshot(time.time() * 1000.0)
+            c = run["cold"]
+            print("[Cold] starts=%d avoided=%d keep-warm woke=%d" %
+                  (c["cold_starts"], self.custom.m_cold_avoided.value, c["pinged_cold"]))
+            run["metrics"] = self.metrics.snapshot()
+        elif self.cold_direct:
+            run["cold"] = {"cold_starts": self.cold_direct}
+            print(f"[Cold] starts={self.cold_direct}")
+        if self.warmer is not None:
+            run["keep_warm"] = self.warmer.snapshot()
+        if self.engine == "thread":
+            run["client"] = c = self.session.snapshot()
+            print("[Client] %s pool=%d opened=%d reused=%d wait p99=%.3f ms connect p99=%.3f ms" %
+                  (c["backend"], c["pool_size"], c["opened"], c["reused"],
+                   c["pool_wait"].get("p99_ms", 0.0), c["connect"].get("p99_ms", 0.0)))
+        if self.tracer is not None:
+            base = f"{out_dir}/{mode}{self.result_tag}"
+            run["trace"] = self.tracer.save(base)
+            print(f"[Trace] {len(self.tracer.requests)} requests -> {base}_trace.json, {base}_spans.csv")
+            print("[Trace] mean ms: " + ", ".join(f"{k}={v:.2f}" for k, v in run["trace"].items()))
+        run_path = f"{out_dir}/{mode}_run{self.result_tag}.json"
+        with open(run_path, "w") as f:
+            json.dump(run, f, indent=2)
+
+def build_parser(add_help: bool = True) -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(add_help=add_help)
     ap.add_argument("--workload", default="workload_dur.txt")
     ap.add_argument("--gateway", default="http://127.0.0.1:8080")
     ap.add_argument("--workers", type=int, default=200)
     ap.add_argument("--timeout", type=int, default=30)
     ap.add_argument("--max-items", type=int, default=500)
     ap.add_argument("--warmup-drop", type=int, default=50)
-    return ap.parse_args()
+    ap.add_argument("--engine", choices=["thread", "async"], default="thread",
+                    help="async: asyncio + aiohttp, 요청당 스레드 없음")
+    ap.add_argument("--no-hedge-cancel", action="store_true",
+                    help="hedge에서 진 쪽 요청을 취소하지 않고 끝까지 실행")
+    ap.add_argument("--no-cancel-signal", action="store_true",
+                    help="handler에 취소 신호를 보내지 않음 (커넥션/토큰만 정리)")
+    ap.add_argument("--hedge-quantile", type=float, default=None,
+                    help="예: 0.95 -> 관측 지연 P95를 hedge 타임아웃으로 사용 (기본: 고정 40ms)")
+    ap.add_argument("--hedge-key", choices=["func", "arg", "func_arg"], default="func",
+                    help="분위수를 나눠 추적할 키")
+    ap.add_argument("--queue-policy", choices=["fifo", "sjf", "srpt", "aged_srpt"], default=None,
+                    help="함수별 대기열 정렬 정책 (기본: TokenBucket 도착 순)")
+    ap.add_argument("--queue-aging", type=float, default=0.5,
+                    help="aged_srpt: 1ms 대기당 깎아주는 예상 시간(ms)")
+    ap.add_argument("--lb", choices=["ewma", "p2c", "jsq", "lect"], default="ewma",
+                    help="후보 선택: ewma | p2c(power-of-two) | jsq(최소 대기열) | lect(대기열*EWMA)")
+    ap.add_argument("--spin-ms", type=float, default=0.5,
+                    help="도착 마감 직전 sleep 대신 spin하는 구간(ms)")
+    ap.add_argument("--results-format", choices=["auto", "arrow", "csv"], default="auto",
+                    help="실행 중 결과를 이어 쓰는 파일 포맷 (auto: pyarrow 있으면 arrow)")
+    ap.add_argument("--no-csv-export", action="store_true",
+                    help="끝난 뒤 {MODE}_result.csv를 만들지 않음")
+    ap.add_argument("--metrics-port", type=int, default=None,
+                    help="CUSTOM 디스패처 계측을 GET /metrics (Prometheus text)로 노출")
+    ap.add_argument("--metrics-snapshot", default=None,
+                    help="계측 스냅샷을 주기적으로 이어 쓸 JSON lines 경로")
+    ap.add_argument("--metrics-interval", type=float, default=5.0)
+    ap.add_argument("--trace", type=float, nargs="?", const=1.0, default=0.0, metavar="SAMPLE",
+                    help="요청 단위 span 추적 (X-Request-Id), 값은 추적 비율 (기본 1.0 = 전부) "
+                         "-> {MODE}_trace.json (Chrome trace / Perfetto), {MODE}_spans.csv")
+    ap.add_argument("--sched", default=None, metavar="SPEC",
+                    help='모든 요청에 붙일 handler 스케줄링 정책, 예: "fifo:50", "batch/nice=5", '
+                         '"rr:30/cpus=0-3", "deadline/runtime_ms=5/deadline_ms=20"')
+    ap.add_argument("--sched-hint", default=None, metavar="RULES",
+                    help='CUSTOM: 예상 서비스 시간별 정책, 예: "fifo:60<50,batch" '
+                         '(50ms 미만 fifo 60, 나머지 batch)')
+    ap.add_argument("--client", choices=["pool", "requests", "h2"], default="pool",
+                    help="gateway 클라이언트: pool(http.client keep-alive 풀) | requests | h2(httpx HTTP/2)")
+    ap.add_argument("--pool-size", type=int, default=0,
+                    help="gateway 연결 수 (0: --workers, CUSTOM은 hedge/취소 몫까지 2배)")
+    ap.add_argument("--response", choices=["json", "lean"], default="json",
+                    help="lean: handler 지표를 응답 헤더로 받고 본문(padding)은 파싱 없이 버림")
+    ap.add_argument("--keep-warm", type=int, default=0, metavar="N",
+                    help="함수마다 replica N개를 주기적인 ping으로 warm 유지 (0: 시작 전 한 번만)")
+    ap.add_argument("--keep-warm-interval-s", type=float, default=30.0,
+                    help="keep-warm ping 주기 (replica idle scale-down 시간보다 짧게)")
+    ap.add_argument("--warm-ttl-s", type=float, default=60.0,
+                    help="CUSTOM: 이 시간 응답이 없던 replica는 scale-down 되었다고 봄")
+    ap.add_argument("--cold-critical-ms", type=float, default=None,
+                    help="CUSTOM: 예상 서비스 시간이 이 이하인 요청은 cold replica 위험이 있는 함수를 피함")
+    ap.add_argument("--custom-config", default=None,
+                    help="CustomDispatcher 파라미터 JSON (예: tune_results/best_config.json)")
+    return ap
 
-if __name__ == "__main__":
-    a = parse_args()
-    WorkloadReplayer(
+def parse_args():
+    return build_parser().parse_args()
+
+def load_custom_config(path: Optional[str]) -> Optional[dict]:
+    """tune.py 출력({"params": {...}, ...}) 또는 파라미터만 담은 JSON"""
+    if not path:
+        return None
+    with open(path) as f:
+        cfg = json.load(f)
+    return dict(cfg.get("params", cfg))
+
+def from_args(a, **overrides) -> WorkloadReplayer:
+    kw = dict(
         workload_file=a.workload, gateway_url=a.gateway,
         max_workers=a.workers, request_timeout=a.timeout,
-        warmup_drop=a.warmup_drop
-    ).replay(max_items=a.max_items)
+        warmup_drop=a.warmup_drop, engine=a.engine,
+        hedge_cancel=not a.no_hedge_cancel, cancel_signal=not a.no_cancel_signal,
+        hedge_quantile=a.hedge_quantile, hedge_key=a.hedge_key,
+        queue_policy=a.queue_policy, queue_aging=a.queue_aging,
+        lb_policy=a.lb, spin_ms=a.spin_ms,
+        results_format=a.results_format, csv_export=not a.no_csv_export,
+        custom_config=load_custom_config(a.custom_config),
+        metrics_port=a.metrics_port, metrics_snapshot=a.metrics_snapshot,
+        metrics_interval=a.metrics_interval, trace_sample=a.trace,
+        sched=a.sched, sched_hint=a.sched_hint, client=a.client, pool_size=a.pool_size,
+        response_mode=a.response, keep_warm=a.keep_warm,
+        keep_warm_interval_s=a.keep_warm_interval_s, warm_ttl_ms=a.warm_ttl_s * 1000.0,
+        cold_critical_ms=a.cold_critical_ms
+    )
+    kw.update(overrides)
+    return WorkloadReplayer(**kw)
 
+if __name__ == "__main__":
+    a = parse_args()
+    from_args(a).replay(max_items=a.max_items)